@@ -0,0 +1,309 @@
+import base64
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from src.db.sandbox import ROW_RETURNING_QUERY_TYPES, QueryStream
+from src.service.projects.project_service import ProjectService
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SCHEMA_PATH = os.path.join(FIXTURES_DIR, 'schema.sql')
+QUESTIONS_PATH = os.path.join(FIXTURES_DIR, 'questions.json')
+
+# Children before parents, so tables can be dropped in this order.
+TABLES = ('reviews', 'order_items', 'orders', 'products', 'categories', 'customers')
+
+_COUNTRIES = ('Germany', 'France', 'Spain', 'Italy', 'Netherlands', 'Poland', 'Sweden', 'United Kingdom', 'United States', 'Canada')
+_CATEGORIES = ('Books', 'Electronics', 'Garden', 'Kitchen', 'Outdoor', 'Office', 'Toys', 'Sports')
+_STATUSES = ('pending', 'shipped', 'delivered', 'cancelled')
+
+def load_questions(path: str = QUESTIONS_PATH) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return json.load(f)
+
+def schema_statements(path: str = SCHEMA_PATH) -> List[str]:
+    with open(path) as f:
+        lines = [line for line in f if not line.lstrip().startswith('--')]
+    return [statement.strip() for statement in ''.join(lines).split(';') if statement.strip()]
+
+def generate_rows(scale: float = 1.0, seed: int = 7) -> Iterator[Tuple[str, List[str], List[tuple]]]:
+    """Yield (table, columns, rows) for a deterministic dataset; scale 1 is about 5k orders."""
+    rng = random.Random(seed)
+    customers = max(10, int(1000 * scale))
+    products = max(10, int(200 * scale))
+    orders = max(20, int(5000 * scale))
+    reviews = max(10, int(2000 * scale))
+    start = date(2023, 1, 1)
+
+    yield 'customers', ['id', 'name', 'email', 'country', 'created_at'], [
+        (i, f"Customer {i}", f"customer{i}@example.com", rng.choice(_COUNTRIES), (start + timedelta(days=rng.randrange(365))).isoformat())
+        for i in range(1, customers + 1)
+    ]
+    yield 'categories', ['id', 'name'], [(i, name) for i, name in enumerate(_CATEGORIES, 1)]
+
+    prices = {i: round(rng.uniform(2, 500), 2) for i in range(1, products + 1)}
+    yield 'products', ['id', 'category_id', 'name', 'price', 'stock'], [
+        (i, rng.randrange(1, len(_CATEGORIES) + 1), f"Product {i}", prices[i], rng.randrange(0, 500))
+        for i in range(1, products + 1)
+    ]
+
+    order_rows, item_rows = [], []
+    for order_id in range(1, orders + 1):
+        total = 0.0
+        for _ in range(rng.randrange(1, 5)):
+            product_id = rng.randrange(1, products + 1)
+            quantity = rng.randrange(1, 6)
+            total += quantity * prices[product_id]
+            item_rows.append((len(item_rows) + 1, order_id, product_id, quantity, prices[product_id]))
+        order_rows.append((order_id, rng.randrange(1, customers + 1), rng.choice(_STATUSES),
+                           (start + timedelta(days=rng.randrange(540))).isoformat(), round(total, 2)))
+    yield 'orders', ['id', 'customer_id', 'status', 'ordered_at', 'total'], order_rows
+    yield 'order_items', ['id', 'order_id', 'product_id', 'quantity', 'unit_price'], item_rows
+
+    yield 'reviews', ['id', 'product_id', 'customer_id', 'rating', 'body'], [
+        (i, rng.randrange(1, products + 1), rng.randrange(1, customers + 1), rng.randrange(1, 6), f"Review {i}")
+        for i in range(1, reviews + 1)
+    ]
+
+def load_sqlite(path: str, scale: float = 1.0, seed: int = 7) -> Dict[str, int]:
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        for statement in schema_statements():
+            connection.execute(statement)
+        counts = {}
+        for table, columns, rows in generate_rows(scale, seed):
+            connection.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows
+            )
+            counts[table] = len(rows)
+        connection.commit()
+        return counts
+    finally:
+        connection.close()
+
+def load_mysql(db_config: Dict[str, Any], scale: float = 1.0, seed: int = 7) -> Dict[str, int]:
+    import mysql.connector
+    connection = mysql.connector.connect(
+        host=db_config['host'],
+        port=int(db_config.get('port', 3306)),
+        user=db_config['user'],
+        password=db_config.get('password', ''),
+        database=db_config['database']
+    )
+    try:
+        cursor = connection.cursor()
+        for table in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in schema_statements():
+            cursor.execute(statement)
+        counts = {}
+        for table, columns, rows in generate_rows(scale, seed):
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('%s' for _ in columns)})"
+            for offset in range(0, len(rows), 1000):
+                cursor.executemany(sql, rows[offset:offset + 1000])
+            counts[table] = len(rows)
+        connection.commit()
+        # Refresh information_schema row estimates so the app sees realistic table sizes.
+        cursor.execute(f"ANALYZE TABLE {', '.join(TABLES)}")
+        cursor.fetchall()
+        cursor.close()
+        return counts
+    finally:
+        connection.close()
+
+def _dict_factory(cursor, row):
+    return {description[0]: value for description, value in zip(cursor.description, row)}
+
+class SQLiteSandbox:
+    """Stands in for MySQLSandbox when the benchmark runs without a MySQL server."""
+
+    database_path: Optional[str] = None
+
+    def __init__(self, db_config: Dict[str, Any], ping_interval: float = 30.0):
+        self.db_config = db_config
+        self.ping_interval = ping_interval
+        self.connection = sqlite3.connect(self.database_path, check_same_thread=False)
+        self.connection.row_factory = _dict_factory
+        self.cursor = self.connection.cursor()
+        self.last_used = 0.0
+        self._touch()
+
+    def _touch(self):
+        self.last_used = time.monotonic()
+
+    def execute_query(self, query: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        start_time = datetime.now()
+        result = {
+            'success': False,
+            'data': None,
+            'error': None,
+            'execution_time': 0,
+            'affected_rows': 0,
+            'column_info': [],
+            'query_type': None
+        }
+        try:
+            query_type = query.strip().split()[0].upper()
+            result['query_type'] = query_type
+            self.cursor.execute(query, params or {})
+            if query_type in ROW_RETURNING_QUERY_TYPES or query_type == 'WITH':
+                rows = self.cursor.fetchall()
+                result['data'] = {'records': rows, 'total_rows': len(rows)}
+                if rows:
+                    result['column_info'] = [{'name': desc[0], 'type': str(desc[1])} for desc in self.cursor.description]
+            else:
+                self.connection.commit()
+                result['affected_rows'] = self.cursor.rowcount
+            result['success'] = True
+            self._touch()
+        except Exception as e:
+            result['error'] = str(e)
+            self.connection.rollback()
+        finally:
+            result['execution_time'] = (datetime.now() - start_time).total_seconds()
+        return result
+
+    def table_versions(self, tables: List[str]) -> Dict[str, Optional[str]]:
+        # Every committed write rewrites the database file, so its mtime versions all tables at once.
+        version = str(os.stat(self.database_path).st_mtime_ns)
+        rows = self.connection.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()
+        kinds = {row['name'].lower(): row['type'] for row in rows}
+        return {table: (version if kinds[table] == 'table' else None) for table in tables if table in kinds}
+
+    def open_stream(self, query: str, params: Optional[Dict] = None, chunk_size: int = 1000) -> QueryStream:
+        query_type = query.strip().split()[0].upper()
+        if query_type not in ROW_RETURNING_QUERY_TYPES:
+            raise ValueError(f"Streaming is only supported for {', '.join(ROW_RETURNING_QUERY_TYPES)} queries")
+        cursor = self.connection.cursor()
+        cursor.execute(query, params or {})
+        return QueryStream(self, cursor, query_type, chunk_size, datetime.now())
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+def introspect_sqlite(path: str) -> Dict[str, Any]:
+    """Describe the SQLite fixture in the shape ProjectService._introspect_database returns."""
+    connection = sqlite3.connect(path)
+    connection.row_factory = _dict_factory
+    try:
+        tables = []
+        names = [row['name'] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        for name in names:
+            columns = list(connection.execute(f"PRAGMA table_info({name})"))
+            unique_keys = []
+            for index in connection.execute(f"PRAGMA index_list({name})"):
+                if index['unique'] and index['origin'] == 'u':
+                    unique_keys.append([row['name'] for row in connection.execute(f"PRAGMA index_info({index['name']})")])
+            tables.append({
+                'name': name,
+                'row_count': connection.execute(f"SELECT COUNT(*) AS n FROM {name}").fetchone()['n'],
+                'column_count': len(columns),
+                'columns': [
+                    {'name': column['name'], 'type': column['type'].lower(), 'nullable': not column['notnull'] and not column['pk']}
+                    for column in columns
+                ],
+                'foreign_keys': [
+                    {'column': row['from'], 'referenced_table': row['table'], 'referenced_column': row['to']}
+                    for row in connection.execute(f"PRAGMA foreign_key_list({name})")
+                ],
+                'primary_key': [column['name'] for column in sorted(columns, key=lambda column: column['pk']) if column['pk']],
+                'unique_keys': unique_keys
+            })
+        return {
+            'database_name': 'benchmark',
+            'tables': tables,
+            'connection_status': True,
+            'database_info': {'host': 'sqlite', 'port': 0, 'user': 'benchmark', 'password': '', 'database': 'benchmark'}
+        }
+    finally:
+        connection.close()
+
+class FixtureProjectService(ProjectService):
+    """Serves one fixture project for any project id, without the metadata database."""
+
+    def __init__(self, db_config: Dict[str, Any], schema: Dict[str, Any]):
+        self.projects = None
+        self.db_config = db_config
+        self.schema = schema
+        self._encrypted_path = base64.b64encode(json.dumps({'dbConfig': db_config}).encode('utf-8')).decode('ascii')
+
+    async def get_project(self, project_id: int, user_id: int):
+        now = datetime.now().isoformat()
+        return {
+            'id': project_id,
+            'name': f"Benchmark project {project_id}",
+            'description': 'Pipeline benchmark fixture',
+            'encrypted_path': self._encrypted_path,
+            'created_at': now,
+            'updated_at': now
+        }
+
+    async def get_database_info(self, project_id: int, user_id: int):
+        # The same dict every time, as the schema cache would return it.
+        return self.schema
+
+class _SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, query: str, params: tuple = ()):
+        self._cursor.execute(query.replace('%s', '?'), params)
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+class SQLiteMetadataDB:
+    """Stands in for AsyncDatabase behind the repositories: async cursor() with pymysql placeholders and dict rows."""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = _dict_factory
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(255) NOT NULL,
+                email VARCHAR(255) NOT NULL UNIQUE,
+                password VARCHAR(255) NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def cursor(self):
+        # sqlite calls never suspend, so holding the lock across the awaits does not stall the loop on it.
+        with self._lock:
+            cursor = self.connection.cursor()
+            try:
+                yield _SQLiteCursor(cursor)
+                self.connection.commit()
+            except BaseException:
+                self.connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def close(self):
+        self.connection.close()
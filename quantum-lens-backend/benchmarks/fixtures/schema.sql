@@ -0,0 +1,53 @@
+-- Fixture schema for the pipeline benchmark.
+-- Kept to the subset of DDL that MySQL and SQLite both accept, so the same file seeds either backend.
+
+CREATE TABLE customers (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    country VARCHAR(64) NOT NULL,
+    created_at DATE NOT NULL
+);
+
+CREATE TABLE categories (
+    id INTEGER NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE products (
+    id INTEGER NOT NULL PRIMARY KEY,
+    category_id INTEGER NOT NULL,
+    name VARCHAR(150) NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    stock INTEGER NOT NULL,
+    FOREIGN KEY (category_id) REFERENCES categories (id)
+);
+
+CREATE TABLE orders (
+    id INTEGER NOT NULL PRIMARY KEY,
+    customer_id INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    ordered_at DATE NOT NULL,
+    total DECIMAL(12, 2) NOT NULL,
+    FOREIGN KEY (customer_id) REFERENCES customers (id)
+);
+
+CREATE TABLE order_items (
+    id INTEGER NOT NULL PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price DECIMAL(10, 2) NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders (id),
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+
+CREATE TABLE reviews (
+    id INTEGER NOT NULL PRIMARY KEY,
+    product_id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL,
+    rating INTEGER NOT NULL,
+    body VARCHAR(500),
+    FOREIGN KEY (product_id) REFERENCES products (id),
+    FOREIGN KEY (customer_id) REFERENCES customers (id)
+);
@@ -0,0 +1,163 @@
+"""Measure prompt size and latency per turn of long chat sessions, with and without context-window management.
+
+Each session is continued server-side: the first request opens it and every later one sends only the new user
+message with its session_id. The unmanaged run lifts the token budget so the whole history goes to the model, as
+before. The stub LLM can be made slower for longer prompts with --llm-prompt-delay-ms. Runs offline with a SQLite
+session store.
+
+    python -m benchmarks.run_chat --sessions 4 --turns 80 --token-budget 3000
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run_pipeline import _OFFLINE_ENV, asgi_request, percentile
+from benchmarks.stub_llm import StubLLMServer
+
+_WORDS = ('orders', 'customers', 'revenue', 'monthly', 'region', 'average', 'basket', 'returns', 'category',
+          'growth', 'cohort', 'churn', 'product', 'margin', 'weekly', 'top', 'trend', 'compare', 'last', 'year')
+
+def user_message(rng: random.Random, turn: int, words: int) -> str:
+    return f"Turn {turn}: " + ' '.join(rng.choice(_WORDS) for _ in range(words)) + '?'
+
+async def run_sessions(app, sessions: int, turns: int, words: int, seed: int) -> Dict[str, Any]:
+    by_turn: Dict[int, Dict[str, List[float]]] = {}
+    statuses: Dict[int, int] = {}
+
+    async def session(index: int):
+        rng = random.Random(seed + index)
+        session_id = None
+        for turn in range(turns):
+            messages = [{'role': 'user', 'content': user_message(rng, turn, words)}]
+            if session_id is None:
+                messages.insert(0, {'role': 'system', 'content': 'You are a helpful assistant for questions about sales data.'})
+            payload = {'messages': messages, 'project_id': 1}
+            if session_id is not None:
+                payload['session_id'] = session_id
+            response = await asgi_request(app, 'POST', '/api/v1/chat/completion', payload)
+            statuses[response['status']] = statuses.get(response['status'], 0) + 1
+            if response['status'] != 200:
+                return
+            session_id = json.loads(response['body'])['session_id']
+            by_turn.setdefault(turn, {'latency': []})['latency'].append(response['elapsed'])
+
+    await asyncio.gather(*(session(index) for index in range(sessions)))
+    return {'statuses': statuses, 'by_turn': by_turn}
+
+def summarize(result: Dict[str, Any], prompts: List[Dict[str, Any]], turns: int, bucket: int) -> List[Dict[str, Any]]:
+    rows = []
+    for start in range(0, turns, bucket):
+        turn_range = range(start, min(turns, start + bucket))
+        latencies = sorted(value for turn in turn_range for value in result['by_turn'].get(turn, {}).get('latency', []))
+        tokens = [prompt['tokens'] for prompt in prompts if prompt['turn'] in turn_range]
+        rows.append({
+            'turns': f"{start + 1}-{turn_range[-1] + 1}",
+            'prompt_tokens_mean': sum(tokens) / len(tokens) if tokens else 0.0,
+            'prompt_tokens_max': max(tokens) if tokens else 0,
+            'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else 0.0,
+            'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else 0.0
+        })
+    return rows
+
+def print_report(report: Dict[str, Any]):
+    for name, result in report['results'].items():
+        print(f"\n{name}: statuses={result['statuses']} digest_calls={result['digest_calls']}")
+        print(f"{'turns':<10}{'prompt tokens':>15}{'max':>8}{'p50':>10}{'p99':>10}   (ms)")
+        for row in result['buckets']:
+            print(f"{row['turns']:<10}{row['prompt_tokens_mean']:>15.0f}{row['prompt_tokens_max']:>8}"
+                  f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Prompt size and latency across long chat sessions")
+    parser.add_argument('--sessions', type=int, default=4, help="Concurrent sessions")
+    parser.add_argument('--turns', type=int, default=80, help="Turns per session")
+    parser.add_argument('--words', type=int, default=60, help="Words per user message")
+    parser.add_argument('--bucket', type=int, default=10, help="Turns per report row")
+    parser.add_argument('--token-budget', type=int, default=3000)
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0)
+    parser.add_argument('--llm-prompt-delay-ms', type=float, default=20.0, help="Extra stub latency per 1000 prompt tokens")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default=None, help="Also write the report as JSON to this path")
+    parser.add_argument('--log-level', default='CRITICAL')
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    stub = StubLLMServer([], args.llm_latency_ms / 1000, prompt_delay=args.llm_prompt_delay_ms / 1000, seed=args.seed)
+    base_url = stub.start()
+
+    workdir = tempfile.mkdtemp(prefix='ql-chat-')
+    for name, value in _OFFLINE_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ['OPENROUTER_BASE_URL'] = base_url
+    os.environ['LLM_CACHE_ENABLED'] = 'false'
+    os.environ.pop('LLM_CACHE_SQLITE_PATH', None)
+    os.environ['CHAT_STORE_BACKEND'] = 'sqlite'
+    os.environ['CHAT_STORE_SQLITE_PATH'] = os.path.join(workdir, 'chat.sqlite3')
+    logging.getLogger('QUANTUM-LENS-AI').setLevel(args.log_level.upper())
+
+    from src.llm import count_tokens
+    from src.llm.openrouter_client import OpenRouterClient
+    from src.main import app
+    from src.service.auth import get_current_user
+    from src.service.chat.context_window import context_window
+    from src.service.chat.session_store import session_store
+    logging.getLogger('QUANTUM-LENS-AI').setLevel(args.log_level.upper())
+
+    app.dependency_overrides[get_current_user] = lambda: {'id': 1, 'email': 'benchmark@example.com', 'name': 'Benchmark'}
+    session_store.init_db()
+
+    prompts: List[Dict[str, Any]] = []
+    original = OpenRouterClient.generate_completion_async
+
+    @functools.wraps(original)
+    async def recording(self, messages, *rest, prompt_type=None, **kwargs):
+        if prompt_type is None:
+            # Every chat prompt ends with the user message, which names its turn.
+            turn = int(messages[-1]['content'].split(':', 1)[0].split()[-1])
+            prompts.append({'turn': turn, 'tokens': sum(count_tokens(message['content']) for message in messages)})
+        return await original(self, messages, *rest, prompt_type=prompt_type, **kwargs)
+    OpenRouterClient.generate_completion_async = recording
+
+    results = {}
+
+    # One event loop for both runs: the LLM client's connection pool is bound to the loop that opened it.
+    async def run_all():
+        try:
+            for name, budget in (('unmanaged', 10 ** 9), (f"budget {args.token_budget}", args.token_budget)):
+                context_window.token_budget = budget
+                prompts.clear()
+                stub.reset()
+                result = await run_sessions(app, args.sessions, args.turns, args.words, args.seed)
+                results[name] = {
+                    'statuses': result['statuses'],
+                    'digest_calls': stub.stats().get('digest', 0),
+                    'buckets': summarize(result, prompts, args.turns, args.bucket)
+                }
+        finally:
+            await session_store.close()
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        OpenRouterClient.generate_completion_async = original
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'config': vars(args), 'results': results, 'context_window': context_window.stats()}
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0 if all(set(result['statuses']) == {200} for result in results.values()) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Measure /auth/login throughput and latency with password hashing inline on the event loop and on the worker pool.
+
+While the logins run, a probe requests GET / every few milliseconds. Its latency is counted from when the request
+was due, so it includes any time the event loop was blocked. Runs offline against a SQLite users table.
+
+    python -m benchmarks.run_login --users 50 --logins 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run_pipeline import _OFFLINE_ENV, asgi_request, percentile
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000
+    }
+
+async def run_logins(app, users: List[Dict[str, str]], logins: int, concurrency: int, probe_interval: float) -> Dict[str, Any]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for position in range(logins):
+        queue.put_nowait(users[position % len(users)])
+    login_latencies: List[float] = []
+    probe_latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    done = asyncio.Event()
+
+    async def worker():
+        while True:
+            try:
+                user = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            response = await asgi_request(app, 'POST', '/api/v1/auth/login', user)
+            login_latencies.append(response['elapsed'])
+            statuses[response['status']] = statuses.get(response['status'], 0) + 1
+
+    async def probe():
+        while not done.is_set():
+            due = time.perf_counter() + probe_interval
+            await asyncio.sleep(probe_interval)
+            await asgi_request(app, 'GET', '/', {})
+            probe_latencies.append(time.perf_counter() - due)
+
+    started = time.perf_counter()
+    probe_task = asyncio.create_task(probe())
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+    done.set()
+    await probe_task
+    return {
+        'logins': logins,
+        'statuses': statuses,
+        'wall_time': wall_time,
+        'throughput_rps': logins / wall_time if wall_time else 0.0,
+        'login': _latency_summary(login_latencies),
+        'probe': _latency_summary(probe_latencies)
+    }
+
+async def seed_users(repository, users: List[Dict[str, str]], hashes: List[str]):
+    for i, (user, hashed) in enumerate(zip(users, hashes)):
+        await repository.create(f"User {i}", user['email'], hashed)
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    print(f"\n{'hashing':<16}{'logins/s':>10}{'p50':>10}{'p99':>10}{'probes':>8}{'probe p50':>12}{'probe p99':>12}{'probe max':>12}   (ms)")
+    for name, result in results.items():
+        login, probe = result['login'], result['probe']
+        print(f"{name:<16}{result['throughput_rps']:>10.1f}{login['p50_ms']:>10.1f}{login['p99_ms']:>10.1f}"
+              f"{probe['count']:>8}{probe['p50_ms']:>12.1f}{probe['p99_ms']:>12.1f}{probe['max_ms']:>12.1f}")
+    for name, result in results.items():
+        print(f"{name}: statuses={result['statuses']}")
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Login throughput with inline and pooled password hashing")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--warmup', type=int, default=None, help="Unrecorded logins before each run (default: --concurrency)")
+    parser.add_argument('--workers', type=int, default=4, help="Hashing pool size for the pooled run")
+    parser.add_argument('--processes', action='store_true', help="Use a process pool for the pooled run")
+    parser.add_argument('--probe-interval-ms', type=float, default=5.0)
+    parser.add_argument('--output', default=None, help="Also write the report as JSON to this path")
+    parser.add_argument('--log-level', default='CRITICAL')
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    for name, value in _OFFLINE_ENV.items():
+        os.environ.setdefault(name, value)
+    # Enough queue for every concurrent login, so the comparison measures latency rather than shedding.
+    os.environ['PASSWORD_HASH_MAX_QUEUE'] = str(max(args.concurrency * 2, 64))
+    logging.getLogger('QUANTUM-LENS-AI').setLevel(args.log_level.upper())
+
+    from benchmarks.dataset import SQLiteMetadataDB
+    from src.api import auth_routes
+    from src.db.repositories import UserRepository
+    from src.main import app
+    from src.service.auth.password_hasher import hash_password, password_hasher
+    logging.getLogger('QUANTUM-LENS-AI').setLevel(args.log_level.upper())
+
+    users = [{'email': f"user{i}@example.com", 'password': f"benchmark-password-{i}"} for i in range(args.users)]
+    with tempfile.TemporaryDirectory(prefix='ql-login-') as workdir:
+        store = SQLiteMetadataDB(os.path.join(workdir, 'users.sqlite3'))
+        with ThreadPoolExecutor() as pool:
+            hashes = list(pool.map(lambda user: hash_password(user['password'], password_hasher.method), users))
+        auth_routes.auth_service.users = UserRepository(store)
+        asyncio.run(seed_users(auth_routes.auth_service.users, users, hashes))
+
+        results = {}
+        pooled = f"{args.workers} {'processes' if args.processes else 'threads'}"
+        for name, workers in (('inline', 0), (pooled, args.workers)):
+            password_hasher.shutdown(wait=True)
+            password_hasher.workers = workers
+            password_hasher.use_processes = args.processes
+            # Starts the pool's workers, which for processes means spawning interpreters.
+            asyncio.run(run_logins(app, users, args.warmup if args.warmup is not None else args.concurrency,
+                                   args.concurrency, args.probe_interval_ms / 1000))
+            results[name] = asyncio.run(run_logins(app, users, args.logins, args.concurrency, args.probe_interval_ms / 1000))
+        password_hasher.shutdown(wait=True)
+        store.close()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2, default=str)
+    return 0 if all(set(result['statuses']) == {200} for result in results.values()) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
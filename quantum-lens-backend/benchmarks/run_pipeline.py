@@ -0,0 +1,365 @@
+"""Replay the question corpus through the FastAPI app and report per-stage latency.
+
+Runs offline: completions come from the local stub server and queries run against a SQLite copy of
+the fixture dataset, unless --llm-url or --database mysql point it at real services.
+
+    python -m benchmarks.run_pipeline --rounds 5 --concurrency 8 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.stub_llm import DEFAULT_CORPUS, StubLLMServer
+
+# Defaults that let the app import without a metadata database or an OpenRouter key.
+_OFFLINE_ENV = {
+    'DB_HOST': '127.0.0.1',
+    'DB_PORT': '3306',
+    'DB_USER': 'benchmark',
+    'DB_NAME': 'benchmark',
+    'JWT_SECRET': 'benchmark',
+    'OPENROUTER_API_KEY': 'benchmark',
+    'SITE_URL': 'http://localhost',
+    'SITE_NAME': 'benchmark',
+    # Rate limits would measure the configured quota rather than the pipeline; export these to include them.
+    'LLM_GLOBAL_RPS': '0',
+    'LLM_GLOBAL_TPM': '0',
+    'LLM_PROJECT_RPS': '0',
+    'LLM_PROJECT_TPM': '0'
+}
+
+class StageRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, elapsed: float):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'mean_ms': sum(values) / len(values) * 1000,
+                'p50_ms': percentile(values, 0.50) * 1000,
+                'p95_ms': percentile(values, 0.95) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000,
+                'max_ms': values[-1] * 1000
+            }
+            for stage, values in sorted(samples.items())
+        }
+
+def percentile(ordered: List[float], q: float) -> float:
+    # Nearest-rank on an already sorted list.
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))]
+
+def _timed(recorder: StageRecorder, stage_of: Callable[..., str], fn: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                recorder.record(stage_of(*args, **kwargs), time.perf_counter() - started)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.record(stage_of(*args, **kwargs), time.perf_counter() - started)
+    return wrapper
+
+def _timed_stream(recorder: StageRecorder, stage_of: Callable[..., str], fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        stream = fn(*args, **kwargs)
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            await stream.aclose()
+            recorder.record(stage_of(*args, **kwargs), time.perf_counter() - started)
+    return wrapper
+
+def _sandbox_stage(key, fn, *args, **kwargs) -> str:
+    # SQLService._call_sandbox(project_id, db_config, operation, ...) names the sandbox operation third.
+    if getattr(fn, '__name__', '') == '_call_sandbox' and len(args) > 2:
+        return f"sandbox.{args[2]}"
+    return f"sandbox.{getattr(fn, '__name__', 'call')}"
+
+def instrument(recorder: StageRecorder):
+    """Wrap the pipeline stages the app goes through for /sql/process and /sql/process/sse."""
+    from src.api import sql_routes
+    from src.db.executor import sandbox_executor
+    from src.llm.openrouter_client import OpenRouterClient
+    from src.service.sql.intent_classifier import intent_classifier
+
+    sql_routes._project_schema = _timed(recorder, lambda *a, **k: 'schema', sql_routes._project_schema)
+    sql_routes._store_result = _timed(recorder, lambda *a, **k: 'result_store', sql_routes._store_result)
+    intent_classifier.classify = _timed(recorder, lambda *a, **k: 'intent.local', intent_classifier.classify)
+    sandbox_executor.run = _timed(recorder, _sandbox_stage, sandbox_executor.run)
+    OpenRouterClient.generate_sql_completion = _timed(
+        recorder, lambda self, prompt_type, *a, **k: f"llm.{prompt_type}", OpenRouterClient.generate_sql_completion
+    )
+    OpenRouterClient.stream_sql_completion = _timed_stream(
+        recorder, lambda self, prompt_type, *a, **k: f"llm.{prompt_type}.stream", OpenRouterClient.stream_sql_completion
+    )
+
+async def asgi_request(app, method: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Call the ASGI app directly, noting when the first body bytes arrive as well as when it finishes."""
+    body = json.dumps(payload).encode('utf-8')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('ascii'),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'benchmark'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('ascii'))],
+        'client': ('127.0.0.1', 0),
+        'server': ('benchmark', 80)
+    }
+    sent = False
+    finished = asyncio.Event()
+    started = time.perf_counter()
+    response = {'status': None, 'first_byte': None, 'size': 0, 'body': []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            chunk = message.get('body', b'')
+            if chunk and response['first_byte'] is None:
+                response['first_byte'] = time.perf_counter() - started
+            response['size'] += len(chunk)
+            response['body'].append(chunk)
+            if not message.get('more_body', False):
+                finished.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        finished.set()
+    response['elapsed'] = time.perf_counter() - started
+    response['body'] = b''.join(response['body'])
+    return response
+
+def _expected_status(entry: Dict[str, Any], mode: str) -> int:
+    # Failed queries come back as a 400 from /sql/process; the SSE endpoint reports them as events.
+    return 400 if entry.get('expect_error') and mode == 'process' else 200
+
+async def replay(app, corpus: List[Dict[str, Any]], recorder: StageRecorder, args,
+                 on_warmup_done: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    path = '/api/v1/sql/process' if args.mode == 'process' else '/api/v1/sql/process/sse'
+
+    def workload(rounds: int) -> List[Dict[str, Any]]:
+        entries = [entry for _ in range(rounds) for entry in corpus]
+        rng.shuffle(entries)
+        return entries
+
+    async def run(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for position, entry in enumerate(entries):
+            queue.put_nowait((position, entry))
+        outcomes = {'ok': 0, 'unexpected': 0, 'statuses': {}}
+
+        async def worker():
+            while True:
+                try:
+                    position, entry = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                payload = {'message': entry['question'], 'project_id': 1 + position % args.projects}
+                if args.page_size:
+                    payload['page_size'] = args.page_size
+                response = await asgi_request(app, 'POST', path, payload)
+                recorder.record('request', response['elapsed'])
+                if response['first_byte'] is not None:
+                    recorder.record('first_byte', response['first_byte'])
+                status = response['status']
+                outcomes['statuses'][status] = outcomes['statuses'].get(status, 0) + 1
+                if status == _expected_status(entry, args.mode):
+                    outcomes['ok'] += 1
+                else:
+                    outcomes['unexpected'] += 1
+                    if args.show_errors:
+                        print(f"Unexpected {status} for {entry['question']!r}: {response['body'][:300]!r}", file=sys.stderr)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        outcomes['wall_time'] = time.perf_counter() - started
+        return outcomes
+
+    if args.warmup:
+        await run(workload(args.warmup))
+        recorder.reset()
+        if on_warmup_done is not None:
+            on_warmup_done()
+
+    entries = workload(args.rounds)
+    outcomes = await run(entries)
+    outcomes['requests'] = len(entries)
+    outcomes['throughput_rps'] = len(entries) / outcomes['wall_time'] if outcomes['wall_time'] else 0.0
+    return outcomes
+
+def _prepare_database(args, workdir: str):
+    from benchmarks.dataset import FixtureProjectService, SQLiteSandbox, introspect_sqlite, load_mysql, load_sqlite
+
+    if args.database == 'sqlite':
+        from src.db import sandbox_pool
+        path = os.path.join(workdir, 'benchmark.sqlite3')
+        counts = load_sqlite(path, args.scale, args.seed)
+        SQLiteSandbox.database_path = path
+        # The sandbox pool builds its connections through this name.
+        sandbox_pool.MySQLSandbox = SQLiteSandbox
+        schema = introspect_sqlite(path)
+        db_config = dict(schema['database_info'])
+    else:
+        db_config = {
+            'host': args.mysql_host,
+            'port': args.mysql_port,
+            'user': args.mysql_user,
+            'password': args.mysql_password,
+            'database': args.mysql_database
+        }
+        counts = {} if args.skip_load else load_mysql(db_config, args.scale, args.seed)
+        service = FixtureProjectService(db_config, {})
+        schema = service._introspect_database(0, db_config)
+
+    return FixtureProjectService(db_config, schema), counts
+
+def print_report(report: Dict[str, Any]):
+    outcomes = report['outcomes']
+    print(f"\nrequests={outcomes['requests']} ok={outcomes['ok']} unexpected={outcomes['unexpected']} "
+          f"statuses={outcomes['statuses']}")
+    print(f"wall_time={outcomes['wall_time']:.2f}s throughput={outcomes['throughput_rps']:.2f} req/s "
+          f"concurrency={report['config']['concurrency']} mode={report['config']['mode']}")
+    print(f"llm_calls={report['llm_calls']}\n")
+    print(f"{'stage':<28}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for stage, row in report['stages'].items():
+        print(f"{stage:<28}{row['count']:>8}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark for the /sql/process pipeline")
+    parser.add_argument('--mode', choices=('process', 'sse'), default='process', help="Endpoint to replay against")
+    parser.add_argument('--rounds', type=int, default=5, help="Times the corpus is replayed")
+    parser.add_argument('--warmup', type=int, default=1, help="Unrecorded rounds before measuring")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--projects', type=int, default=1, help="Spread requests over this many project ids")
+    parser.add_argument('--page-size', type=int, default=None)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--llm-url', default=None, help="Use an already running OpenAI-compatible server instead of the stub")
+    parser.add_argument('--llm-latency-ms', type=float, default=200.0)
+    parser.add_argument('--llm-jitter-ms', type=float, default=50.0)
+    parser.add_argument('--llm-token-delay-ms', type=float, default=0.0)
+    parser.add_argument('--llm-cache', action='store_true', help="Keep the completion cache on (off by default so every request reaches the LLM)")
+    parser.add_argument('--query-cache', action='store_true', help="Keep the query result cache on (off by default so every query reaches the database)")
+    parser.add_argument('--database', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--scale', type=float, default=1.0, help="Fixture size; 1.0 is about 5k orders")
+    parser.add_argument('--skip-load', action='store_true', help="Reuse fixture tables already loaded into MySQL")
+    parser.add_argument('--mysql-host', default='127.0.0.1')
+    parser.add_argument('--mysql-port', type=int, default=3306)
+    parser.add_argument('--mysql-user', default='root')
+    parser.add_argument('--mysql-password', default='')
+    parser.add_argument('--mysql-database', default='quantum_lens_benchmark')
+    parser.add_argument('--output', default=None, help="Also write the report as JSON to this path")
+    parser.add_argument('--show-errors', action='store_true')
+    parser.add_argument('--log-level', default='CRITICAL', help="App log level while replaying; expected failures log errors")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+
+    stub = None
+    if args.llm_url:
+        base_url = args.llm_url
+    else:
+        stub = StubLLMServer(corpus, args.llm_latency_ms / 1000, args.llm_jitter_ms / 1000,
+                             token_delay=args.llm_token_delay_ms / 1000, seed=args.seed)
+        base_url = stub.start()
+
+    for name, value in _OFFLINE_ENV.items():
+        os.environ.setdefault(name, value)
+    os.environ['OPENROUTER_BASE_URL'] = base_url
+    os.environ['LLM_CACHE_ENABLED'] = 'true' if args.llm_cache else 'false'
+    os.environ.pop('LLM_CACHE_SQLITE_PATH', None)
+    os.environ['QUERY_CACHE_ENABLED'] = 'true' if args.query_cache else 'false'
+    logging.getLogger('QUANTUM-LENS-AI').setLevel(args.log_level.upper())
+
+    # Everything under src reads its configuration at import time, so it is imported only now.
+    from src.db.executor import sandbox_executor
+    from src.db.sandbox_pool import sandbox_registry
+    from src.main import app
+    from src.api.sql_routes import get_project_service
+    from src.service.auth import get_current_user
+    logging.getLogger('QUANTUM-LENS-AI').setLevel(args.log_level.upper())
+
+    with tempfile.TemporaryDirectory(prefix='ql-bench-') as workdir:
+        project_service, counts = _prepare_database(args, workdir)
+        app.dependency_overrides[get_current_user] = lambda: {'id': 1, 'email': 'benchmark@example.com', 'name': 'Benchmark'}
+        app.dependency_overrides[get_project_service] = lambda: project_service
+
+        recorder = StageRecorder()
+        instrument(recorder)
+        try:
+            outcomes = asyncio.run(replay(app, corpus, recorder, args, stub.reset if stub is not None else None))
+        finally:
+            sandbox_executor.shutdown()
+            sandbox_registry.close()
+            if stub is not None:
+                stub.stop()
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'mysql_password'},
+        'dataset': counts,
+        'outcomes': outcomes,
+        'llm_calls': stub.stats() if stub is not None else None,
+        'stages': recorder.summary()
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0 if outcomes['unexpected'] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""OpenAI-compatible chat completions server with scripted answers and configurable latency.
+
+Run standalone with ``python -m benchmarks.stub_llm --port 8089`` and point OPENROUTER_BASE_URL at
+``http://127.0.0.1:8089/v1``, or start it in-process with StubLLMServer.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'questions.json')
+
+# Matched against the system prompt to tell which pipeline step is calling.
+_PROMPT_MARKERS = (
+    ('intent', 'database query classifier'),
+    ('error', 'SQL error analyzer'),
+    ('comprehensive', 'smart database assistant'),
+    ('digest', 'conversation summarizer')
+)
+
+_UNKNOWN_RESPONSE = {
+    'is_sql_query': False,
+    'response': "I help with database questions. Is there anything about your data I can help you with?",
+    'confidence': 0.5,
+    'reasoning': 'not in the benchmark corpus'
+}
+
+def prompt_type_of(system_prompt: str) -> str:
+    for prompt_type, marker in _PROMPT_MARKERS:
+        if marker.lower() in system_prompt.lower():
+            return prompt_type
+    return 'other'
+
+class StubLLMServer:
+    def __init__(self, corpus: List[Dict[str, Any]], latency: float = 0.0, jitter: float = 0.0,
+                 latencies: Optional[Dict[str, float]] = None, token_delay: float = 0.0,
+                 prompt_delay: float = 0.0, host: str = '127.0.0.1', port: int = 0, seed: int = 7):
+        self.latency = latency
+        self.jitter = jitter
+        self.latencies = latencies or {}
+        self.token_delay = token_delay
+        # Extra delay per 1000 prompt tokens, for models whose latency grows with the prompt.
+        self.prompt_delay = prompt_delay
+        # Longest questions first, so a question that contains a shorter one still matches itself.
+        self._corpus = sorted(corpus, key=lambda entry: -len(entry['question']))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-llm', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._hits)
+
+    def reset(self):
+        with self._lock:
+            self._hits.clear()
+
+    def reply(self, messages: List[Dict[str, str]]) -> tuple:
+        system = next((message['content'] for message in messages if message.get('role') == 'system'), '')
+        user = '\n'.join(message['content'] for message in messages if message.get('role') == 'user')
+        prompt_type = prompt_type_of(system)
+        entry = self._match(user)
+
+        if prompt_type == 'intent':
+            intent = (entry or {}).get('intent') or {'is_sql_query': entry is not None, 'confidence': 0.9, 'reasoning': 'scripted'}
+            content = json.dumps(intent)
+        elif prompt_type == 'error':
+            content = (entry or {}).get('error_analysis') or 'The query failed; check table and column names against the schema.'
+        elif prompt_type == 'digest':
+            content = f"Notes so far: {user[-600:]}"
+        else:
+            content = json.dumps((entry or {}).get('response') or _UNKNOWN_RESPONSE)
+
+        with self._lock:
+            self._hits[prompt_type] = self._hits.get(prompt_type, 0) + 1
+        return prompt_type, content
+
+    def delay_for(self, prompt_type: str, prompt_tokens: int = 0) -> float:
+        base = self.latencies.get(prompt_type, self.latency) + self.prompt_delay * prompt_tokens / 1000
+        with self._lock:
+            offset = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, base + offset)
+
+    def _match(self, text: str) -> Optional[Dict[str, Any]]:
+        for entry in self._corpus:
+            question = entry['question']
+            # The comprehensive prompt embeds the question JSON-encoded.
+            if question in text or json.dumps(question)[1:-1] in text:
+                return entry
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._json(200, {'object': 'list', 'data': [{'id': 'stub', 'object': 'model'}]})
+                else:
+                    self._json(404, {'error': {'message': 'not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._json(404, {'error': {'message': 'not found'}})
+                    return
+
+                prompt_type, content = server.reply(body.get('messages') or [])
+                time.sleep(server.delay_for(prompt_type, length // 4))
+                model = body.get('model') or 'stub'
+                if body.get('stream'):
+                    self._stream(model, content)
+                    return
+                self._json(200, {
+                    'id': 'chatcmpl-stub',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                    'usage': {'prompt_tokens': length // 4, 'completion_tokens': len(content) // 4,
+                              'total_tokens': (length + len(content)) // 4}
+                })
+
+            def _json(self, status: int, payload: Dict[str, Any]):
+                out = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def _stream(self, model: str, content: str):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                for offset in range(0, len(content), 16):
+                    chunk = {
+                        'id': 'chatcmpl-stub',
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': content[offset:offset + 16]}, 'finish_reason': None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve scripted OpenAI-compatible completions for benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help="Question corpus with scripted answers")
+    parser.add_argument('--latency-ms', type=float, default=300.0, help="Delay before each completion")
+    parser.add_argument('--jitter-ms', type=float, default=50.0, help="Uniform +/- jitter on the delay")
+    parser.add_argument('--token-delay-ms', type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument('--prompt-delay-ms', type=float, default=0.0, help="Extra delay per 1000 prompt tokens")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    stub = StubLLMServer(corpus, args.latency_ms / 1000, args.jitter_ms / 1000,
+                         token_delay=args.token_delay_ms / 1000, prompt_delay=args.prompt_delay_ms / 1000,
+                         host=args.host, port=args.port)
+    print(f"Stub LLM listening on {stub.base_url}")
+    try:
+        stub.serve()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, EmailStr
 from ..service.auth import AuthService
 from ..utils import logger
+from ..utils.exceptions import ServiceUnavailableError
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -32,8 +33,10 @@ class UserResponse(BaseModel):
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate):
     try:
-        result = auth_service.register_user(user_data.dict())
+        result = await auth_service.register_user(user_data.dict())
         return result
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=e.detail)
     except Exception as e:
         logger.error(f"Registration failed: {str(e)}")
         raise HTTPException(
@@ -45,7 +48,7 @@ async def register(user_data: UserCreate):
 async def login(credentials: UserLogin):
     try:
         logger.info(f"Login attempt for email: {credentials.email}")
-        result = auth_service.login_user(credentials.dict())
+        result = await auth_service.login_user(credentials.dict())
         if not result:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -53,6 +56,8 @@ async def login(credentials: UserLogin):
                 headers={"WWW-Authenticate": "Bearer"},
             )
         return result
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=e.detail)
     except Exception as e:
         logger.error(f"Login failed: {str(e)}")
         raise HTTPException(
@@ -63,7 +68,7 @@ async def login(credentials: UserLogin):
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(token: str = Depends(oauth2_scheme)):
-    user = auth_service.verify_token(token)
+    user = await auth_service.verify_token(token)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,15 +80,17 @@ async def get_current_user_info(token: str = Depends(oauth2_scheme)):
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(profile_data: ProfileUpdate, token: str = Depends(oauth2_scheme)):
     try:
-        current_user = auth_service.verify_token(token)
+        current_user = await auth_service.verify_token(token)
         if not current_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired token",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        result = auth_service.update_profile(current_user['id'], profile_data.dict(exclude_unset=True))
+        result = await auth_service.update_profile(current_user['id'], profile_data.dict(exclude_unset=True))
         return result
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=e.detail)
     except Exception as e:
         logger.error(f"Profile update failed: {str(e)}")
         raise HTTPException(
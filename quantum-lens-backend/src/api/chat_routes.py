@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from src.api.sse import SSE_HEADERS, sse_events
 from src.service.auth.auth_middleware import get_current_user
 from src.service.chat.chat_service import ChatService
 from src.utils.exceptions import ValidationError
-from typing import List, Dict
-from pydantic import BaseModel
+from typing import List, Dict, Optional
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 chat_service = ChatService()
@@ -15,6 +17,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     project_id: int
+    session_id: Optional[str] = Field(None, description="Continue this session; send only the new messages")
 
 class ChatResponse(BaseModel):
     response: str
@@ -30,38 +33,74 @@ async def get_chat_completion(
         response = await chat_service.get_completion(
             messages=messages,
             project_id=chat_request.project_id,
-            user_id=current_user["id"]
+            user_id=current_user["id"],
+            session_id=chat_request.session_id
         )
         return response
     except ValidationError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=e.detail)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/chat/completion/stream")
+async def stream_chat_completion(
+    chat_request: ChatRequest,
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    if not chat_request.messages:
+        raise HTTPException(status_code=400, detail="Messages list cannot be empty")
+    messages = [{"role": msg.role, "content": msg.content} for msg in chat_request.messages]
+    events = chat_service.stream_completion(
+        messages=messages,
+        project_id=chat_request.project_id,
+        user_id=current_user["id"],
+        session_id=chat_request.session_id
+    )
+    return StreamingResponse(sse_events(events, request), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/chat/sessions/{project_id}", response_model=List[Dict])
 async def get_chat_sessions(
     project_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="Sessions per page, newest first"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
     current_user = Depends(get_current_user)
 ):
     try:
-        sessions = await chat_service.get_sessions(
+        sessions, next_cursor = await chat_service.get_sessions(
             project_id=project_id,
-            user_id=current_user["id"]
+            user_id=current_user["id"],
+            limit=limit,
+            cursor=cursor
         )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return sessions
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/chat/messages/{session_id}", response_model=List[ChatMessage])
 async def get_chat_messages(
     session_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="Messages per page, oldest first"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
     current_user = Depends(get_current_user)
 ):
     try:
-        messages = await chat_service.get_messages(
+        messages, next_cursor = await chat_service.get_messages(
             session_id=session_id,
-            user_id=current_user["id"]
+            user_id=current_user["id"],
+            limit=limit,
+            cursor=cursor
         )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return messages
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
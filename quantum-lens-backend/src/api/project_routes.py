@@ -39,7 +39,7 @@ class DatabaseInfoResponse(BaseModel):
 @router.post("", response_model=ProjectResponse)
 async def create_project(project_data: ProjectCreate, current_user: dict = Depends(get_current_user)):
     try:
-        result = project_service.create_project(current_user["id"], project_data.dict())
+        result = await project_service.create_project(current_user["id"], project_data.dict())
         return result
     except Exception as e:
         logger.error(f"Project creation failed: {str(e)}")
@@ -48,7 +48,7 @@ async def create_project(project_data: ProjectCreate, current_user: dict = Depen
 @router.get("", response_model=List[ProjectResponse])
 async def get_projects(current_user: dict = Depends(get_current_user)):
     try:
-        return project_service.get_user_projects(current_user["id"])
+        return await project_service.get_user_projects(current_user["id"])
     except Exception as e:
         logger.error(f"Failed to fetch projects: {str(e)}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -56,7 +56,7 @@ async def get_projects(current_user: dict = Depends(get_current_user)):
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(project_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        project = project_service.get_project(project_id, current_user["id"])
+        project = await project_service.get_project(project_id, current_user["id"])
         if not project:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
         return project
@@ -69,7 +69,7 @@ async def get_project(project_id: int, current_user: dict = Depends(get_current_
 @router.put("/{project_id}", response_model=ProjectResponse)
 async def update_project(project_id: int, project_data: ProjectUpdate, current_user: dict = Depends(get_current_user)):
     try:
-        project = project_service.update_project(project_id, current_user["id"], project_data.dict(exclude_unset=True))
+        project = await project_service.update_project(project_id, current_user["id"], project_data.dict(exclude_unset=True))
         if not project:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
         return project
@@ -82,7 +82,7 @@ async def update_project(project_id: int, project_data: ProjectUpdate, current_u
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_project(project_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        if not project_service.delete_project(project_id, current_user["id"]):
+        if not await project_service.delete_project(project_id, current_user["id"]):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     except HTTPException:
         raise
@@ -93,7 +93,7 @@ async def delete_project(project_id: int, current_user: dict = Depends(get_curre
 @router.get("/{project_id}/database-info", response_model=DatabaseInfoResponse)
 async def get_database_info(project_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        return project_service.get_database_info(project_id, current_user["id"])
+        return await project_service.get_database_info(project_id, current_user["id"])
     except Exception as e:
         logger.error(f"Failed to fetch database info: {str(e)}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) 
\ No newline at end of file
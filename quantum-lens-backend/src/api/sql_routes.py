@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Dict, Any, AsyncIterator, List, Optional
 from pydantic import BaseModel, Field, validator
+import asyncio
 import json
 import base64
+from src.api.sse import SSE_HEADERS, sse_events
 from src.service.auth import get_current_user
 from src.service.sql.sql_service import SQLService
+from src.service.sql.result_store import result_store, validate_formats
 from src.service.projects.project_service import ProjectService
 from src.llm import OpenRouterClient
 from src.utils import logger
+from src.utils.exceptions import ValidationError
+from src.utils.metrics import span
 
 router = APIRouter(prefix="/sql", tags=["SQL"])
 
@@ -15,6 +22,8 @@ class SQLRequest(BaseModel):
     message: str = Field(..., min_length=1, description="The SQL query or question")
     project_id: int = Field(..., gt=0, description="The project ID")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
+    formats: Optional[List[str]] = Field(None, description="Rendered result formats to include inline (csv, html, json)")
+    page_size: Optional[int] = Field(None, gt=0, description="Rows per result page for SELECT queries")
     
     @validator('message')
     def validate_message(cls, v):
@@ -28,61 +37,116 @@ class SQLRequest(BaseModel):
             raise ValueError('Project ID must be a positive integer')
         return v
 
+    @validator('formats')
+    def validate_formats(cls, v):
+        try:
+            return validate_formats(v)
+        except ValidationError as e:
+            raise ValueError(e.detail)
+
+class SQLPageRequest(BaseModel):
+    project_id: int = Field(..., gt=0, description="The project ID")
+    cursor: str = Field(..., min_length=1, description="Continuation token returned with a previous page")
+    formats: Optional[List[str]] = Field(None, description="Rendered result formats to include inline (csv, html, json)")
+
+    @validator('formats')
+    def validate_formats(cls, v):
+        try:
+            return validate_formats(v)
+        except ValidationError as e:
+            raise ValueError(e.detail)
+
+sql_service = SQLService(OpenRouterClient.get_instance())
+
 def get_sql_service() -> SQLService:
-    llm_client = OpenRouterClient.get_instance()
-    return SQLService(llm_client)
+    return sql_service
 
 def get_project_service() -> ProjectService:
     return ProjectService()
 
+async def _store_result(result: Dict[str, Any], user_id: int, formats: Optional[List[str]]):
+    query_result = result["content"]["result"]
+    result_id = result_store.put(user_id, query_result["rows"], query_result["columns"])
+    query_result["result_id"] = result_id
+    if formats and result_id:
+        loop = asyncio.get_running_loop()
+        query_result["formats"] = await loop.run_in_executor(
+            None, result_store.render_many, result_id, user_id, formats
+        )
+
+async def _ndjson_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for event in events:
+        yield (json.dumps(event, default=str) + "\n").encode('utf-8')
+
+async def _project_schema(project_id: int, user_id: int, project_service: ProjectService) -> Dict[str, Any]:
+    with span('project.get'):
+        project = await project_service.get_project(project_id, user_id)
+    if not project:
+        logger.error(f"Project {project_id} not found for user {user_id}")
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    logger.debug(f"Project found: {project.get('name', 'Unknown')}")
+
+    try:
+        encrypted_path = project.get('encrypted_path')
+        if not encrypted_path:
+            logger.error(f"No encrypted_path found in project {project_id}")
+            raise ValueError("No encrypted path found")
+        
+        logger.debug("Decoding project configuration...")
+        project_data = json.loads(base64.b64decode(encrypted_path).decode('utf-8'))
+        if not project_data or not project_data.get('dbConfig'):
+            logger.error(f"Invalid project data format or missing dbConfig for project {project_id}")
+            logger.debug(f"Decoded project data keys: {list(project_data.keys()) if project_data else 'None'}")
+            raise ValueError("Invalid project data format or missing dbConfig")
+    except Exception as e:
+        logger.error(f"Failed to decode project data for project {project_id}: {e}")
+        raise HTTPException(status_code=400, detail="Invalid project configuration")
+
+    logger.debug("Getting database schema information...")
+    try:
+        with span('schema.fetch'):
+            schema_info = await project_service.get_database_info(project_id, user_id)
+        logger.debug(f"Schema info retrieved: {len(schema_info.get('tables', []))} tables found")
+    except Exception as e:
+        logger.error(f"Failed to get database info for project {project_id}: {e}")
+        raise HTTPException(status_code=400, detail=f"Database connection failed: {str(e)}")
+
+    return schema_info
+
 @router.post("/process")
 async def process_sql_request(
     request: SQLRequest,
+    stream: bool = Query(False, description="Stream result rows as NDJSON while they are read"),
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Rows per streamed chunk"),
     current_user: dict = Depends(get_current_user),
     sql_service: SQLService = Depends(get_sql_service),
     project_service: ProjectService = Depends(get_project_service)
-) -> Dict[str, Any]:
+):
     try:
         logger.info(f"Processing SQL request for project {request.project_id}, user {current_user['id']}")
         logger.debug(f"Request message: {request.message}")
         
-        project = project_service.get_project(request.project_id, current_user["id"])
-        if not project:
-            logger.error(f"Project {request.project_id} not found for user {current_user['id']}")
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        logger.debug(f"Project found: {project.get('name', 'Unknown')}")
+        schema_info = await _project_schema(request.project_id, current_user["id"], project_service)
 
-        try:
-            encrypted_path = project.get('encrypted_path')
-            if not encrypted_path:
-                logger.error(f"No encrypted_path found in project {request.project_id}")
-                raise ValueError("No encrypted path found")
-            
-            logger.debug("Decoding project configuration...")
-            project_data = json.loads(base64.b64decode(encrypted_path).decode('utf-8'))
-            if not project_data or not project_data.get('dbConfig'):
-                logger.error(f"Invalid project data format or missing dbConfig for project {request.project_id}")
-                logger.debug(f"Decoded project data keys: {list(project_data.keys()) if project_data else 'None'}")
-                raise ValueError("Invalid project data format or missing dbConfig")
-        except Exception as e:
-            logger.error(f"Failed to decode project data for project {request.project_id}: {e}")
-            raise HTTPException(status_code=400, detail="Invalid project configuration")
-
-        logger.debug("Getting database schema information...")
-        try:
-            schema_info = project_service.get_database_info(request.project_id, current_user["id"])
-            logger.debug(f"Schema info retrieved: {len(schema_info.get('tables', []))} tables found")
-        except Exception as e:
-            logger.error(f"Failed to get database info for project {request.project_id}: {e}")
-            raise HTTPException(status_code=400, detail=f"Database connection failed: {str(e)}")
+        if stream:
+            logger.debug("Streaming message results with SQL service...")
+            events = sql_service.stream_message(
+                message=request.message,
+                project_id=str(request.project_id),
+                schema=schema_info,
+                context=request.context,
+                chunk_size=chunk_size
+            )
+            return StreamingResponse(_ndjson_events(events), media_type="application/x-ndjson")
 
         logger.debug("Processing message with SQL service...")
         result = await sql_service.process_message(
             message=request.message,
             project_id=str(request.project_id),
             schema=schema_info,
-            context=request.context
+            context=request.context,
+            page_size=request.page_size
         )
 
         if not result["success"]:
@@ -92,11 +156,98 @@ async def process_sql_request(
                 detail=result["content"]["error"] if result["type"] == "error" else "Request failed"
             )
 
+        if result["type"] == "sql":
+            with span('result_store'):
+                await _store_result(result, current_user["id"], request.formats)
+
         logger.info(f"SQL request processed successfully for project {request.project_id}")
-        return result
+        with span('serialization'):
+            return JSONResponse(content=jsonable_encoder(result))
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Failed to process SQL request: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.post("/process/sse")
+async def stream_sql_analysis(
+    request: SQLRequest,
+    http_request: Request,
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Rows per streamed chunk"),
+    current_user: dict = Depends(get_current_user),
+    sql_service: SQLService = Depends(get_sql_service),
+    project_service: ProjectService = Depends(get_project_service)
+):
+    logger.info(f"Streaming SQL analysis for project {request.project_id}, user {current_user['id']}")
+    schema_info = await _project_schema(request.project_id, current_user["id"], project_service)
+    events = sql_service.stream_message(
+        message=request.message,
+        project_id=str(request.project_id),
+        schema=schema_info,
+        context=request.context,
+        chunk_size=chunk_size,
+        stream_tokens=True
+    )
+    return StreamingResponse(sse_events(events, http_request), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/page")
+async def fetch_result_page(
+    request: SQLPageRequest,
+    current_user: dict = Depends(get_current_user),
+    sql_service: SQLService = Depends(get_sql_service),
+    project_service: ProjectService = Depends(get_project_service)
+) -> Dict[str, Any]:
+    try:
+        schema_info = await project_service.get_database_info(request.project_id, current_user["id"])
+        result = await sql_service.fetch_page(str(request.project_id), schema_info, request.cursor)
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["content"]["error"])
+        await _store_result(result, current_user["id"], request.formats)
+        return result
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Failed to fetch result page: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/count")
+async def count_result_rows(
+    request: SQLPageRequest,
+    current_user: dict = Depends(get_current_user),
+    sql_service: SQLService = Depends(get_sql_service),
+    project_service: ProjectService = Depends(get_project_service)
+) -> Dict[str, Any]:
+    try:
+        schema_info = await project_service.get_database_info(request.project_id, current_user["id"])
+        result = await sql_service.count_rows(str(request.project_id), schema_info, request.cursor)
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["content"]["error"])
+        return result
+    except HTTPException:
+        raise
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    except Exception as e:
+        logger.error(f"Failed to count result rows: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/results/{result_id}")
+async def get_rendered_result(
+    result_id: str,
+    format: str = Query("csv", description="Result format: csv, html or json"),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        fmt = validate_formats([format])[0]
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+
+    try:
+        loop = asyncio.get_running_loop()
+        content, media_type = await loop.run_in_executor(None, result_store.render, result_id, current_user["id"], fmt)
+        return Response(content=content, media_type=media_type)
+    except ValidationError as e:
+        raise HTTPException(status_code=404, detail=e.detail)
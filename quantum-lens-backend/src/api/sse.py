@@ -0,0 +1,24 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi import Request
+from src.utils import logger
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+def format_sse(event: Dict[str, Any]) -> bytes:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n".encode('utf-8')
+
+async def sse_events(events: AsyncIterator[Dict[str, Any]], request: Optional[Request] = None) -> AsyncIterator[bytes]:
+    try:
+        async for event in events:
+            if request is not None and await request.is_disconnected():
+                logger.info("Client disconnected, cancelling event stream")
+                break
+            yield format_sse(event)
+    finally:
+        # Closing the producer releases its LLM stream and sandbox connection straight away.
+        await events.aclose()
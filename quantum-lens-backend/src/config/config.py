@@ -34,6 +34,129 @@ MYSQL_CONFIG = {
     'write_timeout': 30
 }
 
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'acquire_timeout': float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '10')),
+    'max_idle_time': float(os.getenv('DB_POOL_MAX_IDLE_TIME', '300')),
+    'validation_interval': float(os.getenv('DB_POOL_VALIDATION_INTERVAL', '5')),
+    'reap_interval': float(os.getenv('DB_POOL_REAP_INTERVAL', '60'))
+}
+
+SANDBOX_EXECUTOR_CONFIG = {
+    'max_workers': int(os.getenv('SANDBOX_MAX_WORKERS', '16')),
+    'per_project_concurrency': int(os.getenv('SANDBOX_PER_PROJECT_CONCURRENCY', '4')),
+    'max_queue': int(os.getenv('SANDBOX_MAX_QUEUE', '200'))
+}
+
+SANDBOX_POOL_CONFIG = {
+    'max_total_connections': int(os.getenv('SANDBOX_POOL_MAX_TOTAL', '64')),
+    'max_connections_per_project': int(os.getenv('SANDBOX_POOL_MAX_PER_PROJECT', '4')),
+    'max_projects': int(os.getenv('SANDBOX_POOL_MAX_PROJECTS', '32')),
+    'idle_timeout': float(os.getenv('SANDBOX_POOL_IDLE_TIMEOUT', '300')),
+    'acquire_timeout': float(os.getenv('SANDBOX_POOL_ACQUIRE_TIMEOUT', '10')),
+    'reap_interval': float(os.getenv('SANDBOX_POOL_REAP_INTERVAL', '60')),
+    'ping_interval': float(os.getenv('SANDBOX_PING_INTERVAL', '30'))
+}
+
+RESULT_STORE_CONFIG = {
+    'max_entries': int(os.getenv('RESULT_STORE_MAX_ENTRIES', '256')),
+    'max_total_rows': int(os.getenv('RESULT_STORE_MAX_TOTAL_ROWS', '500000')),
+    'ttl': float(os.getenv('RESULT_STORE_TTL', '900'))
+}
+
+PAGINATION_CONFIG = {
+    'page_size': int(os.getenv('SQL_PAGE_SIZE', '500')),
+    'max_page_size': int(os.getenv('SQL_MAX_PAGE_SIZE', '5000'))
+}
+
+SCHEMA_CACHE_CONFIG = {
+    'ttl': float(os.getenv('SCHEMA_CACHE_TTL', '600')),
+    'refresh_after': float(os.getenv('SCHEMA_CACHE_REFRESH_AFTER', '60')),
+    'max_entries': int(os.getenv('SCHEMA_CACHE_MAX_ENTRIES', '256'))
+}
+
+LLM_CACHE_CONFIG = {
+    'enabled': os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true',
+    'max_entries': int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1024')),
+    'default_ttl': float(os.getenv('LLM_CACHE_TTL', '3600')),
+    'prompt_ttls': {
+        name.strip(): float(ttl)
+        for name, ttl in (item.split('=', 1) for item in os.getenv('LLM_CACHE_PROMPT_TTLS', 'intent=86400').split(',') if '=' in item)
+    },
+    'sqlite_path': os.getenv('LLM_CACHE_SQLITE_PATH') or None
+}
+
+INTENT_CLASSIFIER_CONFIG = {
+    'enabled': os.getenv('INTENT_CLASSIFIER_ENABLED', 'true').lower() == 'true',
+    'min_confidence': float(os.getenv('INTENT_CLASSIFIER_MIN_CONFIDENCE', '0.85'))
+}
+
+SQL_PIPELINE_CONFIG = {
+    'mode': os.getenv('SQL_PIPELINE_MODE', 'two_call').lower()
+}
+
+SCHEMA_PRUNING_CONFIG = {
+    'enabled': os.getenv('SCHEMA_PRUNING_ENABLED', 'true').lower() == 'true',
+    'top_k': int(os.getenv('SCHEMA_PRUNING_TOP_K', '8')),
+    'max_tables': int(os.getenv('SCHEMA_PRUNING_MAX_TABLES', '20')),
+    'min_tables': int(os.getenv('SCHEMA_PRUNING_MIN_TABLES', '12')),
+    'expand_foreign_keys': os.getenv('SCHEMA_PRUNING_EXPAND_FOREIGN_KEYS', 'true').lower() == 'true',
+    'fallback': os.getenv('SCHEMA_PRUNING_FALLBACK', 'full').lower()
+}
+
+PROMPT_BUDGET_CONFIG = {
+    'default_budget': int(os.getenv('PROMPT_TOKEN_BUDGET', '6000')),
+    'budgets': {
+        name.strip(): int(budget)
+        for name, budget in (item.split('=', 1) for item in os.getenv('PROMPT_TOKEN_BUDGETS', 'intent=1500,comprehensive=12000,generator=12000').split(',') if '=' in item)
+    },
+    'max_rows': int(os.getenv('PROMPT_MAX_ROWS', '50')),
+    'max_string_length': int(os.getenv('PROMPT_MAX_STRING_LENGTH', '2000'))
+}
+
+QUERY_CACHE_CONFIG = {
+    'enabled': os.getenv('QUERY_CACHE_ENABLED', 'true').lower() == 'true',
+    'max_bytes': int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    'max_project_bytes': int(os.getenv('QUERY_CACHE_MAX_PROJECT_BYTES', '0')) or None,
+    'max_entry_bytes': int(os.getenv('QUERY_CACHE_MAX_ENTRY_BYTES', str(4 * 1024 * 1024))),
+    'ttl': float(os.getenv('QUERY_CACHE_TTL', '300'))
+}
+
+PASSWORD_HASH_CONFIG = {
+    'workers': int(os.getenv('PASSWORD_HASH_WORKERS', '4')),
+    'max_queue': int(os.getenv('PASSWORD_HASH_MAX_QUEUE', '64')),
+    'use_processes': os.getenv('PASSWORD_HASH_USE_PROCESSES', 'false').lower() == 'true',
+    'method': os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:30000')
+}
+
+IDENTITY_CACHE_CONFIG = {
+    'enabled': os.getenv('IDENTITY_CACHE_ENABLED', 'true').lower() == 'true',
+    'ttl': float(os.getenv('IDENTITY_CACHE_TTL', '60')),
+    'max_entries': int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '10000'))
+}
+
+CHAT_STORE_CONFIG = {
+    'backend': os.getenv('CHAT_STORE_BACKEND', 'mysql').lower(),
+    'sqlite_path': os.getenv('CHAT_STORE_SQLITE_PATH', 'data/chat_sessions.sqlite3'),
+    'batch_size': int(os.getenv('CHAT_STORE_BATCH_SIZE', '64')),
+    'page_size': int(os.getenv('CHAT_PAGE_SIZE', '50')),
+    'max_page_size': int(os.getenv('CHAT_MAX_PAGE_SIZE', '200'))
+}
+
+CHAT_CONTEXT_CONFIG = {
+    'token_budget': int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', '6000')),
+    'compact_to': float(os.getenv('CHAT_CONTEXT_COMPACT_TO', '0.5')),
+    'digest_enabled': os.getenv('CHAT_DIGEST_ENABLED', 'true').lower() == 'true',
+    'digest_max_tokens': int(os.getenv('CHAT_DIGEST_MAX_TOKENS', '600')),
+    'max_history_messages': int(os.getenv('CHAT_CONTEXT_MAX_MESSAGES', '400'))
+}
+
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+    'slow_request_seconds': float(os.getenv('METRICS_SLOW_REQUEST_SECONDS', '2'))
+}
+
 JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key-for-development')
 JWT_EXPIRATION = int(os.getenv('JWT_EXPIRATION', '3600'))
 
@@ -41,8 +164,62 @@ API_PREFIX = '/api/v1'
 
 OPENROUTER_CONFIG = {
     'api_key': os.getenv('OPENROUTER_API_KEY'),
-    'base_url': 'https://openrouter.ai/api/v1',
+    'base_url': os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1'),
     'site_url': os.getenv('SITE_URL'),
     'site_name': os.getenv('SITE_NAME'),
-    'default_model': 'deepseek/deepseek-chat-v3-0324:free'
+    'default_model': os.getenv('DEFAULT_MODEL', 'deepseek/deepseek-chat-v3-0324:free')
+}
+
+LLM_HTTP_CONFIG = {
+    'max_connections': int(os.getenv('LLM_HTTP_MAX_CONNECTIONS', '100')),
+    'max_keepalive_connections': int(os.getenv('LLM_HTTP_MAX_KEEPALIVE', '20')),
+    'keepalive_expiry': float(os.getenv('LLM_HTTP_KEEPALIVE_EXPIRY', '30')),
+    'connect_timeout': float(os.getenv('LLM_HTTP_CONNECT_TIMEOUT', '5')),
+    'read_timeout': float(os.getenv('LLM_HTTP_READ_TIMEOUT', '120'))
+}
+
+LLM_RESILIENCE_CONFIG = {
+    'default_deadline': float(os.getenv('LLM_DEADLINE', '60')),
+    'deadlines': {
+        name.strip(): float(deadline)
+        for name, deadline in (item.split('=', 1) for item in os.getenv('LLM_DEADLINES', 'intent=10').split(',') if '=' in item)
+    },
+    'attempt_timeout_fraction': float(os.getenv('LLM_ATTEMPT_TIMEOUT_FRACTION', '0.4')),
+    'max_retries': int(os.getenv('LLM_MAX_RETRIES', '2')),
+    'backoff_base': float(os.getenv('LLM_BACKOFF_BASE', '0.5')),
+    'backoff_max': float(os.getenv('LLM_BACKOFF_MAX', '8')),
+    'hedge_enabled': os.getenv('LLM_HEDGE_ENABLED', 'true').lower() == 'true',
+    'hedge_quantile': float(os.getenv('LLM_HEDGE_QUANTILE', '0.95')),
+    'hedge_min_delay': float(os.getenv('LLM_HEDGE_MIN_DELAY', '2')),
+    'hedge_min_samples': int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20')),
+    'breaker_failure_threshold': int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5')),
+    'breaker_reset_timeout': float(os.getenv('LLM_BREAKER_RESET_TIMEOUT', '30')),
+    'fallback_models': [model.strip() for model in os.getenv('LLM_FALLBACK_MODELS', '').split(',') if model.strip()]
+}
+
+LLM_SCHEDULER_CONFIG = {
+    'enabled': os.getenv('LLM_SCHEDULER_ENABLED', 'true').lower() == 'true',
+    'max_concurrent': int(os.getenv('LLM_MAX_CONCURRENT', '16')),
+    'max_background_concurrent': int(os.getenv('LLM_MAX_BACKGROUND_CONCURRENT', '0')) or None,
+    'priorities': {
+        name.strip(): priority.strip()
+        for name, priority in (item.split('=', 1) for item in os.getenv('LLM_PRIORITIES', 'error=normal,analyzer=background,optimizer=background').split(',') if '=' in item)
+    },
+    'global_requests_per_second': float(os.getenv('LLM_GLOBAL_RPS', '10')),
+    'global_request_burst': float(os.getenv('LLM_GLOBAL_BURST', '20')),
+    'global_tokens_per_minute': float(os.getenv('LLM_GLOBAL_TPM', '400000')),
+    'project_requests_per_second': float(os.getenv('LLM_PROJECT_RPS', '2')),
+    'project_request_burst': float(os.getenv('LLM_PROJECT_BURST', '5')),
+    'project_tokens_per_minute': float(os.getenv('LLM_PROJECT_TPM', '100000')),
+    'max_queue': {
+        'interactive': int(os.getenv('LLM_QUEUE_INTERACTIVE', '100')),
+        'normal': int(os.getenv('LLM_QUEUE_NORMAL', '50')),
+        'background': int(os.getenv('LLM_QUEUE_BACKGROUND', '20'))
+    },
+    'max_wait': {
+        'interactive': float(os.getenv('LLM_MAX_WAIT_INTERACTIVE', '30')),
+        'normal': float(os.getenv('LLM_MAX_WAIT_NORMAL', '30')),
+        'background': float(os.getenv('LLM_MAX_WAIT_BACKGROUND', '10'))
+    },
+    'shed_background_at': int(os.getenv('LLM_SHED_BACKGROUND_AT', '50'))
 }
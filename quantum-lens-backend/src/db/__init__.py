@@ -1,3 +1,5 @@
-from .connection import db
+from .connection import db, ConnectionPool, PoolExhaustedError
+from .executor import sandbox_executor, SandboxExecutor
+from .sandbox_pool import sandbox_registry, SandboxRegistry
 
-__all__ = ['db'] 
\ No newline at end of file
+__all__ = ['db', 'ConnectionPool', 'PoolExhaustedError', 'sandbox_executor', 'SandboxExecutor', 'sandbox_registry', 'SandboxRegistry']
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, TypeVar
+import aiomysql
+import pymysql
+from src.config.config import MYSQL_CONFIG, DB_POOL_CONFIG
+from src.db.connection import PoolExhaustedError
+from src.utils import logger
+
+T = TypeVar('T')
+
+class AsyncDatabase:
+    """aiomysql pools for the metadata database, one per event loop since aiomysql connections are loop-bound."""
+
+    def __init__(self, pool_config: Optional[Dict[str, Any]] = None):
+        pool_config = pool_config or DB_POOL_CONFIG
+        self.min_size = pool_config.get('min_size', 1)
+        self.max_size = pool_config.get('max_size', 10)
+        self.acquire_timeout = pool_config.get('acquire_timeout', 10.0)
+        self.max_idle_time = pool_config.get('max_idle_time', 300.0)
+        self._connection_params = {
+            'host': MYSQL_CONFIG['host'],
+            'port': MYSQL_CONFIG['port'],
+            'user': MYSQL_CONFIG['user'],
+            'password': MYSQL_CONFIG['password'],
+            'db': MYSQL_CONFIG['db'],
+            'charset': MYSQL_CONFIG['charset'],
+            'connect_timeout': MYSQL_CONFIG['connect_timeout'],
+            'cursorclass': aiomysql.DictCursor,
+            'autocommit': False
+        }
+
+        self._pools: Dict[asyncio.AbstractEventLoop, aiomysql.Pool] = {}
+        self._pool_locks: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+        self._lock = threading.Lock()
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._acquired_total = 0
+        self._exhausted_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    async def _get_pool(self) -> aiomysql.Pool:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is not None:
+            return pool
+        with self._lock:
+            lock = self._pool_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                try:
+                    pool = await aiomysql.create_pool(
+                        minsize=self.min_size, maxsize=self.max_size, pool_recycle=self.max_idle_time,
+                        **self._connection_params
+                    )
+                except pymysql.Error as e:
+                    logger.error(f"Async database connection failed: {str(e)}")
+                    raise
+                with self._lock:
+                    self._pools[loop] = pool
+                    # Pools of loops that have since been closed (asyncio.run in scripts) cannot be reused.
+                    for stale in [other for other in self._pools if other.is_closed()]:
+                        self._pools.pop(stale).terminate()
+                        self._pool_locks.pop(stale, None)
+                logger.info(f"Async database pool started (min={self.min_size}, max={self.max_size})")
+        return pool
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiomysql.Connection]:
+        pool = await self._get_pool()
+        started = time.monotonic()
+        try:
+            connection = await asyncio.wait_for(pool.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._exhausted_total += 1
+            logger.warning(f"Async database pool exhausted after waiting {self.acquire_timeout:.2f}s")
+            raise PoolExhaustedError(f"no connection available within {self.acquire_timeout:.2f}s")
+        waited = time.monotonic() - started
+        with self._lock:
+            self._acquired_total += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            yield connection
+        except (pymysql.OperationalError, pymysql.InterfaceError):
+            connection.close()
+            raise
+        finally:
+            pool.release(connection)
+
+    @asynccontextmanager
+    async def cursor(self) -> AsyncIterator[aiomysql.Cursor]:
+        async with self.connection() as connection:
+            async with connection.cursor() as cursor:
+                try:
+                    yield cursor
+                    await connection.commit()
+                except pymysql.Error as e:
+                    await self._rollback(connection)
+                    logger.error(f"Database operation failed: {str(e)}")
+                    raise
+                except BaseException:
+                    await self._rollback(connection)
+                    raise
+
+    @staticmethod
+    async def _rollback(connection: aiomysql.Connection):
+        if connection.closed:
+            return
+        try:
+            await connection.rollback()
+        except pymysql.Error:
+            connection.close()
+
+    def run_sync(self, awaitable: Awaitable[T]) -> T:
+        """Run a coroutine for a synchronous caller on a private loop thread; blocks like the pymysql calls it replaces."""
+        with self._lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._sync_loop.run_forever, name="async-db-sync", daemon=True).start()
+            loop = self._sync_loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("run_sync cannot be called from the loop it runs coroutines on")
+        return asyncio.run_coroutine_threadsafe(awaitable, loop).result()
+
+    async def close(self):
+        current = asyncio.get_running_loop()
+        with self._lock:
+            pools = list(self._pools.items())
+            self._pools.clear()
+            self._pool_locks.clear()
+            sync_loop, self._sync_loop = self._sync_loop, None
+        for loop, pool in pools:
+            pool.close()
+            if loop is current:
+                await pool.wait_closed()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(pool.wait_closed(), loop))
+            else:
+                pool.terminate()
+        if sync_loop is not None:
+            sync_loop.call_soon_threadsafe(sync_loop.stop)
+        logger.info("Async database pools closed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = list(self._pools.values())
+            acquired = self._acquired_total
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'pools': len(pools),
+                'size': sum(pool.size for pool in pools),
+                'idle': sum(pool.freesize for pool in pools),
+                'acquired_total': acquired,
+                'exhausted_total': self._exhausted_total,
+                'wait_time_avg': round(self._wait_time_total / acquired, 6) if acquired else 0.0,
+                'wait_time_max': round(self._wait_time_max, 6)
+            }
+
+async_db = AsyncDatabase()
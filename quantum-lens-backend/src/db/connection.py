@@ -1,51 +1,291 @@
 import pymysql
 from pymysql.cursors import DictCursor
 from contextlib import contextmanager
-from src.config.config import MYSQL_CONFIG
+from collections import deque
+import threading
+import time
+from src.config.config import MYSQL_CONFIG, DB_POOL_CONFIG
 from src.utils import logger
+from src.utils.exceptions import ServiceUnavailableError
+
+class PoolExhaustedError(ServiceUnavailableError):
+    def __init__(self, detail: str):
+        super().__init__(f"Database pool exhausted: {detail}")
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+class ConnectionPool:
+    def __init__(self, connection_params, min_size=1, max_size=10, acquire_timeout=10.0,
+                 max_idle_time=300.0, validation_interval=5.0, reap_interval=60.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+
+        self._connection_params = connection_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_time = max_idle_time
+        self.validation_interval = validation_interval
+        self.reap_interval = reap_interval
+
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+        self._acquired_total = 0
+        self._exhausted_total = 0
+        self._created_total = 0
+        self._discarded_total = 0
+        self._reaped_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def start(self):
+        with self._cond:
+            self._closed = False
+
+        while True:
+            # One slot is reserved per connection opened, so a failed open has only its own slot to give back.
+            with self._cond:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                pooled = self._open()
+            except pymysql.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+        if self._reaper is None or not self._reaper.is_alive():
+            self._stop_reaper.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name="db-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def close(self):
+        self._stop_reaper.set()
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_raw(pooled.raw)
+
+    def acquire(self, timeout=None) -> _PooledConnection:
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        pooled = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ServiceUnavailableError("Database pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._exhausted_total += 1
+                    logger.warning(f"Database pool exhausted after waiting {timeout:.2f}s ({self._in_use} connections in use)")
+                    raise PoolExhaustedError(f"no connection available within {timeout:.2f}s")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if pooled is None:
+                pooled = self._open()
+            elif not self._is_healthy(pooled):
+                self._close_raw(pooled.raw)
+                with self._cond:
+                    self._discarded_total += 1
+                pooled = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._acquired_total += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        return pooled
+
+    def release(self, pooled: _PooledConnection, discard: bool = False):
+        close_raw = False
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+                if discard:
+                    self._discarded_total += 1
+                close_raw = True
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+        if close_raw:
+            self._close_raw(pooled.raw)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        pooled = self.acquire(timeout)
+        discard = False
+        try:
+            yield pooled.raw
+        except (pymysql.OperationalError, pymysql.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def stats(self):
+        with self._cond:
+            acquired = self._acquired_total
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'acquired_total': acquired,
+                'exhausted_total': self._exhausted_total,
+                'created_total': self._created_total,
+                'discarded_total': self._discarded_total,
+                'reaped_total': self._reaped_total,
+                'wait_time_total': round(self._wait_time_total, 6),
+                'wait_time_avg': round(self._wait_time_total / acquired, 6) if acquired else 0.0,
+                'wait_time_max': round(self._wait_time_max, 6)
+            }
+
+    def _open(self) -> _PooledConnection:
+        raw = pymysql.connect(**self._connection_params)
+        with self._cond:
+            self._created_total += 1
+        return _PooledConnection(raw)
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        if time.monotonic() - pooled.last_used < self.validation_interval:
+            return True
+        try:
+            pooled.raw.ping(reconnect=False)
+            return True
+        except pymysql.Error as e:
+            logger.warning(f"Discarding unhealthy pooled connection: {str(e)}")
+            return False
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except pymysql.Error:
+            pass
+
+    def _reap_loop(self):
+        while not self._stop_reaper.wait(self.reap_interval):
+            self.reap_idle()
+
+    def reap_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            # Idle connections are appended on release, so the oldest sit on the left.
+            while (self._idle and self._size > self.min_size
+                   and now - self._idle[0].last_used >= self.max_idle_time):
+                expired.append(self._idle.popleft())
+                self._size -= 1
+            self._reaped_total += len(expired)
+        for pooled in expired:
+            self._close_raw(pooled.raw)
+        if expired:
+            logger.info(f"Reaped {len(expired)} idle database connections")
+        return len(expired)
 
 class Database:
-    def __init__(self):
+    def __init__(self, pool_config=None):
         self._connection_params = {
             **MYSQL_CONFIG,
             'cursorclass': DictCursor
         }
-        self._connection = None
+        self._pool = ConnectionPool(self._connection_params, **(pool_config or DB_POOL_CONFIG))
+        self._started = False
+        self._start_lock = threading.Lock()
 
     def connect(self):
-        if not self._connection:
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
             try:
-                self._connection = pymysql.connect(**self._connection_params)
-                logger.info("Database connection established successfully")
+                self._pool.start()
+                self._started = True
+                logger.info(f"Database connection pool started (min={self._pool.min_size}, max={self._pool.max_size})")
             except pymysql.Error as e:
                 logger.error(f"Database connection failed: {str(e)}")
                 raise
 
     def disconnect(self):
-        if self._connection:
+        with self._start_lock:
+            if not self._started:
+                return
+            self._pool.close()
+            self._started = False
+            logger.info("Database connection pool closed successfully")
+
+    @contextmanager
+    def connection(self):
+        if not self._started:
+            self.connect()
+        with self._pool.lease() as connection:
+            yield connection
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as connection:
+            cursor = connection.cursor()
             try:
-                self._connection.close()
-                self._connection = None
-                logger.info("Database connection closed successfully")
+                yield cursor
+                connection.commit()
             except pymysql.Error as e:
-                logger.error(f"Error closing database connection: {str(e)}")
+                connection.rollback()
+                logger.error(f"Database operation failed: {str(e)}")
+                raise
+            except Exception:
+                connection.rollback()
                 raise
+            finally:
+                cursor.close()
 
-    @contextmanager
-    def cursor(self):
-        if not self._connection:
-            self.connect()
-        
-        cursor = self._connection.cursor()
-        try:
-            yield cursor
-            self._connection.commit()
-        except pymysql.Error as e:
-            self._connection.rollback()
-            logger.error(f"Database operation failed: {str(e)}")
-            raise
-        finally:
-            cursor.close()
+    def pool_stats(self):
+        return self._pool.stats()
 
     def execute_query(self, query, params=None):
         with self.cursor() as cursor:
@@ -62,4 +302,4 @@ class Database:
             cursor.execute(query, params or ())
             return cursor.lastrowid
 
-db = Database() 
\ No newline at end of file
+db = Database()
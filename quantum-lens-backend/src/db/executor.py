@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from src.config.config import SANDBOX_EXECUTOR_CONFIG
+from src.utils import logger
+from src.utils.exceptions import ServiceUnavailableError
+
+class SandboxExecutor:
+    def __init__(self, max_workers: int = 16, per_project_concurrency: int = 4, max_queue: int = 200):
+        self.max_workers = max_workers
+        self.per_project_concurrency = per_project_concurrency
+        self.max_queue = max_queue
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+        self._pending = 0
+        self._running = 0
+        self._project_pending: Dict[str, int] = {}
+        self._submitted_total = 0
+        self._completed_total = 0
+        self._failed_total = 0
+        self._rejected_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sandbox")
+        return self._pool
+
+    def _get_semaphore(self, project_id: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(project_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_project_concurrency)
+            self._semaphores[project_id] = semaphore
+        return semaphore
+
+    async def run(self, project_id: Any, fn: Callable, *args, **kwargs) -> Any:
+        project_key = str(project_id)
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected_total += 1
+                logger.warning(f"Sandbox executor queue full ({self._pending} pending), rejecting work for project {project_key}")
+                raise ServiceUnavailableError("Too many queries are queued, please retry shortly")
+            self._pending += 1
+            self._submitted_total += 1
+            self._project_pending[project_key] = self._project_pending.get(project_key, 0) + 1
+
+        enqueued_at = time.monotonic()
+        # Changed only under self._lock, so the start and finish accounting cannot both claim the pending slot.
+        call = {'started': False}
+        semaphore = self._get_semaphore(project_key)
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            with self._lock:
+                self._release_pending(project_key)
+            raise
+
+        loop = asyncio.get_running_loop()
+
+        def invoke():
+            self._mark_started(project_key, enqueued_at, call)
+            return fn(*args, **kwargs)
+
+        def finished(future):
+            # Runs when the work itself ends, not when its caller stops waiting: a cancelled caller leaves the thread
+            # running, and it keeps its project slot and running count until then.
+            with self._lock:
+                if call['started']:
+                    self._running -= 1
+                else:
+                    self._release_pending(project_key)
+                if not future.cancelled():
+                    if future.exception() is None:
+                        self._completed_total += 1
+                    else:
+                        self._failed_total += 1
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # The loop is gone; nothing waits on its semaphore any more.
+
+        try:
+            future = self._get_pool().submit(invoke)
+        except BaseException:
+            with self._lock:
+                self._release_pending(project_key)
+            semaphore.release()
+            raise
+        future.add_done_callback(finished)
+        return await asyncio.wrap_future(future)
+
+    def _mark_started(self, project_key: str, enqueued_at: float, call: Dict[str, bool]):
+        waited = time.monotonic() - enqueued_at
+        with self._lock:
+            call['started'] = True
+            self._release_pending(project_key)
+            self._running += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+    def _release_pending(self, project_key: str):
+        self._pending -= 1
+        remaining = self._project_pending.get(project_key, 1) - 1
+        if remaining > 0:
+            self._project_pending[project_key] = remaining
+        else:
+            self._project_pending.pop(project_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self._submitted_total - self._pending
+            return {
+                'max_workers': self.max_workers,
+                'per_project_concurrency': self.per_project_concurrency,
+                'max_queue': self.max_queue,
+                'queue_depth': self._pending,
+                'running': self._running,
+                'project_queue_depth': dict(self._project_pending),
+                'submitted_total': self._submitted_total,
+                'completed_total': self._completed_total,
+                'failed_total': self._failed_total,
+                'rejected_total': self._rejected_total,
+                'wait_time_total': round(self._wait_time_total, 6),
+                'wait_time_avg': round(self._wait_time_total / started, 6) if started else 0.0,
+                'wait_time_max': round(self._wait_time_max, 6)
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+sandbox_executor = SandboxExecutor(**SANDBOX_EXECUTOR_CONFIG)
@@ -0,0 +1,114 @@
+from typing import Any, Callable, Dict, List, Optional
+from src.db.async_connection import AsyncDatabase, async_db
+
+PROJECT_COLUMNS = "id, name, description, encrypted_path, created_at, updated_at"
+PROJECT_UPDATABLE_FIELDS = ('name', 'description', 'encrypted_path')
+
+def _format_project(project: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if project:
+        project['created_at'] = project['created_at'].isoformat()
+        project['updated_at'] = project['updated_at'].isoformat()
+    return project
+
+class UserRepository:
+    def __init__(self, database: AsyncDatabase = async_db):
+        self.db = database
+
+    async def get_identity(self, user_id: int) -> Optional[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (user_id,))
+            return await cursor.fetchone()
+
+    async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute("SELECT id, name, email, password FROM users WHERE email = %s", (email,))
+            return await cursor.fetchone()
+
+    async def get_password_hash(self, user_id: int) -> Optional[str]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute("SELECT password FROM users WHERE id = %s", (user_id,))
+            row = await cursor.fetchone()
+            return row['password'] if row else None
+
+    async def email_exists(self, email: str) -> bool:
+        async with self.db.cursor() as cursor:
+            await cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            return await cursor.fetchone() is not None
+
+    async def create(self, name: str, email: str, password_hash: str) -> int:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
+                (name, email, password_hash)
+            )
+            return cursor.lastrowid
+
+    async def update(self, user_id: int, name: Optional[str] = None, password_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            if password_hash:
+                await cursor.execute("UPDATE users SET password = %s WHERE id = %s", (password_hash, user_id))
+            if name:
+                await cursor.execute("UPDATE users SET name = %s WHERE id = %s", (name, user_id))
+            await cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (user_id,))
+            return await cursor.fetchone()
+
+class ProjectRepository:
+    def __init__(self, database: AsyncDatabase = async_db):
+        self.db = database
+
+    async def create(self, user_id: int, name: str, description: Optional[str], encrypted_path: str) -> Dict[str, Any]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                """
+                INSERT INTO projects (name, description, encrypted_path, user_id, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, NOW(), NOW())
+                """,
+                (name, description, encrypted_path, user_id)
+            )
+            await cursor.execute(f"SELECT {PROJECT_COLUMNS} FROM projects WHERE id = %s", (cursor.lastrowid,))
+            return _format_project(await cursor.fetchone())
+
+    async def list_for_user(self, user_id: int) -> List[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(f"SELECT {PROJECT_COLUMNS} FROM projects WHERE user_id = %s", (user_id,))
+            return [_format_project(project) for project in await cursor.fetchall()]
+
+    async def get(self, project_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(f"SELECT {PROJECT_COLUMNS} FROM projects WHERE id = %s AND user_id = %s", (project_id, user_id))
+            return _format_project(await cursor.fetchone())
+
+    async def update(self, project_id: int, user_id: int, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Column names come from this whitelist, never from the caller's keys.
+        assignments = [(name, fields[name]) for name in PROJECT_UPDATABLE_FIELDS if fields.get(name) is not None]
+        async with self.db.cursor() as cursor:
+            if assignments:
+                await cursor.execute(
+                    f"UPDATE projects SET {', '.join(f'{name} = %s' for name, _ in assignments)}, updated_at = NOW() "
+                    "WHERE id = %s AND user_id = %s",
+                    [value for _, value in assignments] + [project_id, user_id]
+                )
+            await cursor.execute(f"SELECT {PROJECT_COLUMNS} FROM projects WHERE id = %s AND user_id = %s", (project_id, user_id))
+            return _format_project(await cursor.fetchone())
+
+    async def delete(self, project_id: int, user_id: int) -> bool:
+        async with self.db.cursor() as cursor:
+            await cursor.execute("DELETE FROM projects WHERE id = %s AND user_id = %s", (project_id, user_id))
+            return cursor.rowcount > 0
+
+class SyncRepository:
+    """Blocking facade over an async repository for callers that cannot await yet."""
+
+    def __init__(self, repository: Any, database: AsyncDatabase = async_db):
+        self._repository = repository
+        self._database = database
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        method = getattr(self._repository, name)
+
+        def call(*args, **kwargs):
+            return self._database.run_sync(method(*args, **kwargs))
+        return call
+
+user_repository = UserRepository()
+project_repository = ProjectRepository()
@@ -0,0 +1,342 @@
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+from src.config.config import QUERY_CACHE_CONFIG
+from src.db.sandbox_pool import config_fingerprint
+from src.utils import logger
+
+_CACHEABLE_QUERY_TYPES = ('SELECT', 'WITH')
+_READ_QUERY_TYPES = ('SELECT', 'WITH', 'SHOW', 'DESCRIBE', 'DESC', 'EXPLAIN')
+_DDL_QUERY_TYPES = ('ALTER', 'CREATE', 'DROP', 'RENAME', 'TRUNCATE')
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.S)
+_IDENTIFIER = r"(?:`[^`]+`|\w+)(?:\s*\.\s*(?:`[^`]+`|\w+))?"
+
+_TOKEN = re.compile(r"`[^`]+`|\w+|\S")
+_WORD = re.compile(r"`[^`]+`|[A-Za-z_]\w*")
+_JOIN_KEYWORDS = {'JOIN', 'STRAIGHT_JOIN'}
+_JOIN_MODIFIERS = {'INNER', 'CROSS', 'LEFT', 'RIGHT', 'OUTER', 'NATURAL', 'FULL'}
+_WRITE_MODIFIERS = {'LOW_PRIORITY', 'QUICK', 'IGNORE'}
+_CLAUSE_KEYWORDS = {'WHERE', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'UNION', 'EXCEPT', 'INTERSECT', 'WINDOW', 'FOR', 'LOCK',
+                    'INTO', 'SET', 'VALUES', 'SELECT', 'PROCEDURE'}
+_RESERVED = _JOIN_KEYWORDS | _JOIN_MODIFIERS | _CLAUSE_KEYWORDS | {'FROM', 'AS', 'ON', 'USING', 'USE', 'FORCE', 'PARTITION', 'LATERAL'}
+
+# Results that depend on the clock, randomness, the session or locks are never served from the cache.
+_NON_DETERMINISTIC = re.compile(
+    r"\b(?:NOW|SYSDATE|CURDATE|CURTIME|UTC_DATE|UTC_TIME|UTC_TIMESTAMP|UNIX_TIMESTAMP|RAND|RANDOM|UUID|UUID_SHORT|"
+    r"CONNECTION_ID|LAST_INSERT_ID|ROW_COUNT|FOUND_ROWS|USER|SESSION_USER|SYSTEM_USER|SLEEP|BENCHMARK|GET_LOCK|"
+    r"RELEASE_LOCK|IS_FREE_LOCK|IS_USED_LOCK|NEXTVAL|LASTVAL)\s*\(|"
+    r"\b(?:CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP|CURRENT_USER)\b|"
+    r"\bFOR\s+(?:UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\bINTO\b|\bSQL_NO_CACHE\b|@",
+    re.I
+)
+_WRITE_TABLES = re.compile(rf"^\s*(?:INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE)\s+)*(?:INTO\s+)?({_IDENTIFIER})|"
+                           rf"^\s*UPDATE\s+(?:(?:LOW_PRIORITY|IGNORE)\s+)*({_IDENTIFIER})|"
+                           rf"^\s*DELETE\s+(?:(?:LOW_PRIORITY|QUICK|IGNORE)\s+)*(?:FROM\s+)?({_IDENTIFIER})", re.I)
+_CTE_NAMES = re.compile(r"(?:\bWITH\s+(?:RECURSIVE\s+)?|,\s*)(\w+)\s+AS\s*\(", re.I)
+
+def _strip(query: str) -> str:
+    return _COMMENTS.sub(' ', _LITERALS.sub("''", query))
+
+def _table_name(reference: str) -> str:
+    name = re.split(r"\s+", reference.strip())[0]
+    return re.sub(r"\s*\.\s*", '.', name).replace('`', '').lower()
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace outside string literals and drop a trailing semicolon; case is left alone."""
+    parts, position = [], 0
+    for match in _LITERALS.finditer(query):
+        parts.append(re.sub(r"\s+", ' ', query[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(re.sub(r"\s+", ' ', query[position:]))
+    return ''.join(parts).strip().rstrip(';').strip()
+
+def query_type_of(query: str) -> str:
+    words = _strip(query).split()
+    return words[0].upper() if words else ''
+
+def _table_references(stripped: str) -> Optional[FrozenSet[str]]:
+    """Tables named in the FROM/JOIN clauses (and UPDATE/DELETE targets) of a stripped query.
+
+    Returns None when the table list is not fully understood (index hints, partitions, table functions, ...), so
+    callers can refuse to guess rather than miss a table.
+    """
+    tokens = _TOKEN.findall(stripped)
+    tables = set()
+    # One state per parenthesis level: None outside a table list, 'table' where a table reference is due, 'after' and
+    # 'alias' right after one, 'aliased' once it has its alias, 'condition' inside ON/USING.
+    states = ['table' if tokens and tokens[0].upper() in ('UPDATE', 'DELETE') else None]
+    position = 1 if states[0] else 0
+    while position < len(tokens):
+        token = tokens[position]
+        upper = token.upper()
+        state = states[-1]
+        position += 1
+        if token == '(':
+            if state in ('after', 'alias', 'aliased'):
+                return None
+            if state == 'table':
+                states[-1] = 'after'
+            states.append(None)
+        elif token == ')':
+            if len(states) > 1:
+                states.pop()
+        elif upper == 'FROM' or (state is not None and upper in _JOIN_KEYWORDS):
+            states[-1] = 'table'
+        elif state is None:
+            continue
+        elif state == 'table':
+            if upper in _WRITE_MODIFIERS:
+                continue
+            if not _WORD.fullmatch(token) or upper in _RESERVED:
+                return None
+            name = token
+            if position + 1 < len(tokens) and tokens[position] == '.':
+                # schema.table; DELETE t.* names the table t.
+                if tokens[position + 1] != '*':
+                    name = f"{token}.{tokens[position + 1]}"
+                position += 2
+            tables.add(_table_name(name))
+            states[-1] = 'after'
+        elif token == ',' or token == ';':
+            states[-1] = 'table' if token == ',' else None
+        elif upper in _CLAUSE_KEYWORDS:
+            states[-1] = None
+        elif state == 'condition' or upper in _JOIN_MODIFIERS:
+            continue
+        elif upper in ('ON', 'USING'):
+            states[-1] = 'condition'
+        elif state == 'after' and upper == 'AS':
+            states[-1] = 'alias'
+        elif state in ('after', 'alias') and _WORD.fullmatch(token) and upper not in _RESERVED:
+            states[-1] = 'aliased'
+        else:
+            return None
+    return frozenset(tables)
+
+def read_tables(query: str) -> FrozenSet[str]:
+    """Tables a query reads; empty when there are none or they cannot be told for sure."""
+    stripped = _strip(query)
+    tables = _table_references(stripped)
+    if tables is None:
+        return frozenset()
+    ctes = {name.lower() for name in _CTE_NAMES.findall(stripped)}
+    return frozenset(tables - ctes)
+
+def written_tables(query: str) -> FrozenSet[str]:
+    stripped = _strip(query)
+    match = _WRITE_TABLES.search(stripped)
+    if match is None:
+        return frozenset()
+    target = next(group for group in match.groups() if group)
+    # Multi-table UPDATE/DELETE and INSERT ... SELECT name more tables in their FROM/JOIN clauses. When those cannot
+    # be told for sure, nothing is returned and the caller clears the whole project.
+    tables = _table_references(stripped)
+    if tables is None:
+        return frozenset()
+    return frozenset({_table_name(target)} | tables)
+
+def _estimate_size(result: Dict[str, Any], sample: int = 50) -> int:
+    records = (result.get('data') or {}).get('records') or []
+    size = 512 + sum(sys.getsizeof(column.get('name', '')) + 64 for column in result.get('column_info') or [])
+    if not records:
+        return size
+    rows = records[:sample]
+    row_bytes = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+        for row in rows
+    ) / len(rows)
+    return size + int(row_bytes * len(records))
+
+class _CachedResult:
+    __slots__ = ('project', 'result', 'tables', 'version', 'size', 'stored_at')
+
+    def __init__(self, project: str, result: Dict[str, Any], tables: FrozenSet[str], version: Tuple, size: int):
+        self.project = project
+        self.result = result
+        self.tables = tables
+        self.version = version
+        self.size = size
+        self.stored_at = time.monotonic()
+
+class QueryResultCache:
+    """SELECT results per project, valid while the data version of every table they read is unchanged."""
+
+    def __init__(self, enabled: bool = True, max_bytes: int = 64 * 1024 * 1024, max_project_bytes: Optional[int] = None,
+                 max_entry_bytes: int = 4 * 1024 * 1024, ttl: float = 300.0):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        # One busy project cannot push every other project's results out.
+        self.max_project_bytes = max_project_bytes or max(1, max_bytes // 4)
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, _CachedResult]" = OrderedDict()
+        self._project_bytes: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._stale = 0
+        self._stored = 0
+        self._evicted = 0
+        self._invalidated = 0
+
+    def execute(self, project_id: Any, db_config: Dict[str, Any], sandbox: Any, query: str,
+                run: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Serve query from the cache when its tables are unchanged; otherwise run it on the leased sandbox."""
+        if not self.enabled:
+            return run()
+
+        project = str(project_id)
+        query_type = query_type_of(query)
+        if query_type not in _CACHEABLE_QUERY_TYPES:
+            result = run()
+            if result.get('success') and query_type not in _READ_QUERY_TYPES:
+                self._invalidate_for_write(project, query_type, query)
+            return result
+
+        tables = read_tables(query)
+        if _NON_DETERMINISTIC.search(_strip(query)) or not tables:
+            with self._lock:
+                self._bypassed += 1
+            return run()
+
+        version = self._data_version(sandbox, tables)
+        if version is None:
+            with self._lock:
+                self._bypassed += 1
+            return run()
+
+        key = self._key(project, db_config, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.version == version and time.monotonic() - entry.stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return self._copy(entry.result)
+                self._drop(key)
+                self._stale += 1
+            self._misses += 1
+            generation = self._generations.get(project, 0)
+
+        result = run()
+        if result.get('success') and result.get('data') is not None:
+            self._store(key, project, generation, result, tables, version)
+        return result
+
+    def invalidate(self, project_id: Any, tables: Optional[FrozenSet[str]] = None):
+        project = str(project_id)
+        with self._lock:
+            self._generations[project] = self._generations.get(project, 0) + 1
+            keys = [
+                key for key, entry in self._entries.items()
+                if entry.project == project and (tables is None or entry.tables & tables)
+            ]
+            for key in keys:
+                self._drop(key)
+            self._invalidated += len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'projects': len(self._project_bytes),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'bypassed': self._bypassed,
+                'stale': self._stale,
+                'stored': self._stored,
+                'evicted': self._evicted,
+                'invalidated': self._invalidated
+            }
+
+    def _key(self, project: str, db_config: Dict[str, Any], query: str) -> str:
+        payload = json.dumps([project, config_fingerprint(db_config), normalize_query(query)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _data_version(self, sandbox: Any, tables: FrozenSet[str]) -> Optional[Tuple]:
+        table_versions = getattr(sandbox, 'table_versions', None)
+        if table_versions is None:
+            return None
+        try:
+            versions = table_versions(sorted(tables))
+        except Exception as e:
+            logger.warning(f"Could not read table versions, not caching the result: {str(e)}")
+            return None
+        # Names the database does not know as tables (EXTRACT(... FROM col) and the like) are not part of the version;
+        # a table it knows but cannot version, such as a view, makes the result uncacheable.
+        known = {table: versions[table] for table in tables if table in versions}
+        if not known or any(version is None for version in known.values()):
+            return None
+        return tuple(sorted(known.items()))
+
+    def _invalidate_for_write(self, project: str, query_type: str, query: str):
+        tables = None if query_type in _DDL_QUERY_TYPES else written_tables(query)
+        # Statements we cannot attribute to tables (CALL, LOAD DATA, ...) clear the whole project.
+        self.invalidate(project, tables or None)
+        logger.debug(f"Invalidated cached results for project {project} after {query_type}")
+
+    def _store(self, key: str, project: str, generation: int, result: Dict[str, Any], tables: FrozenSet[str], version: Tuple):
+        size = _estimate_size(result)
+        if size > self.max_entry_bytes or size > self.max_project_bytes:
+            return
+        with self._lock:
+            # A write invalidated this project while the query ran; its result may predate the write.
+            if self._generations.get(project, 0) != generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _CachedResult(project, self._copy(result, cached=False), tables, version, size)
+            self._bytes += size
+            self._project_bytes[project] = self._project_bytes.get(project, 0) + size
+            self._stored += 1
+            self._evict(project)
+
+    def _evict(self, project: str):
+        # Called with self._lock held; least recently used entries go first.
+        while self._project_bytes.get(project, 0) > self.max_project_bytes:
+            key = next(key for key, entry in self._entries.items() if entry.project == project)
+            self._drop(key)
+            self._evicted += 1
+        while self._bytes > self.max_bytes:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self._evicted += 1
+
+    def _drop(self, key: str):
+        # Called with self._lock held.
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        remaining = self._project_bytes[entry.project] - entry.size
+        if remaining > 0:
+            self._project_bytes[entry.project] = remaining
+        else:
+            del self._project_bytes[entry.project]
+
+    @staticmethod
+    def _copy(result: Dict[str, Any], cached: bool = True) -> Dict[str, Any]:
+        # Callers annotate the dict they get back, so neither side shares it; the row dicts themselves are read-only.
+        data = result['data']
+        copy = {**result, 'data': {**data, 'records': list(data['records'])}}
+        if cached:
+            copy.update(execution_time=0, cached=True)
+        return copy
+
+query_result_cache = QueryResultCache(**QUERY_CACHE_CONFIG)
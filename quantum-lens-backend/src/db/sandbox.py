@@ -2,14 +2,71 @@ import mysql.connector
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import json
-import pandas as pd
-from io import StringIO
+import threading
+import time
+
+ROW_RETURNING_QUERY_TYPES = ['SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN']
+
+class SandboxConnectionError(Exception):
+    pass
+
+class QueryStream:
+    def __init__(self, sandbox: 'MySQLSandbox', cursor, query_type: str, chunk_size: int, started_at: datetime):
+        self._sandbox = sandbox
+        self._cursor = cursor
+        self.query_type = query_type
+        self.chunk_size = chunk_size
+        self.started_at = started_at
+        self.column_info = [
+            {'name': desc[0], 'type': str(desc[1])}
+            for desc in (cursor.description or [])
+        ]
+        self.total_rows = 0
+        self.execution_time = 0
+        self.exhausted = False
+        # The connection is not thread-safe: an abort from another worker waits for an in-flight fetch to return.
+        self._lock = threading.RLock()
+
+    def fetch_chunk(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self.exhausted:
+                return []
+            try:
+                rows = self._cursor.fetchmany(self.chunk_size)
+            except Exception:
+                self.abort()
+                raise
+            if not rows:
+                self._finish()
+                return []
+            self.total_rows += len(rows)
+            return rows
+
+    def abort(self):
+        with self._lock:
+            if self.exhausted:
+                return
+            self._finish()
+            # Unread rows are still pending on the wire, so drop the connection; the next query reconnects.
+            self._sandbox.close()
+
+    def _finish(self):
+        self.exhausted = True
+        self.execution_time = (datetime.now() - self.started_at).total_seconds()
+        try:
+            self._cursor.close()
+        except Exception:
+            pass
+        self._sandbox._touch()
 
 class MySQLSandbox:
-    def __init__(self, db_config: Dict[str, str]):
+    def __init__(self, db_config: Dict[str, str], ping_interval: float = 30.0):
         self.db_config = db_config
+        self.ping_interval = ping_interval
         self.connection = None
         self.cursor = None
+        self.last_used = 0.0
+        self._live_table_stats = False
         self._connect()
 
     def _connect(self):
@@ -22,16 +79,25 @@ class MySQLSandbox:
                 port=int(self.db_config.get('port', 3306))
             )
             self.cursor = self.connection.cursor(dictionary=True)
+            self._live_table_stats = False
+            self._touch()
         except mysql.connector.Error as err:
-            raise Exception(f"Failed to connect to MySQL: {err}")
+            raise SandboxConnectionError(f"Failed to connect to MySQL: {err}")
+
+    def _touch(self):
+        self.last_used = time.monotonic()
 
     def _ensure_connection(self):
         try:
+            # Only round-trip to the server when the connection has sat idle long enough to have gone stale.
+            if self.connection and time.monotonic() - self.last_used < self.ping_interval:
+                return
             if self.connection and self.connection.is_connected():
+                self._touch()
                 return
             self._connect()
         except Exception as e:
-            raise Exception(f"Failed to ensure connection: {e}")
+            raise SandboxConnectionError(f"Failed to ensure connection: {e}")
 
     def execute_query(self, query: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         start_time = datetime.now()
@@ -53,42 +119,125 @@ class MySQLSandbox:
 
             self.cursor.execute(query, params or {})
             
-            if query_type in ['SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN']:
+            if query_type in ROW_RETURNING_QUERY_TYPES:
                 rows = self.cursor.fetchall()
+                # Rendering to CSV/HTML is deferred to the result store and only done on request.
+                result['data'] = {
+                    'records': rows,
+                    'total_rows': len(rows)
+                }
                 if rows:
-                    df = pd.DataFrame(rows)
-                    result['data'] = {
-                        'records': rows,
-                        'total_rows': len(rows),
-                        'csv': df.to_csv(index=False),
-                        'html': df.to_html(classes='table table-striped', index=False)
-                    }
                     result['column_info'] = [
                         {'name': desc[0], 'type': str(desc[1])}
                         for desc in self.cursor.description
                     ]
-                else:
-                    result['data'] = {
-                        'records': [],
-                        'total_rows': 0,
-                        'csv': '',
-                        'html': '<p>No results found</p>'
-                    }
             else:
                 self.connection.commit()
                 result['affected_rows'] = self.cursor.rowcount
 
             result['success'] = True
+            self._touch()
 
         except Exception as e:
             result['error'] = str(e)
+            # Force a liveness check before the next query in case the connection itself failed.
+            self.last_used = 0.0
             if self.connection:
-                self.connection.rollback()
+                try:
+                    self.connection.rollback()
+                except mysql.connector.Error:
+                    pass
         finally:
             result['execution_time'] = (datetime.now() - start_time).total_seconds()
 
         return result
 
+    def fetch_all(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        self._ensure_connection()
+        self.cursor.execute(query, params or ())
+        rows = self.cursor.fetchall()
+        self._touch()
+        return rows
+
+    def open_stream(self, query: str, params: Optional[Dict] = None, chunk_size: int = 1000) -> QueryStream:
+        start_time = datetime.now()
+        self._ensure_connection()
+
+        query_type = query.strip().split()[0].upper()
+        if query_type not in ROW_RETURNING_QUERY_TYPES:
+            raise ValueError(f"Streaming is only supported for {', '.join(ROW_RETURNING_QUERY_TYPES)} queries")
+
+        # A plain mysql-connector cursor is unbuffered, so rows stay on the server until fetched.
+        cursor = self.connection.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query, params or {})
+        except Exception:
+            self.last_used = 0.0
+            try:
+                cursor.close()
+            except Exception:
+                pass
+            raise
+        return QueryStream(self, cursor, query_type, chunk_size, start_time)
+
+    def table_versions(self, tables: List[str]) -> Dict[str, Optional[str]]:
+        """Data version of each named table the server knows; None where a change could go unnoticed."""
+        self._ensure_connection()
+        database = self.db_config['database'].lower()
+        # Names are `table` or `schema.table`, lower-cased; anything the server does not list is left out.
+        names = {}
+        for table in tables:
+            schema, _, name = table.rpartition('.')
+            names[(schema or database, name)] = table
+
+        if not self._live_table_stats:
+            # MySQL 8 caches INFORMATION_SCHEMA.TABLES statistics for a day by default; UPDATE_TIME must be current.
+            try:
+                self.cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+            except mysql.connector.Error:
+                pass
+            self._live_table_stats = True
+
+        placeholders = ', '.join(['(%s, %s)'] * len(names))
+        self.cursor.execute(f"""
+            SELECT
+                TABLE_SCHEMA, TABLE_NAME, TABLE_TYPE, UPDATE_TIME,
+                TIMESTAMPDIFF(SECOND, UPDATE_TIME, NOW()) AS SECONDS_SINCE_UPDATE
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE (LOWER(TABLE_SCHEMA), LOWER(TABLE_NAME)) IN ({placeholders})
+        """, tuple(part for key in names for part in key))
+        versions: Dict[str, Optional[str]] = {}
+        unmodified = {}
+        for row in self.cursor.fetchall():
+            table = names[(row['TABLE_SCHEMA'].lower(), row['TABLE_NAME'].lower())]
+            if row['TABLE_TYPE'] != 'BASE TABLE':
+                # A view changes with its base tables, which are not known here.
+                versions[table] = None
+            elif row['UPDATE_TIME'] is None:
+                unmodified[f"{row['TABLE_SCHEMA']}.{row['TABLE_NAME']}".lower()] = (row['TABLE_SCHEMA'], row['TABLE_NAME'], table)
+            elif row['SECONDS_SINCE_UPDATE'] < 1:
+                # UPDATE_TIME has one-second resolution, so another write this second would leave it unchanged.
+                versions[table] = None
+            else:
+                versions[table] = f"updated:{row['UPDATE_TIME'].isoformat()}"
+
+        if unmodified:
+            # No UPDATE_TIME (InnoDB tables untouched since startup, some engines never): use a live checksum
+            # where the engine keeps one, else treat the table as unmodified since the server started.
+            quoted = ', '.join(
+                '.'.join('`' + part.replace('`', '``') + '`' for part in (schema, name))
+                for schema, name, _ in unmodified.values()
+            )
+            self.cursor.execute(f"CHECKSUM TABLE {quoted} QUICK")
+            for row in self.cursor.fetchall():
+                entry = unmodified.get(row['Table'].lower())
+                if entry is not None:
+                    versions[entry[2]] = f"checksum:{row['Checksum']}" if row['Checksum'] is not None else 'unmodified'
+            for _, _, table in unmodified.values():
+                versions.setdefault(table, None)
+        self._touch()
+        return versions
+
     def get_table_schema(self, table_name: str) -> Dict[str, Any]:
         try:
             self._ensure_connection()
@@ -113,6 +262,7 @@ class MySQLSandbox:
                 FROM 
                     INFORMATION_SCHEMA.KEY_COLUMN_USAGE
                 WHERE 
+                    TABLE_SCHEMA = DATABASE() AND
                     TABLE_NAME = %s AND
                     REFERENCED_TABLE_NAME IS NOT NULL
             """, (table_name,))
@@ -129,41 +279,115 @@ class MySQLSandbox:
                 'error': str(e)
             }
 
-    def get_database_info(self) -> Dict[str, Any]:
+    def _fetch_grouped(self, query: str, group_key: str = 'TABLE_NAME') -> Dict[str, List[Dict[str, Any]]]:
+        self.cursor.execute(query)
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for row in self.cursor.fetchall():
+            table = row.pop(group_key)
+            grouped.setdefault(table, []).append(row)
+        return grouped
+
+    def get_database_info(self, exact_counts: bool = False, include_ddl: bool = False) -> Dict[str, Any]:
         try:
             self._ensure_connection()
-            
-            self.cursor.execute("SHOW TABLES")
-            tables = [table[f"Tables_in_{self.db_config['database']}"] for table in self.cursor.fetchall()]
-            
+
+            self.cursor.execute("""
+                SELECT TABLE_NAME, COALESCE(TABLE_ROWS, 0) AS TABLE_ROWS
+                FROM INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_SCHEMA = DATABASE()
+                ORDER BY TABLE_NAME
+            """)
+            estimated_rows = {row['TABLE_NAME']: int(row['TABLE_ROWS']) for row in self.cursor.fetchall()}
+            tables = list(estimated_rows)
+
+            # Columns, indexes and foreign keys for every table come back in one set-based query each,
+            # shaped like DESCRIBE / SHOW INDEXES output so callers see the same structure as before.
+            columns = self._fetch_grouped("""
+                SELECT
+                    TABLE_NAME,
+                    COLUMN_NAME AS `Field`,
+                    COLUMN_TYPE AS `Type`,
+                    IS_NULLABLE AS `Null`,
+                    COLUMN_KEY AS `Key`,
+                    COLUMN_DEFAULT AS `Default`,
+                    EXTRA AS `Extra`
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            indexes = self._fetch_grouped("""
+                SELECT
+                    TABLE_NAME,
+                    TABLE_NAME AS `Table`,
+                    NON_UNIQUE AS `Non_unique`,
+                    INDEX_NAME AS `Key_name`,
+                    SEQ_IN_INDEX AS `Seq_in_index`,
+                    COLUMN_NAME AS `Column_name`,
+                    COLLATION AS `Collation`,
+                    CARDINALITY AS `Cardinality`,
+                    SUB_PART AS `Sub_part`,
+                    PACKED AS `Packed`,
+                    NULLABLE AS `Null`,
+                    INDEX_TYPE AS `Index_type`,
+                    COMMENT AS `Comment`,
+                    INDEX_COMMENT AS `Index_comment`
+                FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+            """)
+            foreign_keys = self._fetch_grouped("""
+                SELECT
+                    TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+                FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE()
+                  AND REFERENCED_TABLE_NAME IS NOT NULL
+                ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+            """)
+
+            row_counts = estimated_rows
+            if exact_counts and tables:
+                # One UNION ALL statement instead of a COUNT(*) round trip per table.
+                count_query = " UNION ALL ".join(
+                    f"SELECT {position} AS position, COUNT(*) AS count FROM `{table.replace('`', '``')}`"
+                    for position, table in enumerate(tables)
+                )
+                self.cursor.execute(count_query)
+                row_counts = {tables[int(row['position'])]: int(row['count']) for row in self.cursor.fetchall()}
+
+            create_statements: Dict[str, str] = {}
+            if include_ddl:
+                for table in tables:
+                    self.cursor.execute(f"SHOW CREATE TABLE `{table.replace('`', '``')}`")
+                    row = self.cursor.fetchone()
+                    create_statements[table] = row.get('Create Table') or row.get('Create View')
+
             database_info = {
-                'tables': [],
+                'tables': [
+                    {
+                        'name': table,
+                        'row_count': row_counts.get(table, 0),
+                        'row_count_exact': exact_counts,
+                        'create_statement': create_statements.get(table),
+                        'schema': {
+                            'columns': columns.get(table, []),
+                            'indexes': indexes.get(table, []),
+                            'foreign_keys': foreign_keys.get(table, [])
+                        }
+                    }
+                    for table in tables
+                ],
                 'total_tables': len(tables),
                 'database_name': self.db_config['database'],
                 'server_info': self.connection.get_server_info()
             }
-
-            for table in tables:
-                self.cursor.execute(f"SELECT COUNT(*) as count FROM {table}")
-                row_count = self.cursor.fetchone()['count']
-
-                self.cursor.execute(f"SHOW CREATE TABLE {table}")
-                create_table = self.cursor.fetchone()['Create Table']
-
-                schema_info = self.get_table_schema(table)
-
-                database_info['tables'].append({
-                    'name': table,
-                    'row_count': row_count,
-                    'create_statement': create_table,
-                    'schema': schema_info.get('data', {})
-                })
+            self._touch()
 
             return {
                 'success': True,
                 'data': database_info
             }
         except Exception as e:
+            self.last_used = 0.0
             return {
                 'success': False,
                 'error': str(e)
@@ -176,4 +400,7 @@ class MySQLSandbox:
             if self.connection:
                 self.connection.close()
         except Exception:
-            pass 
\ No newline at end of file
+            pass
+        finally:
+            self.cursor = None
+            self.connection = None 
\ No newline at end of file
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from src.config.config import SANDBOX_POOL_CONFIG
+from src.db.sandbox import MySQLSandbox
+from src.utils import logger
+from src.utils.exceptions import ServiceUnavailableError
+
+def config_fingerprint(db_config: Dict[str, Any]) -> str:
+    payload = json.dumps(db_config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class _ProjectPool:
+    __slots__ = ('key', 'fingerprint', 'db_config', 'idle', 'size', 'in_use', 'last_used', 'retired')
+
+    def __init__(self, key: str, fingerprint: str, db_config: Dict[str, Any]):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.db_config = dict(db_config)
+        self.idle = deque()
+        self.size = 0
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+class SandboxRegistry:
+    def __init__(self, max_total_connections: int = 64, max_connections_per_project: int = 4,
+                 max_projects: int = 32, idle_timeout: float = 300.0, acquire_timeout: float = 10.0,
+                 reap_interval: float = 60.0, ping_interval: float = 30.0):
+        self.max_total_connections = max_total_connections
+        self.max_connections_per_project = max_connections_per_project
+        self.max_projects = max_projects
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.reap_interval = reap_interval
+        self.ping_interval = ping_interval
+
+        self._pools: "OrderedDict[str, _ProjectPool]" = OrderedDict()
+        self._total = 0
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+        self._created_total = 0
+        self._reused_total = 0
+        self._evicted_projects_total = 0
+        self._evicted_connections_total = 0
+        self._rebuilt_total = 0
+        self._reaped_total = 0
+        self._exhausted_total = 0
+
+    @contextmanager
+    def lease(self, project_id: Any, db_config: Dict[str, Any], timeout: Optional[float] = None):
+        pool, sandbox = self.acquire(project_id, db_config, timeout)
+        try:
+            yield sandbox
+        finally:
+            self.release(pool, sandbox)
+
+    def acquire(self, project_id: Any, db_config: Dict[str, Any], timeout: Optional[float] = None):
+        self._ensure_reaper()
+        key = str(project_id)
+        fingerprint = config_fingerprint(db_config)
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        to_close: List[MySQLSandbox] = []
+        sandbox = None
+
+        with self._cond:
+            while True:
+                pool = self._pools.get(key)
+                if pool is not None and pool.fingerprint != fingerprint:
+                    logger.info(f"Database configuration changed for project {key}, rebuilding sandbox pool")
+                    to_close.extend(self._retire(pool))
+                    self._rebuilt_total += 1
+                    pool = None
+                if pool is None:
+                    pool = _ProjectPool(key, fingerprint, db_config)
+                    self._pools[key] = pool
+                    to_close.extend(self._evict_projects(keep=key))
+
+                self._pools.move_to_end(key)
+                pool.last_used = time.monotonic()
+
+                if pool.idle:
+                    sandbox = pool.idle.pop()
+                    pool.in_use += 1
+                    self._reused_total += 1
+                    break
+
+                if pool.size < self.max_connections_per_project:
+                    if self._total >= self.max_total_connections:
+                        to_close.extend(self._evict_idle_connection(exclude=key))
+                    if self._total < self.max_total_connections:
+                        pool.size += 1
+                        pool.in_use += 1
+                        self._total += 1
+                        break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._exhausted_total += 1
+                    pool = None
+                    break
+                self._cond.wait(remaining)
+
+        self._close_all(to_close)
+        if pool is None:
+            raise ServiceUnavailableError(f"No database connection available for project {key}, please retry shortly")
+
+        if sandbox is None:
+            try:
+                sandbox = MySQLSandbox(pool.db_config, ping_interval=self.ping_interval)
+            except Exception:
+                with self._cond:
+                    pool.size -= 1
+                    pool.in_use -= 1
+                    self._total -= 1
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._created_total += 1
+
+        return pool, sandbox
+
+    def release(self, pool: _ProjectPool, sandbox: MySQLSandbox, discard: bool = False):
+        close = False
+        with self._cond:
+            pool.in_use -= 1
+            if pool.retired or discard:
+                pool.size -= 1
+                self._total -= 1
+                close = True
+            else:
+                pool.last_used = time.monotonic()
+                pool.idle.append(sandbox)
+            self._cond.notify_all()
+        if close:
+            sandbox.close()
+
+    def invalidate(self, project_id: Any):
+        with self._cond:
+            pool = self._pools.get(str(project_id))
+            to_close = self._retire(pool) if pool is not None else []
+            self._cond.notify_all()
+        self._close_all(to_close)
+
+    def reap_idle(self) -> int:
+        now = time.monotonic()
+        to_close: List[MySQLSandbox] = []
+        with self._cond:
+            for key, pool in list(self._pools.items()):
+                while pool.idle and now - pool.idle[0].last_used >= self.idle_timeout:
+                    to_close.append(pool.idle.popleft())
+                    pool.size -= 1
+                    self._total -= 1
+                if pool.size == 0 and now - pool.last_used >= self.idle_timeout:
+                    pool.retired = True
+                    del self._pools[key]
+            self._reaped_total += len(to_close)
+            self._cond.notify_all()
+        self._close_all(to_close)
+        if to_close:
+            logger.info(f"Reaped {len(to_close)} idle sandbox connections")
+        return len(to_close)
+
+    def close(self):
+        self._stop_reaper.set()
+        with self._cond:
+            to_close: List[MySQLSandbox] = []
+            for pool in list(self._pools.values()):
+                to_close.extend(self._retire(pool))
+            self._cond.notify_all()
+        self._close_all(to_close)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'max_total_connections': self.max_total_connections,
+                'max_connections_per_project': self.max_connections_per_project,
+                'max_projects': self.max_projects,
+                'total_connections': self._total,
+                'projects': len(self._pools),
+                'idle_connections': sum(len(pool.idle) for pool in self._pools.values()),
+                'in_use_connections': sum(pool.in_use for pool in self._pools.values()),
+                'created_total': self._created_total,
+                'reused_total': self._reused_total,
+                'rebuilt_total': self._rebuilt_total,
+                'evicted_projects_total': self._evicted_projects_total,
+                'evicted_connections_total': self._evicted_connections_total,
+                'reaped_total': self._reaped_total,
+                'exhausted_total': self._exhausted_total
+            }
+
+    # The helpers below must be called with self._cond held; they return sandboxes to close outside the lock.
+
+    def _retire(self, pool: _ProjectPool) -> List[MySQLSandbox]:
+        pool.retired = True
+        if self._pools.get(pool.key) is pool:
+            del self._pools[pool.key]
+        idle = list(pool.idle)
+        pool.idle.clear()
+        pool.size -= len(idle)
+        self._total -= len(idle)
+        return idle
+
+    def _evict_projects(self, keep: str) -> List[MySQLSandbox]:
+        to_close: List[MySQLSandbox] = []
+        for key in list(self._pools.keys()):
+            if len(self._pools) <= self.max_projects:
+                break
+            pool = self._pools[key]
+            if key == keep or pool.in_use:
+                continue
+            to_close.extend(self._retire(pool))
+            self._evicted_projects_total += 1
+            logger.info(f"Evicted least recently used sandbox pool for project {key}")
+        return to_close
+
+    def _evict_idle_connection(self, exclude: str) -> List[MySQLSandbox]:
+        for key, pool in self._pools.items():
+            if key != exclude and pool.idle:
+                sandbox = pool.idle.popleft()
+                pool.size -= 1
+                self._total -= 1
+                self._evicted_connections_total += 1
+                return [sandbox]
+        return []
+
+    def _close_all(self, sandboxes: List[MySQLSandbox]):
+        for sandbox in sandboxes:
+            sandbox.close()
+
+    def _ensure_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        with self._cond:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._stop_reaper.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name="sandbox-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stop_reaper.wait(self.reap_interval):
+            self.reap_idle()
+
+sandbox_registry = SandboxRegistry(**SANDBOX_POOL_CONFIG)
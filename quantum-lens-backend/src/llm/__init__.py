@@ -1,3 +1,11 @@
 from .openrouter_client import OpenRouterClient
+from .completion_cache import completion_cache, CompletionCache
+from .prompt_builder import prompt_builder, PromptBuilder, count_tokens, compact_schema, column_names
+from .resilience import llm_resilience, LLMResilience, LLMUnavailableError
+from .scheduler import llm_scheduler, LLMScheduler, LLMOverloadedError
+from .schema_index import schema_pruner, SchemaIndex, SchemaPruner
+from .singleflight import llm_singleflight, SingleFlight
 
-__all__ = ['OpenRouterClient'] 
\ No newline at end of file
+__all__ = ['OpenRouterClient', 'completion_cache', 'CompletionCache', 'prompt_builder', 'PromptBuilder', 'count_tokens', 'compact_schema', 'column_names',
+           'llm_resilience', 'LLMResilience', 'LLMUnavailableError', 'llm_scheduler', 'LLMScheduler', 'LLMOverloadedError',
+           'schema_pruner', 'SchemaIndex', 'SchemaPruner', 'llm_singleflight', 'SingleFlight'] 
\ No newline at end of file
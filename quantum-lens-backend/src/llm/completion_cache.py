@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from src.config.config import LLM_CACHE_CONFIG
+from src.utils import logger
+
+# Free-text fields are compared case- and whitespace-insensitively; everything else must match exactly.
+_NATURAL_LANGUAGE_FIELDS = ('user_message', 'message', 'question')
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+def schema_fingerprint(schema: Any) -> str:
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class CompletionCache:
+    def __init__(self, enabled: bool = True, max_entries: int = 1024, default_ttl: float = 3600.0,
+                 prompt_ttls: Optional[Dict[str, float]] = None, sqlite_path: Optional[str] = None,
+                 purge_interval: float = 300.0):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.prompt_ttls = prompt_ttls or {}
+        self.sqlite_path = sqlite_path
+        self.purge_interval = purge_interval
+
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        self._disk_executor = None
+        self._last_purge = time.monotonic()
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._disk_errors = 0
+        self._by_prompt: Dict[str, Dict[str, int]] = {}
+
+    def ttl_for(self, prompt_type: str) -> float:
+        return float(self.prompt_ttls.get(prompt_type, self.default_ttl))
+
+    def make_key(self, prompt_type: str, model: str, context: Dict[str, Any]) -> str:
+        normalized = {}
+        for name, value in context.items():
+            if name == 'schema':
+                normalized[name] = schema_fingerprint(value)
+            elif name in _NATURAL_LANGUAGE_FIELDS and isinstance(value, str):
+                normalized[name] = normalize_text(value)
+            else:
+                normalized[name] = value
+        payload = json.dumps([prompt_type, model, normalized], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, prompt_type: str, key: str) -> Optional[str]:
+        if not self.enabled or self.ttl_for(prompt_type) <= 0:
+            return None
+        now = time.time()
+        cached = self._memory_get(prompt_type, key, now)
+        if cached is not None:
+            return cached
+        return self._promote(prompt_type, key, self._disk_get(key, now))
+
+    async def get_async(self, prompt_type: str, key: str) -> Optional[str]:
+        # Same as get(), but a memory miss reads the disk tier on its own thread instead of the event loop.
+        if not self.enabled or self.ttl_for(prompt_type) <= 0:
+            return None
+        now = time.time()
+        cached = self._memory_get(prompt_type, key, now)
+        if cached is not None:
+            return cached
+        if not self.sqlite_path:
+            return self._promote(prompt_type, key, None)
+        response = await asyncio.get_running_loop().run_in_executor(self._get_disk_executor(), self._disk_get, key, now)
+        return self._promote(prompt_type, key, response)
+
+    def put(self, prompt_type: str, key: str, response: str):
+        ttl = self.ttl_for(prompt_type)
+        if not self.enabled or ttl <= 0 or not response or not response.strip():
+            return
+
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self._record(prompt_type, 'stores')
+        if self.sqlite_path:
+            # The memory tier already answers for this key; persisting it can happen in the background.
+            self._get_disk_executor().submit(self._disk_put, key, prompt_type, response, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with self._disk_lock:
+            connection = self._disk_connection()
+            if connection is not None:
+                connection.execute("DELETE FROM llm_completions")
+                connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_enabled': bool(self.sqlite_path),
+                'memory_hits': self._memory_hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'stores': self._stores,
+                'disk_errors': self._disk_errors,
+                'by_prompt_type': {name: dict(counts) for name, counts in self._by_prompt.items()}
+            }
+
+    def close(self):
+        with self._disk_lock:
+            executor, self._disk_executor = self._disk_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def _memory_get(self, prompt_type: str, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._record(prompt_type, 'memory_hits')
+                    return entry[0]
+                del self._entries[key]
+        return None
+
+    def _promote(self, prompt_type: str, key: str, response: Optional[Tuple[str, float]]) -> Optional[str]:
+        with self._lock:
+            if response is None:
+                self._record(prompt_type, 'misses')
+                return None
+            self._record(prompt_type, 'disk_hits')
+            # Promote into memory for the rest of its remaining lifetime.
+            self._remember(key, response[0], response[1])
+        return response[0]
+
+    def _get_disk_executor(self) -> ThreadPoolExecutor:
+        # One thread: sqlite serializes on the connection anyway, and writes land in submission order.
+        with self._disk_lock:
+            if self._disk_executor is None:
+                self._disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+            return self._disk_executor
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        # Called with self._lock held.
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _record(self, prompt_type: str, counter: str):
+        # Called with self._lock held.
+        if counter == 'memory_hits':
+            self._memory_hits += 1
+        elif counter == 'disk_hits':
+            self._disk_hits += 1
+        elif counter == 'misses':
+            self._misses += 1
+        else:
+            self._stores += 1
+        counts = self._by_prompt.setdefault(prompt_type, {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0})
+        counts[counter] += 1
+
+    def _disk_connection(self) -> Optional[sqlite3.Connection]:
+        # Called with self._disk_lock held.
+        if not self.sqlite_path:
+            return None
+        if self._disk is None:
+            directory = os.path.dirname(os.path.abspath(self.sqlite_path))
+            os.makedirs(directory, exist_ok=True)
+            self._disk = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS llm_completions (
+                    cache_key TEXT PRIMARY KEY,
+                    prompt_type TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_llm_completions_expires ON llm_completions (expires_at)")
+            self._disk.commit()
+            logger.info(f"LLM completion cache persisted at {self.sqlite_path}")
+        return self._disk
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        if not self.sqlite_path:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk_connection().execute(
+                    "SELECT response, expires_at FROM llm_completions WHERE cache_key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+            return (row[0], row[1]) if row else None
+        except sqlite3.Error as e:
+            self._disk_failed(e)
+            return None
+
+    def _disk_put(self, key: str, prompt_type: str, response: str, expires_at: float):
+        if not self.sqlite_path:
+            return
+        try:
+            with self._disk_lock:
+                connection = self._disk_connection()
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_completions (cache_key, prompt_type, response, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, prompt_type, response, expires_at)
+                )
+                if time.monotonic() - self._last_purge >= self.purge_interval:
+                    connection.execute("DELETE FROM llm_completions WHERE expires_at <= ?", (time.time(),))
+                    self._last_purge = time.monotonic()
+                connection.commit()
+        except sqlite3.Error as e:
+            self._disk_failed(e)
+
+    def _disk_failed(self, error: Exception):
+        with self._lock:
+            self._disk_errors += 1
+        logger.warning(f"LLM completion cache disk tier error: {str(error)}")
+
+completion_cache = CompletionCache(**LLM_CACHE_CONFIG)
@@ -1,11 +1,20 @@
+import httpx
 from openai import AsyncOpenAI, OpenAI
 from openai.types.chat import ChatCompletion
-from src.config.config import OPENROUTER_CONFIG
+from src.config.config import LLM_HTTP_CONFIG, OPENROUTER_CONFIG
+from src.llm.completion_cache import completion_cache
+from src.llm.prompt_builder import count_tokens, prompt_builder
+from src.llm.scheduler import llm_scheduler
+from src.llm.schema_index import schema_pruner
+from src.llm.resilience import llm_resilience
+from src.llm.singleflight import llm_singleflight
 from src.utils import logger
-from src.utils.exceptions import AppException, ValidationError
+from src.utils.exceptions import AppException, ServiceUnavailableError, ValidationError
+from src.utils.metrics import llm_request_seconds, llm_requests, llm_tokens
 from src.prompts.sql_analytics_prompts import get_prompt_template
-from typing import List, Dict, Optional, Any
+from typing import AsyncIterator, List, Dict, Optional, Any
 import json
+import time
 
 class LLMError(AppException):
     def __init__(self, detail: str):
@@ -25,13 +34,24 @@ class OpenRouterClient:
             return
             
         try:
+            limits = httpx.Limits(
+                max_connections=LLM_HTTP_CONFIG['max_connections'],
+                max_keepalive_connections=LLM_HTTP_CONFIG['max_keepalive_connections'],
+                keepalive_expiry=LLM_HTTP_CONFIG['keepalive_expiry']
+            )
+            timeout = httpx.Timeout(LLM_HTTP_CONFIG['read_timeout'], connect=LLM_HTTP_CONFIG['connect_timeout'])
+            # Retries, deadlines and fallbacks are handled by llm_resilience, so the SDK's own retries are off.
             self.client = OpenAI(
                 base_url=OPENROUTER_CONFIG['base_url'],
-                api_key=OPENROUTER_CONFIG['api_key']
+                api_key=OPENROUTER_CONFIG['api_key'],
+                max_retries=0,
+                http_client=httpx.Client(limits=limits, timeout=timeout)
             )
             self.async_client = AsyncOpenAI(
                 base_url=OPENROUTER_CONFIG['base_url'],
-                api_key=OPENROUTER_CONFIG['api_key']
+                api_key=OPENROUTER_CONFIG['api_key'],
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=limits, timeout=timeout)
             )
             self.default_model = OPENROUTER_CONFIG['default_model']
             self.extra_headers = {
@@ -64,35 +84,67 @@ class OpenRouterClient:
             if not isinstance(msg['content'], str):
                 raise ValidationError("Message content must be a string")
 
+    def _prompt_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        schema = context.get('schema')
+        if not isinstance(schema, dict):
+            return context
+        question = context.get('user_message') or context.get('message') or context.get('query') or ''
+        return {**context, 'schema': schema_pruner.prompt_schema(schema, question)}
+
     def _prepare_prompt(self, prompt_type: str, context: Dict[str, Any]) -> List[Dict[str, str]]:
         prompt_template = get_prompt_template(prompt_type)
-        
-        if prompt_type == 'intent':
-            formatted_content = context.get('user_message', context.get('message', ''))
-        elif prompt_type == 'generator':
-            formatted_content = f"Schema Context:\n{json.dumps(context.get('schema', {}), indent=2)}\n\nUser Query: {context.get('query', '')}"
-        elif prompt_type == 'analyzer':
-            formatted_content = f"Analysis Context:\n{json.dumps(context, indent=2)}"
-        elif prompt_type == 'optimizer':
-            formatted_content = f"Optimization Context:\n{json.dumps(context, indent=2)}"
-        elif prompt_type == 'error':
-            formatted_content = f"Error Context:\n{json.dumps(context, indent=2)}"
-        else:
-            formatted_content = json.dumps(context, indent=2)
-
-        return [
-            {"role": "system", "content": prompt_template["system"]},
-            {"role": "user", "content": formatted_content}
-        ]
-
-    async def generate_sql_completion(self, prompt_type: str, context: Dict[str, Any], model: Optional[str] = None) -> str:
+        messages, _ = prompt_builder.build(prompt_type, context, prompt_template["system"])
+        return messages
+
+    async def generate_sql_completion(self, prompt_type: str, context: Dict[str, Any], model: Optional[str] = None, use_cache: bool = True, project_id: Any = None) -> str:
         try:
-            messages = self._prepare_prompt(prompt_type, context)
-            return await self.generate_completion_async(messages, model)
+            context = self._prompt_context(context)
+            cache_key = completion_cache.make_key(prompt_type, model or self.default_model, context)
+            if use_cache:
+                cached = await completion_cache.get_async(prompt_type, cache_key)
+                if cached is not None:
+                    logger.info(f"Serving {prompt_type} completion from cache")
+                    return cached
+
+            async def complete() -> str:
+                messages = self._prepare_prompt(prompt_type, context)
+                response = await self.generate_completion_async(messages, model, prompt_type=prompt_type, project_id=project_id)
+                if use_cache:
+                    completion_cache.put(prompt_type, cache_key, response)
+                return response
+
+            # Identical prompts already on their way upstream share that request.
+            return await llm_singleflight.do(f"{prompt_type}:{int(use_cache)}:{cache_key}", complete)
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error generating SQL completion for {prompt_type}: {str(e)}")
             raise LLMError(f"Failed to generate SQL completion: {str(e)}")
 
+    async def stream_sql_completion(self, prompt_type: str, context: Dict[str, Any], model: Optional[str] = None, use_cache: bool = True, project_id: Any = None) -> AsyncIterator[str]:
+        context = self._prompt_context(context)
+        cache_key = None
+        if use_cache:
+            cache_key = completion_cache.make_key(prompt_type, model or self.default_model, context)
+            cached = await completion_cache.get_async(prompt_type, cache_key)
+            if cached is not None:
+                logger.info(f"Serving {prompt_type} completion from cache")
+                yield cached
+                return
+
+        messages = self._prepare_prompt(prompt_type, context)
+        parts = []
+        tokens = self.stream_completion_async(messages, model, prompt_type=prompt_type, project_id=project_id)
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield token
+        finally:
+            await tokens.aclose()
+        # Only complete responses are cached; an abandoned stream never reaches this point.
+        if cache_key is not None:
+            completion_cache.put(prompt_type, cache_key, ''.join(parts))
+
     def generate_completion(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> str:
         try:
             self._validate_messages(messages)
@@ -118,18 +170,26 @@ class OpenRouterClient:
             logger.error(f"Error generating completion: {str(e)}")
             raise LLMError(f"Failed to generate completion: {str(e)}")
 
-    async def generate_completion_async(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> str:
+    async def generate_completion_async(self, messages: List[Dict[str, str]], model: Optional[str] = None, prompt_type: Optional[str] = None, project_id: Any = None) -> str:
         try:
             self._validate_messages(messages)
             logger.info(f"Generating async completion for model: {model or self.default_model}")
             logger.debug(f"Input messages: {json.dumps(messages, indent=2)}")
 
-            completion = await self.async_client.chat.completions.create(
-                extra_headers=self.extra_headers,
-                extra_body={},
-                model=model or self.default_model,
-                messages=messages
-            )
+            async with llm_scheduler.slot(prompt_type, project_id, self._message_tokens(messages)):
+                started = time.perf_counter()
+                completion = await llm_resilience.run(
+                    prompt_type,
+                    model or self.default_model,
+                    lambda candidate: self.async_client.chat.completions.create(
+                        extra_headers=self.extra_headers,
+                        extra_body={},
+                        model=candidate,
+                        messages=messages
+                    )
+                )
+            # completion.model is the model that actually answered, which differs from the request after a fallback.
+            self._record_completion(prompt_type, completion.model or model, 'success', time.perf_counter() - started, completion.usage)
 
             response = completion.choices[0].message.content
             logger.info("Successfully generated async completion")
@@ -139,6 +199,73 @@ class OpenRouterClient:
         except ValidationError as e:
             logger.error(f"Validation error in async completion: {str(e)}")
             raise
+        except ServiceUnavailableError as e:
+            logger.error(f"LLM unavailable for async completion: {e.detail}")
+            self._record_completion(prompt_type, model, 'unavailable')
+            raise
         except Exception as e:
             logger.error(f"Error generating async completion: {str(e)}")
-            raise LLMError(f"Failed to generate async completion: {str(e)}") 
\ No newline at end of file
+            self._record_completion(prompt_type, model, 'error')
+            raise LLMError(f"Failed to generate async completion: {str(e)}")
+
+    async def stream_completion_async(self, messages: List[Dict[str, str]], model: Optional[str] = None, prompt_type: Optional[str] = None, project_id: Any = None) -> AsyncIterator[str]:
+        self._validate_messages(messages)
+        logger.info(f"Streaming async completion for model: {model or self.default_model}")
+        logger.debug(f"Input messages: {json.dumps(messages, indent=2)}")
+
+        # The scheduler slot is held for the whole stream, since the upstream connection stays busy until it ends.
+        async with llm_scheduler.slot(prompt_type, project_id, self._message_tokens(messages)):
+            started = time.perf_counter()
+            try:
+                # Deadlines, retries and fallbacks cover opening the stream; a duplicate stream is never hedged.
+                stream = await llm_resilience.run(
+                    prompt_type,
+                    model or self.default_model,
+                    lambda candidate: self.async_client.chat.completions.create(
+                        extra_headers=self.extra_headers,
+                        extra_body={},
+                        model=candidate,
+                        messages=messages,
+                        stream=True
+                    ),
+                    hedge=False
+                )
+            except ServiceUnavailableError:
+                self._record_completion(prompt_type, model, 'unavailable')
+                raise
+            except Exception as e:
+                logger.error(f"Error starting completion stream: {str(e)}")
+                self._record_completion(prompt_type, model, 'error')
+                raise LLMError(f"Failed to start completion stream: {str(e)}")
+
+            served_model = model
+            try:
+                async for chunk in stream:
+                    served_model = chunk.model or served_model
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        yield token
+                self._record_completion(prompt_type, served_model, 'success', time.perf_counter() - started)
+                logger.info("Successfully streamed async completion")
+            except Exception as e:
+                logger.error(f"Error streaming async completion: {str(e)}")
+                self._record_completion(prompt_type, served_model, 'error')
+                raise LLMError(f"Failed to stream async completion: {str(e)}")
+            finally:
+                # Closes the upstream HTTP response, also when the consumer stops early or is cancelled.
+                await stream.close()
+
+    def _message_tokens(self, messages: List[Dict[str, str]]) -> int:
+        return sum(count_tokens(message['content']) for message in messages)
+
+    def _record_completion(self, prompt_type: Optional[str], model: Optional[str], outcome: str,
+                           elapsed: Optional[float] = None, usage: Any = None):
+        labels = {'prompt_type': prompt_type or 'chat', 'model': model or self.default_model}
+        llm_requests.inc(outcome=outcome, **labels)
+        if elapsed is not None:
+            llm_request_seconds.observe(elapsed, **labels)
+        if usage is not None:
+            llm_tokens.inc(usage.prompt_tokens or 0, kind='prompt', **labels)
+            llm_tokens.inc(usage.completion_tokens or 0, kind='completion', **labels)
@@ -0,0 +1,163 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from src.config.config import PROMPT_BUDGET_CONFIG
+from src.utils import logger
+
+_encoding = None
+_encoding_loaded = False
+
+def count_tokens(text: str) -> int:
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            # tiktoken is optional; fall back to the usual ~4 characters per token estimate.
+            _encoding = None
+        _encoding_loaded = True
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def table_columns(table: Dict[str, Any]) -> List[Any]:
+    # Schemas from the schema cache list columns on the table; raw sandbox info nests DESCRIBE rows under 'schema'.
+    columns = table.get('columns')
+    if columns is None:
+        columns = (table.get('schema') or {}).get('columns') or []
+    return columns
+
+def column_names(table: Dict[str, Any]) -> List[str]:
+    return [column if isinstance(column, str) else column.get('name') or column.get('Field') or ''
+            for column in table_columns(table)]
+
+def _column_parts(table: Dict[str, Any]) -> List[str]:
+    parts = []
+    for column in table_columns(table):
+        if isinstance(column, str):
+            parts.append(column)
+            continue
+        name = column.get('name') or column.get('Field')
+        column_type = column.get('type') or column.get('Type') or ''
+        nullable = column.get('nullable', column.get('Null') == 'YES')
+        parts.append(f"{name} {column_type}{' NULL' if nullable else ''}".strip())
+    return parts
+
+def compact_schema(schema: Dict[str, Any], max_tables: Optional[int] = None) -> str:
+    tables = schema.get('tables', [])
+    shown = tables if max_tables is None else tables[:max_tables]
+    lines = []
+    if schema.get('database_name'):
+        lines.append(f"-- database {schema['database_name']}")
+    for table in shown:
+        parts = _column_parts(table)
+        if table.get('primary_key'):
+            parts.append(f"PK({', '.join(table['primary_key'])})")
+        for unique_key in table.get('unique_keys') or []:
+            parts.append(f"UNIQUE({', '.join(unique_key)})")
+        for foreign_key in table.get('foreign_keys') or []:
+            parts.append(f"FK({foreign_key['column']})->{foreign_key['referenced_table']}({foreign_key['referenced_column']})")
+        rows = table.get('row_count')
+        lines.append(f"{table.get('name')}({', '.join(parts)})" + (f" ~{rows} rows" if rows is not None else ''))
+    if len(shown) < len(tables):
+        lines.append(f"-- {len(tables) - len(shown)} more tables omitted")
+    return '\n'.join(lines)
+
+def _shrink(value: Any, max_rows: int, max_string_length: int) -> Any:
+    if isinstance(value, str):
+        if len(value) > max_string_length:
+            return f"{value[:max_string_length]}...[+{len(value) - max_string_length} chars]"
+        return value
+    if isinstance(value, dict):
+        return {key: _shrink(item, max_rows, max_string_length) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_shrink(item, max_rows, max_string_length) for item in value[:max_rows]]
+        if len(value) > max_rows:
+            items.append(f"... {len(value) - max_rows} more items")
+        return items
+    return value
+
+# The question and SQL the model has to answer about are never truncated; only result rows, schema and other context are.
+_VERBATIM_FIELDS = ('user_message', 'message', 'question', 'query', 'sql_query')
+
+_HEADERS = {
+    'analyzer': 'Analysis Context',
+    'optimizer': 'Optimization Context',
+    'error': 'Error Context'
+}
+
+class PromptBuilder:
+    def __init__(self, default_budget: int = 6000, budgets: Optional[Dict[str, int]] = None,
+                 max_rows: int = 50, max_string_length: int = 2000):
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+        self.max_rows = max_rows
+        self.max_string_length = max_string_length
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def budget_for(self, prompt_type: str) -> int:
+        return int(self.budgets.get(prompt_type, self.default_budget))
+
+    def build(self, prompt_type: str, context: Dict[str, Any], system_prompt: str) -> Tuple[List[Dict[str, str]], int]:
+        budget = self.budget_for(prompt_type)
+        system_tokens = count_tokens(system_prompt)
+        max_rows, max_string_length = self.max_rows, self.max_string_length
+        max_tables = None
+
+        while True:
+            content = self._render(prompt_type, context, max_rows, max_string_length, max_tables)
+            tokens = system_tokens + count_tokens(content)
+            if tokens <= budget:
+                break
+            # Give up detail in the order that least affects answer quality.
+            table_count = len((context.get('schema') or {}).get('tables', [])) if isinstance(context.get('schema'), dict) else 0
+            if max_rows > 5:
+                max_rows //= 2
+            elif table_count > 1 and (max_tables is None or max_tables > 1):
+                max_tables = max(1, (max_tables or table_count) // 2)
+            elif max_string_length > 100:
+                max_string_length //= 2
+            else:
+                logger.warning(f"{prompt_type} prompt still has {tokens} tokens after compaction (budget {budget})")
+                break
+
+        self._record(prompt_type, tokens, budget)
+        logger.info(f"Prepared {prompt_type} prompt with {tokens} tokens (budget {budget})")
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": content}
+        ], tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {prompt_type: dict(counts) for prompt_type, counts in self._stats.items()}
+
+    def _render(self, prompt_type: str, context: Dict[str, Any], max_rows: int, max_string_length: int, max_tables: Optional[int]) -> str:
+        if prompt_type == 'intent':
+            return context.get('user_message', context.get('message', ''))
+
+        schema = context.get('schema')
+        schema_text = compact_schema(schema, max_tables) if isinstance(schema, dict) else None
+        if prompt_type == 'generator':
+            return f"Schema Context:\n{schema_text or ''}\n\nUser Query: {context.get('query', '')}"
+
+        rest = {key: value for key, value in context.items() if key != 'schema' or schema_text is None}
+        rest = {key: value if key in _VERBATIM_FIELDS else _shrink(value, max_rows, max_string_length) for key, value in rest.items()}
+        body = json.dumps(rest, separators=(',', ':'), default=str)
+        if schema_text is not None:
+            body = f"Schema:\n{schema_text}\n\n{body}"
+        header = _HEADERS.get(prompt_type)
+        return f"{header}:\n{body}" if header else body
+
+    def _record(self, prompt_type: str, tokens: int, budget: int):
+        with self._lock:
+            counts = self._stats.setdefault(prompt_type, {'calls': 0, 'tokens_total': 0, 'tokens_max': 0, 'over_budget': 0})
+            counts['calls'] += 1
+            counts['tokens_total'] += tokens
+            counts['tokens_max'] = max(counts['tokens_max'], tokens)
+            counts['over_budget'] += int(tokens > budget)
+
+prompt_builder = PromptBuilder(**PROMPT_BUDGET_CONFIG)
@@ -0,0 +1,252 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import openai
+from src.config.config import LLM_RESILIENCE_CONFIG
+from src.utils import logger
+from src.utils.exceptions import ServiceUnavailableError
+
+_RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+class LLMUnavailableError(ServiceUnavailableError):
+    def __init__(self, detail: str):
+        super().__init__(f"LLM unavailable: {detail}")
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            # Let exactly one probe through; its outcome closes or re-opens the breaker. A probe that never reports
+            # back holds its lease for reset_timeout at most.
+            if self.state == 'half_open' and (not self._probing or time.monotonic() - self._probe_started >= self.reset_timeout):
+                self._probing = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def release(self):
+        # The call ended without saying anything about the model's health (cancelled, or rejected as invalid).
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float):
+        with self._lock:
+            self._samples.append(elapsed)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+class LLMResilience:
+    def __init__(self, default_deadline: float = 60.0, deadlines: Optional[Dict[str, float]] = None,
+                 attempt_timeout_fraction: float = 0.4, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 hedge_enabled: bool = True, hedge_quantile: float = 0.95, hedge_min_delay: float = 2.0,
+                 hedge_min_samples: int = 20, breaker_failure_threshold: int = 5, breaker_reset_timeout: float = 30.0,
+                 fallback_models: Optional[List[str]] = None):
+        self.default_deadline = default_deadline
+        self.deadlines = deadlines or {}
+        self.attempt_timeout_fraction = attempt_timeout_fraction
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.fallback_models = fallback_models or []
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Keyed by (model, prompt type): a short intent call and a long analysis must not share one hedge delay.
+        self._latencies: Dict[Tuple[str, str], LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'fallbacks': 0,
+                          'breaker_rejections': 0, 'deadline_exceeded': 0, 'failures': 0}
+
+    def deadline_for(self, prompt_type: Optional[str]) -> float:
+        return float(self.deadlines.get(prompt_type, self.default_deadline))
+
+    def model_chain(self, model: str) -> List[str]:
+        return [model] + [candidate for candidate in self.fallback_models if candidate != model]
+
+    async def run(self, prompt_type: Optional[str], model: str, call: Callable[[str], Awaitable[Any]], hedge: bool = True) -> Any:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_for(prompt_type)
+        # One hung attempt must not spend the whole deadline, or a timeout could never be retried or fall back.
+        attempt_timeout = self.deadline_for(prompt_type) * self.attempt_timeout_fraction
+        # Calls that are never hedged (opening a stream) finish long before a full completion would; their timings
+        # would pull the hedge delay down, so they are not recorded.
+        latency_key = (prompt_type or 'completion') if hedge else None
+        last_error: Optional[BaseException] = None
+        self._count('calls')
+
+        for position, candidate in enumerate(self.model_chain(model)):
+            breaker = self._breaker(candidate)
+            if not breaker.allow():
+                self._count('breaker_rejections')
+                logger.warning(f"Circuit open for model {candidate}, skipping")
+                continue
+            if position > 0:
+                self._count('fallbacks')
+                logger.warning(f"Falling back to model {candidate}")
+
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise self._deadline_error(prompt_type) from last_error
+                timeout = min(remaining, attempt_timeout) if attempt_timeout > 0 else remaining
+                try:
+                    if hedge and self.hedge_enabled:
+                        result = await asyncio.wait_for(self._hedged(candidate, latency_key, call), timeout)
+                    else:
+                        result = await asyncio.wait_for(self._timed(candidate, latency_key, call), timeout)
+                    breaker.record_success()
+                    return result
+                except asyncio.CancelledError:
+                    breaker.release()
+                    raise
+                except asyncio.TimeoutError as e:
+                    breaker.record_failure()
+                    last_error = e
+                    if deadline - loop.time() <= 0:
+                        raise self._deadline_error(prompt_type) from last_error
+                except _RETRYABLE_ERRORS as e:
+                    breaker.record_failure()
+                    last_error = e
+                except Exception as e:
+                    # Errors such as a bad request or unknown model will not go away on retry; try the next model.
+                    # They say nothing about the model's availability, so the breaker does not count them.
+                    breaker.release()
+                    last_error = e
+                    logger.warning(f"Model {candidate} failed with a non-retryable error: {str(e)}")
+                    break
+
+                if attempt == self.max_retries or breaker.state == 'open':
+                    break
+                self._count('retries')
+                backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                logger.warning(f"Retrying model {candidate} in {backoff:.2f}s after: {str(last_error) or type(last_error).__name__}")
+                await asyncio.sleep(min(backoff, max(0.0, deadline - loop.time())))
+
+        self._count('failures')
+        if last_error is None:
+            raise LLMUnavailableError("all models are temporarily disabled after repeated failures")
+        raise LLMUnavailableError(str(last_error) or type(last_error).__name__) from last_error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            models = {model: {'circuit': breaker.state, 'latency': {}} for model, breaker in self._breakers.items()}
+            for (model, prompt_type), tracker in self._latencies.items():
+                models.setdefault(model, {'circuit': 'closed', 'latency': {}})['latency'][prompt_type] = {
+                    'p50': tracker.quantile(0.5, 1),
+                    'p95': tracker.quantile(0.95, 1)
+                }
+        return {**counters, 'models': models}
+
+    def _deadline_error(self, prompt_type: Optional[str]) -> LLMUnavailableError:
+        self._count('deadline_exceeded')
+        return LLMUnavailableError(f"{prompt_type or 'completion'} request exceeded its {self.deadline_for(prompt_type):g}s deadline")
+
+    async def _timed(self, model: str, latency_key: Optional[str], call: Callable[[str], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        result = await call(model)
+        if latency_key is not None:
+            self._latency(model, latency_key).record(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, model: str, latency_key: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        p95 = self._latency(model, latency_key).quantile(self.hedge_quantile, self.hedge_min_samples)
+        if p95 is None:
+            return await self._timed(model, latency_key, call)
+
+        primary = asyncio.ensure_future(self._timed(model, latency_key, call))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(self.hedge_min_delay, p95))
+            if not done:
+                # The first request is slower than almost all recent ones; race a duplicate against it.
+                self._count('hedges')
+                tasks.add(asyncio.ensure_future(self._timed(model, latency_key, call)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if not primary.done():
+                primary.cancel()
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(self.breaker_failure_threshold, self.breaker_reset_timeout)
+                self._breakers[model] = breaker
+            return breaker
+
+    def _latency(self, model: str, prompt_type: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._latencies.get((model, prompt_type))
+            if tracker is None:
+                tracker = LatencyTracker()
+                self._latencies[(model, prompt_type)] = tracker
+            return tracker
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+llm_resilience = LLMResilience(**LLM_RESILIENCE_CONFIG)
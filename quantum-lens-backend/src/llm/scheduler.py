@@ -0,0 +1,259 @@
+import asyncio
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from src.config.config import LLM_SCHEDULER_CONFIG
+from src.utils import logger
+from src.utils.exceptions import ServiceUnavailableError
+
+PRIORITY_CLASSES = ('interactive', 'normal', 'background')
+
+class LLMOverloadedError(ServiceUnavailableError):
+    def __init__(self, detail: str):
+        super().__init__(f"LLM capacity exceeded: {detail}")
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+
+    def wait_time(self, amount: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        # A single request larger than the bucket is admitted once the bucket is full.
+        amount = min(amount, self.capacity)
+        if self._level >= amount:
+            return 0.0
+        return (amount - self._level) / self.rate
+
+    def consume(self, amount: float):
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._level -= min(amount, self.capacity)
+
+    def level(self) -> float:
+        self._refill()
+        return self._level
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+class _Waiter:
+    __slots__ = ('priority', 'sequence', 'project', 'tokens', 'future', 'enqueued_at')
+
+    def __init__(self, priority: int, sequence: int, project: str, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.project = project
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class LLMScheduler:
+    def __init__(self, enabled: bool = True, max_concurrent: int = 16, priorities: Optional[Dict[str, str]] = None,
+                 global_requests_per_second: float = 10.0, global_request_burst: float = 20.0,
+                 global_tokens_per_minute: float = 400000.0, project_requests_per_second: float = 2.0,
+                 project_request_burst: float = 5.0, project_tokens_per_minute: float = 100000.0,
+                 max_queue: Optional[Dict[str, int]] = None, max_wait: Optional[Dict[str, float]] = None,
+                 shed_background_at: int = 50, max_background_concurrent: Optional[int] = None):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        # Background work never holds every slot, so interactive requests always find one free soon.
+        self.max_background_concurrent = max_background_concurrent or max(1, max_concurrent // 2)
+        self.priorities = priorities or {}
+        self.project_requests_per_second = project_requests_per_second
+        self.project_request_burst = project_request_burst
+        self.project_tokens_per_minute = project_tokens_per_minute
+        self.max_queue = {name: 100 for name in PRIORITY_CLASSES}
+        self.max_queue.update(max_queue or {})
+        self.max_wait = {name: 30.0 for name in PRIORITY_CLASSES}
+        self.max_wait.update(max_wait or {})
+        self.shed_background_at = shed_background_at
+
+        self._global_requests = TokenBucket(global_requests_per_second, global_request_burst)
+        self._global_tokens = TokenBucket(global_tokens_per_minute / 60.0, global_tokens_per_minute)
+        self._project_buckets: Dict[str, tuple] = {}
+        self._queue: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._running_background = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+        self._metrics = {
+            name: {'admitted': 0, 'shed': 0, 'expired': 0, 'wait_time_total': 0.0, 'wait_time_max': 0.0}
+            for name in PRIORITY_CLASSES
+        }
+
+    def priority_for(self, prompt_type: Optional[str]) -> str:
+        priority = self.priorities.get(prompt_type or 'chat', 'interactive')
+        return priority if priority in PRIORITY_CLASSES else 'interactive'
+
+    @asynccontextmanager
+    async def slot(self, prompt_type: Optional[str], project_id: Any = None, tokens: int = 0) -> AsyncIterator[None]:
+        if not self.enabled:
+            yield
+            return
+        name = await self.acquire(prompt_type, project_id, tokens)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    async def acquire(self, prompt_type: Optional[str], project_id: Any = None, tokens: int = 0) -> str:
+        name = self.priority_for(prompt_type)
+        priority = PRIORITY_CLASSES.index(name)
+        project = str(project_id) if project_id is not None else '-'
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            depth = self._depth(name)
+            if name == 'background' and len(self._queue) >= self.shed_background_at:
+                self._metrics[name]['shed'] += 1
+                raise LLMOverloadedError("background work is shed while the queue is under pressure")
+            if depth >= self.max_queue[name] and not self._shed_lower(priority):
+                self._metrics[name]['shed'] += 1
+                raise LLMOverloadedError(f"{name} queue is full")
+
+            waiter = _Waiter(priority, next(self._sequence), project, tokens, loop.create_future())
+            self._queue.append(waiter)
+            self._dispatch(loop)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait[name])
+            return name
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter.future.done() and not waiter.future.exception():
+                    # Admitted at the last moment; keep the slot.
+                    return name
+                self._remove(waiter)
+                self._metrics[name]['expired'] += 1
+            raise LLMOverloadedError(f"{name} request waited longer than {self.max_wait[name]:g}s")
+        except asyncio.CancelledError:
+            admitted = waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception()
+            if admitted:
+                self.release(name)
+            else:
+                with self._lock:
+                    self._remove(waiter)
+            raise
+
+    def release(self, name: str):
+        with self._lock:
+            self._running -= 1
+            if name == 'background':
+                self._running_background -= 1
+            self._dispatch(asyncio.get_running_loop())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            classes = {}
+            for name, metrics in self._metrics.items():
+                classes[name] = {
+                    'queue_depth': self._depth(name),
+                    'admitted': metrics['admitted'],
+                    'shed': metrics['shed'],
+                    'expired': metrics['expired'],
+                    'wait_time_avg': round(metrics['wait_time_total'] / metrics['admitted'], 6) if metrics['admitted'] else 0.0,
+                    'wait_time_max': round(metrics['wait_time_max'], 6)
+                }
+            return {
+                'enabled': self.enabled,
+                'running': self._running,
+                'running_background': self._running_background,
+                'max_concurrent': self.max_concurrent,
+                'max_background_concurrent': self.max_background_concurrent,
+                'queued': len(self._queue),
+                'global_request_tokens': round(self._global_requests.level(), 2),
+                'global_llm_tokens': round(self._global_tokens.level(), 2),
+                'classes': classes
+            }
+
+    def _depth(self, name: str) -> int:
+        priority = PRIORITY_CLASSES.index(name)
+        return sum(1 for waiter in self._queue if waiter.priority == priority)
+
+    def _shed_lower(self, priority: int) -> bool:
+        # Called with self._lock held. Makes room for higher-priority work by failing the newest lower-priority waiter.
+        victims = [waiter for waiter in self._queue if waiter.priority > priority]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda waiter: (waiter.priority, waiter.sequence))
+        self._remove(victim)
+        name = PRIORITY_CLASSES[victim.priority]
+        self._metrics[name]['shed'] += 1
+        if not victim.future.done():
+            victim.future.set_exception(LLMOverloadedError(f"{name} work was shed for higher-priority requests"))
+        return True
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+
+    def _project_bucket(self, project: str) -> tuple:
+        buckets = self._project_buckets.get(project)
+        if buckets is None:
+            buckets = (
+                TokenBucket(self.project_requests_per_second, self.project_request_burst),
+                TokenBucket(self.project_tokens_per_minute / 60.0, self.project_tokens_per_minute)
+            )
+            self._project_buckets[project] = buckets
+        return buckets
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop):
+        # Called with self._lock held.
+        next_check = None
+        for waiter in sorted(self._queue, key=lambda waiter: (waiter.priority, waiter.sequence)):
+            if self._running >= self.max_concurrent:
+                break
+            if waiter.future.done():
+                self._remove(waiter)
+                continue
+            name = PRIORITY_CLASSES[waiter.priority]
+            if name == 'background' and self._running_background >= self.max_background_concurrent:
+                continue
+            global_delay = max(self._global_requests.wait_time(1), self._global_tokens.wait_time(waiter.tokens))
+            if global_delay > 0:
+                # Global limits apply to everyone, so nothing behind this waiter can go either.
+                next_check = global_delay
+                break
+            project_requests, project_tokens = self._project_bucket(waiter.project)
+            project_delay = max(project_requests.wait_time(1), project_tokens.wait_time(waiter.tokens))
+            if project_delay > 0:
+                next_check = project_delay if next_check is None else min(next_check, project_delay)
+                continue
+
+            for bucket, amount in ((self._global_requests, 1), (self._global_tokens, waiter.tokens),
+                                   (project_requests, 1), (project_tokens, waiter.tokens)):
+                bucket.consume(amount)
+            self._remove(waiter)
+            self._running += 1
+            if name == 'background':
+                self._running_background += 1
+            waited = time.monotonic() - waiter.enqueued_at
+            metrics = self._metrics[name]
+            metrics['admitted'] += 1
+            metrics['wait_time_total'] += waited
+            metrics['wait_time_max'] = max(metrics['wait_time_max'], waited)
+            if waited > 1.0:
+                logger.info(f"LLM {name} request admitted after waiting {waited:.2f}s")
+            waiter.future.set_result(None)
+
+        if next_check is not None and self._queue and self._timer is None:
+            self._timer = loop.call_later(next_check, self._on_timer, loop)
+
+    def _on_timer(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            self._timer = None
+            self._dispatch(loop)
+
+llm_scheduler = LLMScheduler(**LLM_SCHEDULER_CONFIG)
@@ -0,0 +1,191 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from src.config.config import SCHEMA_PRUNING_CONFIG
+from src.llm.prompt_builder import column_names, compact_schema, count_tokens
+from src.utils import logger
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'do', 'does', 'for', 'from', 'give', 'how', 'i', 'in', 'is', 'it',
+    'list', 'many', 'me', 'much', 'my', 'of', 'on', 'or', 'per', 'show', 'the', 'their', 'there', 'to', 'was', 'what',
+    'when', 'where', 'which', 'who', 'with', 'all', 'each', 'get', 'find', 'have', 'has', 'our', 'we', 'you', 'your'
+})
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD.findall(_CAMEL_BOUNDARY.sub(' ', str(text)).lower().replace('_', ' '))
+    return [_stem(word) for word in words if word not in _STOPWORDS]
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith(('ses', 'xes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+class SchemaIndex:
+    """BM25 over table names, column names and foreign key targets, with FK-neighbour expansion."""
+
+    def __init__(self, schema: Dict[str, Any], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tables: Dict[str, Dict[str, Any]] = {table['name']: table for table in schema.get('tables', []) if table.get('name')}
+        self.neighbours: Dict[str, set] = {name: set() for name in self.tables}
+        self._documents: Dict[str, Counter] = {}
+
+        for name, table in self.tables.items():
+            terms = tokenize(name) * 3
+            for column in column_names(table):
+                terms.extend(tokenize(column))
+            for foreign_key in table.get('foreign_keys') or []:
+                referenced = foreign_key.get('referenced_table')
+                terms.extend(tokenize(referenced or ''))
+                if referenced in self.tables:
+                    self.neighbours[name].add(referenced)
+                    self.neighbours[referenced].add(name)
+            self._documents[name] = Counter(terms)
+
+        lengths = [sum(document.values()) for document in self._documents.values()]
+        self._average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        document_frequency = Counter()
+        for document in self._documents.values():
+            document_frequency.update(document.keys())
+        total = len(self._documents)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def score(self, question: str) -> Dict[str, float]:
+        terms = set(tokenize(question))
+        scores = {}
+        for name, document in self._documents.items():
+            length = sum(document.values())
+            score = 0.0
+            for term in terms:
+                frequency = document.get(term)
+                if not frequency:
+                    continue
+                norm = frequency + self.k1 * (1 - self.b + self.b * length / (self._average_length or 1))
+                score += self._idf[term] * frequency * (self.k1 + 1) / norm
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def select(self, question: str, top_k: int, expand_foreign_keys: bool = True, max_tables: Optional[int] = None) -> List[str]:
+        scores = self.score(question)
+        ranked = sorted(scores, key=lambda name: (-scores[name], name))[:top_k]
+        selected = list(ranked)
+        if expand_foreign_keys:
+            for name in ranked:
+                for neighbour in sorted(self.neighbours.get(name, ())):
+                    if neighbour not in selected:
+                        selected.append(neighbour)
+        if max_tables is not None:
+            selected = selected[:max_tables]
+        return selected
+
+class SchemaPruner:
+    def __init__(self, enabled: bool = True, top_k: int = 8, max_tables: int = 20, min_tables: int = 12,
+                 expand_foreign_keys: bool = True, fallback: str = 'full', index_cache_size: int = 64):
+        self.enabled = enabled
+        self.top_k = top_k
+        self.max_tables = max_tables
+        self.min_tables = min_tables
+        self.expand_foreign_keys = expand_foreign_keys
+        self.fallback = fallback
+        self.index_cache_size = index_cache_size
+
+        self._indexes: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._requests = 0
+        self._pruned = 0
+        self._fallbacks = 0
+        self._tables_in = 0
+        self._tables_out = 0
+        self._tokens_in = 0
+        self._tokens_out = 0
+
+    def prompt_schema(self, schema: Dict[str, Any], question: str) -> Dict[str, Any]:
+        """Return the subset of the schema a prompt needs; connection details never go to the model."""
+        tables = schema.get('tables', [])
+        selected = tables
+        fell_back = False
+
+        if self.enabled and len(tables) > self.min_tables and question:
+            names = self._index(schema).select(question, self.top_k, self.expand_foreign_keys, self.max_tables)
+            if names:
+                order = {name: position for position, name in enumerate(names)}
+                selected = sorted((table for table in tables if table.get('name') in order), key=lambda table: order[table['name']])
+            else:
+                fell_back = True
+                selected = self._fallback_tables(tables)
+
+        pruned = {'database_name': schema.get('database_name'), 'tables': selected}
+        self._record(schema, tables, pruned, fell_back)
+        return pruned
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'requests': self._requests,
+                'pruned': self._pruned,
+                'fallbacks': self._fallbacks,
+                'tables_in': self._tables_in,
+                'tables_out': self._tables_out,
+                'tokens_in': self._tokens_in,
+                'tokens_out': self._tokens_out,
+                'tokens_saved': self._tokens_in - self._tokens_out
+            }
+
+    def _fallback_tables(self, tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.fallback == 'largest':
+            return sorted(tables, key=lambda table: -int(table.get('row_count') or 0))[:self.top_k]
+        return tables
+
+    def _record(self, schema: Dict[str, Any], tables: List[Dict[str, Any]], pruned: Dict[str, Any], fell_back: bool):
+        tokens_in = self._index_entry(schema)[1]
+        tokens_out = tokens_in if pruned['tables'] is tables else _estimate_tokens(pruned)
+        with self._lock:
+            self._requests += 1
+            self._pruned += int(pruned['tables'] is not tables)
+            self._fallbacks += int(fell_back)
+            self._tables_in += len(tables)
+            self._tables_out += len(pruned['tables'])
+            self._tokens_in += tokens_in
+            self._tokens_out += tokens_out
+        if pruned['tables'] is not tables:
+            logger.info(f"Pruned prompt schema from {len(tables)} to {len(pruned['tables'])} tables "
+                        f"(~{tokens_in - tokens_out} tokens saved)")
+
+    def _index(self, schema: Dict[str, Any]) -> SchemaIndex:
+        return self._index_entry(schema)[0]
+
+    def _index_entry(self, schema: Dict[str, Any]) -> tuple:
+        # Schemas come from the schema cache, so the same dict is reused until the schema changes.
+        key = id(schema)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] is schema:
+                self._indexes.move_to_end(key)
+                return cached[1], cached[2]
+
+        index = SchemaIndex(schema)
+        tokens = _estimate_tokens({'database_name': schema.get('database_name'), 'tables': schema.get('tables', [])})
+        with self._lock:
+            self._indexes[key] = (schema, index, tokens)
+            while len(self._indexes) > self.index_cache_size:
+                self._indexes.popitem(last=False)
+        return index, tokens
+
+def _estimate_tokens(schema: Dict[str, Any]) -> int:
+    return count_tokens(compact_schema(schema))
+
+schema_pruner = SchemaPruner(**SCHEMA_PRUNING_CONFIG)
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+        self._leaders = 0
+        self._coalesced = 0
+        self._failures = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Tasks belong to one event loop, so flights are only shared within a loop.
+        flight_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._inflight.get(flight_key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._inflight[flight_key] = task
+                self._leaders += 1
+                task.add_done_callback(lambda done: self._finish(flight_key, done))
+            else:
+                self._coalesced += 1
+        # The shared call runs as its own task, so one caller disconnecting does not cancel it for the others.
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._leaders + self._coalesced
+            return {
+                'in_flight': len(self._inflight),
+                'upstream_calls': self._leaders,
+                'coalesced': self._coalesced,
+                'failures': self._failures,
+                'coalesced_rate': round(self._coalesced / calls, 4) if calls else 0.0
+            }
+
+    def _finish(self, flight_key: Tuple[int, str], task: asyncio.Task):
+        with self._lock:
+            if self._inflight.get(flight_key) is task:
+                del self._inflight[flight_key]
+            # Retrieve the exception so it is not reported as unhandled when every waiter has gone away.
+            if not task.cancelled() and task.exception() is not None:
+                self._failures += 1
+
+llm_singleflight = SingleFlight()
@@ -1,5 +1,6 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from .api.auth_routes import router as auth_router
 from .api.project_routes import router as project_router
 from .api.chat_routes import router as chat_router
@@ -7,9 +8,21 @@ from .api.sql_routes import router as sql_router
 from .service.auth.auth_service import AuthService
 from .service.projects.project_service import ProjectService
 from .service.chat.chat_service import ChatService
-from .service.sql.sql_service import SQLService
-from .llm import OpenRouterClient
+from .service.chat.context_window import context_window
+from .service.chat.session_store import session_store
+from .service.sql.intent_classifier import intent_classifier
+from .service.sql.sql_service import SQLService, pipeline_metrics
+from .service.projects.schema_cache import schema_cache
+from .service.auth.identity_cache import identity_cache
+from .service.auth.password_hasher import password_hasher
+from .llm import OpenRouterClient, completion_cache, llm_resilience, llm_scheduler, llm_singleflight, prompt_builder, schema_pruner
+from .db import db
+from .db.async_connection import async_db
+from .db.executor import sandbox_executor
+from .db.result_cache import query_result_cache
+from .db.sandbox_pool import sandbox_registry
 from .utils import logger
+from .utils.metrics import RequestMetricsMiddleware, metrics
 import asyncio
 
 app = FastAPI(
@@ -24,7 +37,92 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+def _component_samples():
+    # Counters the caches, scheduler and sandbox pool already keep, read at scrape time.
+    llm_cache = completion_cache.stats()
+    schemas = schema_cache.stats()
+    query_results = query_result_cache.stats()
+    identities = identity_cache.stats()
+    hasher = password_hasher.stats()
+    metadata_pool = async_db.stats()
+    chat_store = session_store.stats()
+    chat_context = context_window.stats()
+    scheduler = llm_scheduler.stats()
+    resilience = llm_resilience.stats()
+    singleflight = llm_singleflight.stats()
+    pruning = schema_pruner.stats()
+    intents = intent_classifier.stats()
+    sandboxes = sandbox_registry.stats()
+    executor = sandbox_executor.stats()
+    cache_lookups = [
+        ('llm_completion', 'memory_hit', llm_cache['memory_hits']),
+        ('llm_completion', 'disk_hit', llm_cache['disk_hits']),
+        ('llm_completion', 'miss', llm_cache['misses']),
+        ('schema', 'hit', schemas['hits']),
+        ('schema', 'miss', schemas['misses']),
+        ('query_result', 'hit', query_results['hits']),
+        ('query_result', 'miss', query_results['misses']),
+        ('query_result', 'bypass', query_results['bypassed']),
+        ('identity', 'hit', identities['hits']),
+        ('identity', 'miss', identities['misses'])
+    ]
+    samples = [
+        ('cache_requests_total', 'counter', 'Cache lookups by cache and result.', {'cache': cache, 'result': result}, value)
+        for cache, result, value in cache_lookups
+    ]
+    samples.append(('llm_scheduler_running', 'gauge', 'LLM calls holding a scheduler slot.', {}, scheduler['running']))
+    for name, stats in scheduler['classes'].items():
+        samples.append(('llm_scheduler_queue_depth', 'gauge', 'LLM calls waiting for a scheduler slot.', {'priority': name}, stats['queue_depth']))
+    for name, stats in scheduler['classes'].items():
+        samples.append(('llm_scheduler_shed_total', 'counter', 'LLM calls rejected by the scheduler.', {'priority': name}, stats['shed']))
+    for event in ('calls', 'retries', 'hedges', 'hedge_wins', 'fallbacks', 'breaker_rejections', 'deadline_exceeded', 'failures'):
+        samples.append(('llm_resilience_events_total', 'counter', 'LLM calls and their retries, hedges, fallbacks and failures.', {'event': event}, resilience[event]))
+    for model, stats in resilience['models'].items():
+        samples.append(('llm_circuit_open', 'gauge', 'Whether the circuit breaker for a model is open or half-open.', {'model': model}, int(stats['circuit'] != 'closed')))
+    samples.append(('llm_singleflight_calls_total', 'counter', 'Identical LLM calls by whether they went upstream or joined one in flight.', {'result': 'upstream'}, singleflight['upstream_calls']))
+    samples.append(('llm_singleflight_calls_total', 'counter', 'Identical LLM calls by whether they went upstream or joined one in flight.', {'result': 'coalesced'}, singleflight['coalesced']))
+    for prompt_type, counts in prompt_builder.stats().items():
+        labels = {'prompt_type': prompt_type}
+        samples.append(('llm_prompts_total', 'counter', 'Prompts built by prompt type.', labels, counts['calls']))
+        samples.append(('llm_prompt_tokens_total', 'counter', 'Prompt tokens built by prompt type.', labels, counts['tokens_total']))
+        samples.append(('llm_prompts_over_budget_total', 'counter', 'Prompts still over their token budget after compaction.', labels, counts['over_budget']))
+    samples.append(('schema_pruning_requests_total', 'counter', 'Schemas pruned for a prompt, by outcome.', {'result': 'pruned'}, pruning['pruned']))
+    samples.append(('schema_pruning_requests_total', 'counter', 'Schemas pruned for a prompt, by outcome.', {'result': 'fallback'}, pruning['fallbacks']))
+    samples.append(('schema_pruning_tokens_saved_total', 'counter', 'Schema tokens left out of prompts by pruning.', {}, pruning['tokens_saved']))
+    for result in ('local_sql', 'local_text', 'fallbacks'):
+        samples.append(('intent_decisions_total', 'counter', 'Intent decisions made locally or left to the LLM.', {'result': result}, intents[result]))
+    for mode, stats in pipeline_metrics.stats().items():
+        samples.append(('sql_pipeline_requests_total', 'counter', 'SQL pipeline requests by mode.', {'mode': mode}, stats['requests']))
+        samples.append(('sql_pipeline_llm_calls_total', 'counter', 'LLM calls made by the SQL pipeline, by mode.', {'mode': mode}, stats['llm_calls']))
+    samples.append(('sandbox_executor_queue_depth', 'gauge', 'Sandbox calls waiting for a worker.', {}, executor['queue_depth']))
+    samples.append(('sandbox_executor_running', 'gauge', 'Sandbox calls running on a worker.', {}, executor['running']))
+    for result in ('completed', 'failed', 'rejected'):
+        samples.append(('sandbox_executor_calls_total', 'counter', 'Sandbox calls by outcome.', {'result': result}, executor[f'{result}_total']))
+    for state in ('in_use', 'idle'):
+        samples.append(('sandbox_connections', 'gauge', 'Sandbox database connections by state.', {'state': state}, sandboxes[f'{state}_connections']))
+    samples.append(('sandbox_pool_exhausted_total', 'counter', 'Sandbox connection acquires that found the pool full.', {}, sandboxes['exhausted_total']))
+    samples.append(('metadata_db_connections', 'gauge', 'Metadata database connections by state.', {'state': 'in_use'}, metadata_pool['size'] - metadata_pool['idle']))
+    samples.append(('metadata_db_connections', 'gauge', 'Metadata database connections by state.', {'state': 'idle'}, metadata_pool['idle']))
+    samples.append(('metadata_db_pool_exhausted_total', 'counter', 'Metadata database acquires that timed out waiting for a connection.', {}, metadata_pool['exhausted_total']))
+    samples.append(('chat_store_pending_turns', 'gauge', 'Chat turns queued for the next session store write.', {}, chat_store['pending']))
+    samples.append(('chat_store_batches_total', 'counter', 'Session store write transactions.', {}, chat_store['batches_total']))
+    samples.append(('chat_store_turns_total', 'counter', 'Chat turns written to the session store.', {}, chat_store['appends_total']))
+    samples.append(('chat_store_errors_total', 'counter', 'Session store writes that failed.', {}, chat_store['errors_total']))
+    samples.append(('chat_prompts_total', 'counter', 'Chat prompts built from session history.', {}, chat_context['prompts']))
+    samples.append(('chat_compactions_total', 'counter', 'Chat prompts that folded older turns into the digest.', {}, chat_context['compactions']))
+    samples.append(('chat_digest_failures_total', 'counter', 'Digest updates that failed and left older turns out.', {}, chat_context['digest_failures']))
+    samples.append(('chat_prompt_tokens_max', 'gauge', 'Largest chat prompt built so far, in tokens.', {}, chat_context['prompt_tokens_max']))
+    samples.append(('password_hash_in_flight', 'gauge', 'Password hashes queued or running on the hashing pool.', {}, hasher['in_flight']))
+    samples.append(('password_hash_total', 'counter', 'Password hashes and verifications by outcome.', {'result': 'completed'}, hasher['completed_total']))
+    samples.append(('password_hash_total', 'counter', 'Password hashes and verifications by outcome.', {'result': 'rejected'}, hasher['rejected_total']))
+    samples.append(('identity_cache_invalidations_total', 'counter', 'Cached identities dropped after a profile change.', {}, identities['invalidations']))
+    return samples
+
+metrics.register_collector(_component_samples)
 
 services = {}
 
@@ -39,6 +137,10 @@ async def startup_event():
         
         services["auth"].init_db()
         services["projects"].init_db()
+        services["chat"].init_db()
+        # The sync pool only runs the table setup above; requests use async_db. Close it rather than keep an idle
+        # connection and its reaper for the life of the process (it reopens on demand).
+        db.disconnect()
         
         logger.info("Services initialized successfully")
     except Exception as e:
@@ -60,6 +162,13 @@ async def shutdown_event():
             await asyncio.gather(*tasks, return_exceptions=True)
             
         services.clear()
+        sandbox_executor.shutdown()
+        password_hasher.shutdown()
+        sandbox_registry.close()
+        completion_cache.close()
+        await session_store.close()
+        await async_db.close()
+        db.disconnect()
         logger.info("Services shutdown completed")
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
@@ -69,6 +178,12 @@ app.include_router(project_router, prefix="/api/v1")
 app.include_router(chat_router, prefix="/api/v1")
 app.include_router(sql_router, prefix="/api/v1")
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 async def root():
     return {
@@ -205,10 +205,25 @@ For non-SQL queries, provide a helpful redirect response.""",
     ]
 }
 
+CONVERSATION_DIGEST = {
+    "system": """You are a conversation summarizer for a database assistant. You receive the current summary of a chat and the messages that followed it.
+
+Write an updated summary that replaces the current one:
+1. Keep the user's goals, decisions and constraints
+2. Keep table names, column names, filters and SQL that later questions may refer back to
+3. Keep results or numbers the user may ask about again
+4. Drop greetings, repetition and anything already superseded
+
+Respond with the summary only, as short plain-text notes.""",
+
+    "examples": []
+}
+
 def get_prompt_template(prompt_type: str) -> Dict:
     prompts = {
         'comprehensive': SMART_SQL_ASSISTANT,
         'error': SIMPLE_ERROR_HANDLER,
-        'intent': INTENT_CHECKER
+        'intent': INTENT_CHECKER,
+        'digest': CONVERSATION_DIGEST
     }
     return prompts.get(prompt_type, SMART_SQL_ASSISTANT) 
\ No newline at end of file
@@ -1,32 +1,23 @@
 from src.db import db
 from src.utils import logger
 import jwt
-try:
-    import bcrypt
-except ImportError:
-    bcrypt = None
 from datetime import datetime, timedelta
 from src.config.config import JWT_SECRET, JWT_EXPIRATION
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.db.repositories import UserRepository, user_repository
+from src.service.auth.identity_cache import identity_cache
+from src.service.auth.password_hasher import is_bcrypt_hash, password_hasher
 from src.utils.exceptions import AuthenticationError
 
 class AuthService:
-    def __init__(self):
-        self.db = db
-
-    def register_user(self, user_data):
-        with self.db.cursor() as cursor:
-            cursor.execute("SELECT * FROM users WHERE email = %s", (user_data['email'],))
-            if cursor.fetchone():
-                raise AuthenticationError("Email already registered")
-
-            hashed_password = generate_password_hash(user_data['password'], method='pbkdf2:sha256:30000')
-            logger.info(f"Generated hash for registration: {hashed_password}")
-            cursor.execute(
-                "INSERT INTO users (name, email, password) VALUES (%s, %s, %s)",
-                (user_data['name'], user_data['email'], hashed_password)
-            )
-            user_id = cursor.lastrowid
+    def __init__(self, users: UserRepository = user_repository):
+        self.users = users
+
+    async def register_user(self, user_data):
+        if await self.users.email_exists(user_data['email']):
+            raise AuthenticationError("Email already registered")
+
+        hashed_password = await password_hasher.hash(user_data['password'])
+        user_id = await self.users.create(user_data['name'], user_data['email'], hashed_password)
 
         token = self._generate_token(user_id)
         logger.info(f"User registered successfully: {user_data['email']}")
@@ -37,99 +28,73 @@ class AuthService:
             'token': token
         }
 
-    def login_user(self, credentials):
-        with self.db.cursor() as cursor:
-            cursor.execute("SELECT * FROM users WHERE email = %s", (credentials['email'],))
-            user = cursor.fetchone()
-            
-            if not user:
-                logger.warning(f"Login failed: User not found for email: {credentials['email']}")
-                raise AuthenticationError("Invalid email or password")
-
-            logger.info(f"Stored hash: {user['password']}")
-            logger.info(f"Checking password for user: {credentials['email']}")
-            
-            # Handle both bcrypt and pbkdf2 hashes
-            stored_hash = user['password']
-            if stored_hash.startswith('$2b$'):
-                if bcrypt is None:
-                    logger.error("bcrypt module not found, cannot verify old password hash")
-                    raise AuthenticationError("Unable to verify password")
-                
-                is_valid = bcrypt.checkpw(credentials['password'].encode('utf-8'), stored_hash.encode('utf-8'))
-                if is_valid:
-                    # Update to new hash method
-                    new_hash = generate_password_hash(credentials['password'], method='pbkdf2:sha256:30000')
-                    cursor.execute(
-                        "UPDATE users SET password = %s WHERE id = %s",
-                        (new_hash, user['id'])
-                    )
-                    logger.info(f"Updated password hash for user: {credentials['email']}")
-                else:
-                    logger.warning(f"Login failed: Invalid password for email: {credentials['email']}")
-                    raise AuthenticationError("Invalid email or password")
-            else:
-                # For pbkdf2 hashes
-                if not check_password_hash(stored_hash, credentials['password']):
-                    logger.warning(f"Login failed: Invalid password for email: {credentials['email']}")
-                    raise AuthenticationError("Invalid email or password")
-
-            token = self._generate_token(user['id'])
-            logger.info(f"User logged in successfully: {credentials['email']}")
-            return {
-                'id': user['id'],
-                'name': user['name'],
-                'email': user['email'],
-                'token': token
-            }
-
-    def update_profile(self, user_id, profile_data):
-        with self.db.cursor() as cursor:
-            if profile_data.get('currentPassword') and profile_data.get('newPassword'):
-                cursor.execute("SELECT password FROM users WHERE id = %s", (user_id,))
-                user = cursor.fetchone()
-                
-                if not check_password_hash(user['password'], profile_data['currentPassword']):
-                    raise AuthenticationError("Current password is incorrect")
-                    
-                if profile_data['newPassword'] != profile_data['confirmPassword']:
-                    raise AuthenticationError("New passwords do not match")
-                    
-                hashed_password = generate_password_hash(profile_data['newPassword'], method='pbkdf2:sha256:30000')
-                cursor.execute(
-                    "UPDATE users SET password = %s WHERE id = %s",
-                    (hashed_password, user_id)
-                )
-
-            if profile_data.get('name'):
-                cursor.execute(
-                    "UPDATE users SET name = %s WHERE id = %s",
-                    (profile_data['name'], user_id)
-                )
-
-            cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (user_id,))
-            user = cursor.fetchone()
-            return {
-                'id': user['id'],
-                'name': user['name'],
-                'email': user['email'],
-                'token': None
-            }
-
-    def verify_token(self, token: str):
+    async def login_user(self, credentials):
+        user = await self.users.get_by_email(credentials['email'])
+        if not user:
+            logger.warning(f"Login failed: User not found for email: {credentials['email']}")
+            raise AuthenticationError("Invalid email or password")
+
+        logger.info(f"Checking password for user: {credentials['email']}")
+        # Handles both bcrypt and pbkdf2 hashes
+        stored_hash = user['password']
+        if not await password_hasher.verify(stored_hash, credentials['password']):
+            logger.warning(f"Login failed: Invalid password for email: {credentials['email']}")
+            raise AuthenticationError("Invalid email or password")
+
+        if is_bcrypt_hash(stored_hash):
+            # Update to new hash method
+            await self.users.update(user['id'], password_hash=await password_hasher.hash(credentials['password']))
+            logger.info(f"Updated password hash for user: {credentials['email']}")
+
+        token = self._generate_token(user['id'])
+        logger.info(f"User logged in successfully: {credentials['email']}")
+        return {
+            'id': user['id'],
+            'name': user['name'],
+            'email': user['email'],
+            'token': token
+        }
+
+    async def update_profile(self, user_id, profile_data):
+        hashed_password = None
+        if profile_data.get('currentPassword') and profile_data.get('newPassword'):
+            stored_hash = await self.users.get_password_hash(user_id)
+            if not await password_hasher.verify(stored_hash, profile_data['currentPassword']):
+                raise AuthenticationError("Current password is incorrect")
+
+            if profile_data['newPassword'] != profile_data['confirmPassword']:
+                raise AuthenticationError("New passwords do not match")
+
+            hashed_password = await password_hasher.hash(profile_data['newPassword'])
+
+        user = await self.users.update(user_id, name=profile_data.get('name'), password_hash=hashed_password)
+        identity_cache.invalidate(user_id)
+        return {
+            'id': user['id'],
+            'name': user['name'],
+            'email': user['email'],
+            'token': None
+        }
+
+    async def verify_token(self, token: str):
         try:
             payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-            with self.db.cursor() as cursor:
-                cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (payload['user_id'],))
-                user = cursor.fetchone()
-                if user:
-                    return {
-                        'id': user['id'],
-                        'name': user['name'],
-                        'email': user['email'],
-                        'token': None
-                    }
-                return None
+            cached = identity_cache.get(payload['user_id'])
+            if cached is not None:
+                return cached
+
+            generation = identity_cache.generation()
+            user = await self.users.get_identity(payload['user_id'])
+            if user:
+                identity = {
+                    'id': user['id'],
+                    'name': user['name'],
+                    'email': user['email'],
+                    'token': None
+                }
+                identity_cache.put(payload['user_id'], identity, payload.get('exp'), generation)
+                return identity
+            return None
         except jwt.ExpiredSignatureError:
             logger.warning("Token verification failed: Token expired")
             return None
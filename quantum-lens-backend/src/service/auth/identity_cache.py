@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from src.config.config import IDENTITY_CACHE_CONFIG
+
+class _Identity:
+    __slots__ = ('value', 'expires_at')
+
+    def __init__(self, value: Dict[str, Any], expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+
+class IdentityCache:
+    """User identities resolved from tokens, kept no longer than the ttl or the token's own expiry.
+
+    Profile updates invalidate their entry. There is no user deletion path; if one is added it must invalidate too,
+    until then the ttl bounds how long a removed user's identity could be served.
+    """
+
+    def __init__(self, enabled: bool = True, ttl: float = 60.0, max_entries: int = 10000):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[str, _Identity]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._invalidations = 0
+
+    def get(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.monotonic() < entry.expires_at:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return dict(entry.value)
+                del self._entries[key]
+                self._expired += 1
+            self._misses += 1
+            return None
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, user_id: Any, identity: Dict[str, Any], token_exp: Optional[float], generation: int):
+        """Store an identity read at `generation`; skipped if an invalidation happened since."""
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, float(token_exp) - time.time())
+        if ttl <= 0:
+            return
+        key = str(user_id)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = _Identity(dict(identity), time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Any):
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            self._entries.pop(str(user_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'expired': self._expired,
+                'invalidations': self._invalidations
+            }
+
+identity_cache = IdentityCache(**IDENTITY_CACHE_CONFIG)
@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+from werkzeug.security import generate_password_hash, check_password_hash
+from src.config.config import PASSWORD_HASH_CONFIG
+from src.utils import logger
+from src.utils.exceptions import AuthenticationError, ServiceUnavailableError
+
+def is_bcrypt_hash(stored_hash: str) -> bool:
+    return stored_hash.startswith('$2b$')
+
+# Module-level so a process pool can pickle them.
+def hash_password(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+def check_password(stored_hash: str, password: str) -> bool:
+    if is_bcrypt_hash(stored_hash):
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+    return check_password_hash(stored_hash, password)
+
+class PasswordHasher:
+    """Runs password hashing off the event loop on a bounded pool; workers=0 hashes inline."""
+
+    def __init__(self, workers: int = 4, max_queue: int = 64, use_processes: bool = False, method: str = 'pbkdf2:sha256:30000'):
+        self.workers = workers
+        self.max_queue = max_queue
+        # hashlib and bcrypt release the GIL while hashing, so threads scale; processes are there for builds that do not.
+        self.use_processes = use_processes
+        self.method = method
+
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        self._pending = 0
+        self._completed_total = 0
+        self._rejected_total = 0
+        self._time_total = 0.0
+        self._time_max = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.method)
+
+    async def verify(self, stored_hash: str, password: str) -> bool:
+        if is_bcrypt_hash(stored_hash) and bcrypt is None:
+            logger.error("bcrypt module not found, cannot verify old password hash")
+            raise AuthenticationError("Unable to verify password")
+        return await self._run(check_password, stored_hash, password)
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        started = time.monotonic()
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._record(time.monotonic() - started)
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected_total += 1
+                logger.warning(f"Password hashing queue full ({self._pending} pending), rejecting request")
+                raise ServiceUnavailableError("Too many sign-in requests are being processed, please retry shortly")
+            self._pending += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._record(time.monotonic() - started)
+
+    def _record(self, elapsed: float):
+        # Includes time queued for a worker; a process pool cannot report when the work itself starts.
+        with self._lock:
+            self._completed_total += 1
+            self._time_total += elapsed
+            self._time_max = max(self._time_max, elapsed)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if self.use_processes:
+                        # spawn, not fork: the server process holds threads and open connections.
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._pool
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'use_processes': self.use_processes,
+                'max_queue': self.max_queue,
+                'in_flight': self._pending,
+                'completed_total': self._completed_total,
+                'rejected_total': self._rejected_total,
+                'time_avg': round(self._time_total / self._completed_total, 6) if self._completed_total else 0.0,
+                'time_max': round(self._time_max, 6)
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+password_hasher = PasswordHasher(**PASSWORD_HASH_CONFIG)
@@ -1,57 +1,39 @@
 from src.llm import OpenRouterClient
 from src.utils.exceptions import ValidationError
 from src.utils import logger
-from typing import List, Dict, Optional
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
 import uuid
 import json
 from datetime import datetime
+from .context_window import ContextWindow, context_window
+from .session_store import SessionStore, session_store
 
 class ChatService:
-    def __init__(self, llm_client: Optional[OpenRouterClient] = None):
+    def __init__(self, llm_client: Optional[OpenRouterClient] = None, store: SessionStore = session_store,
+                 context: ContextWindow = context_window):
         self.llm_client = llm_client or OpenRouterClient.get_instance()
-        self._sessions = {}
-        self._messages = {}
+        self.store = store
+        self.context = context
+
+    def init_db(self):
+        self.store.init_db()
 
     async def get_completion(
         self,
         messages: List[Dict[str, str]],
         project_id: int,
-        user_id: int
+        user_id: int,
+        session_id: Optional[str] = None
     ) -> Dict[str, str]:
         if not messages:
             raise ValidationError("Messages list cannot be empty")
 
-        session_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
+        timestamp = datetime.utcnow()
 
         try:
-            response = await self.llm_client.generate_completion_async(messages)
-            
-            session_data = {
-                "id": session_id,
-                "project_id": project_id,
-                "user_id": user_id,
-                "created_at": timestamp,
-                "updated_at": timestamp
-            }
-            
-            message_data = [
-                {
-                    "role": msg["role"],
-                    "content": msg["content"],
-                    "timestamp": timestamp
-                }
-                for msg in messages
-            ]
-            
-            message_data.append({
-                "role": "assistant",
-                "content": response,
-                "timestamp": timestamp
-            })
-            
-            self._sessions[session_id] = session_data
-            self._messages[session_id] = message_data
+            session_id, prompt, digest_update = await self._prepare(messages, project_id, user_id, session_id)
+            response = await self.llm_client.generate_completion_async(prompt, project_id=project_id)
+            await self._record_session(session_id, timestamp, messages, response, project_id, user_id, digest_update)
 
             logger.info(f"Chat completion generated for session {session_id}")
             return {"response": response, "session_id": session_id}
@@ -60,27 +42,97 @@ class ChatService:
             logger.error(f"Error generating chat completion: {str(e)}")
             raise
 
-    async def get_sessions(self, project_id: int, user_id: int) -> List[Dict]:
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        project_id: int,
+        user_id: int,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if not messages:
+            raise ValidationError("Messages list cannot be empty")
+
+        timestamp = datetime.utcnow()
+        try:
+            session_id, prompt, digest_update = await self._prepare(messages, project_id, user_id, session_id)
+        except Exception as e:
+            logger.error(f"Error preparing chat completion: {str(e)}")
+            yield {"type": "error", "content": {"error": getattr(e, 'detail', None) or str(e)}}
+            return
+        yield {"type": "session", "content": {"session_id": session_id}}
+
+        parts = []
+        tokens = self.llm_client.stream_completion_async(prompt, project_id=project_id)
         try:
-            sessions = [
-                session for session in self._sessions.values()
-                if session["project_id"] == project_id and session["user_id"] == user_id
-            ]
-            sessions.sort(key=lambda x: x["updated_at"], reverse=True)
-            return sessions
+            async for token in tokens:
+                parts.append(token)
+                yield {"type": "token", "content": {"text": token}}
+        except Exception as e:
+            logger.error(f"Error streaming chat completion: {str(e)}")
+            yield {"type": "error", "content": {"error": str(e)}}
+            return
+        finally:
+            # Stop the upstream request as soon as the client goes away.
+            await tokens.aclose()
+
+        response = ''.join(parts)
+        await self._record_session(session_id, timestamp, messages, response, project_id, user_id, digest_update)
+        logger.info(f"Chat completion streamed for session {session_id}")
+        yield {"type": "done", "content": {"session_id": session_id, "response": response}}
+
+    async def _prepare(self, messages: List[Dict[str, str]], project_id: int, user_id: int,
+                       session_id: Optional[str]) -> Tuple[str, List[Dict[str, str]], Optional[Tuple[Dict[str, Any], str]]]:
+        # A continued session only needs the new turn from the client; the rest comes from the store.
+        if session_id:
+            session = await self.store.get_session(session_id)
+            if session is None or session["project_id"] != project_id:
+                raise ValidationError("Session not found")
+            if session["user_id"] != user_id:
+                raise ValidationError("Unauthorized access to session")
+            history = await self.store.recent_messages(session_id, session["digest_seq"], self.context.max_history_messages)
+            digest = session["digest"]
+        else:
+            session_id = str(uuid.uuid4())
+            history, digest = [], None
+
+        # The new turn has no seqs until the store commits it; a concurrent request may take the next ones first.
+        turn = [{"role": msg["role"], "content": msg["content"], "turn_index": i} for i, msg in enumerate(messages)]
+        prompt, digest_update = await self.context.build(self.llm_client, project_id, history + turn, digest)
+        return session_id, prompt, digest_update
+
+    async def _record_session(self, session_id: str, timestamp: datetime, messages: List[Dict[str, str]], response: str, project_id: int, user_id: int,
+                              digest_update: Optional[Tuple[Dict[str, Any], str]] = None):
+        message_data = [{"role": msg["role"], "content": msg["content"]} for msg in messages]
+        message_data.append({"role": "assistant", "content": response})
+        try:
+            seqs = await self.store.append(session_id, project_id, user_id, message_data, timestamp)
+            if digest_update:
+                kept, digest = digest_update
+                digest_seq = kept["seq"] if "turn_index" not in kept else seqs[kept["turn_index"]]
+                await self.store.save_digest(session_id, digest_seq, digest)
+        except Exception as e:
+            # The reply is already generated; losing its history beats failing the request.
+            logger.error(f"Failed to record chat session {session_id}: {str(e)}")
+
+    async def get_sessions(self, project_id: int, user_id: int, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        try:
+            return await self.store.list_sessions(project_id, user_id, limit, cursor)
         except Exception as e:
             logger.error(f"Error fetching chat sessions: {str(e)}")
             raise
 
-    async def get_messages(self, session_id: str, user_id: int) -> List[Dict]:
+    async def get_messages(self, session_id: str, user_id: int, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
         try:
-            if session_id not in self._sessions:
+            session = await self.store.get_session(session_id)
+            if session is None:
                 raise ValidationError("Session not found")
-            
-            if self._sessions[session_id]["user_id"] != user_id:
+
+            if session["user_id"] != user_id:
                 raise ValidationError("Unauthorized access to session")
 
-            return self._messages.get(session_id, [])
+            return await self.store.list_messages(session_id, limit, cursor)
         except Exception as e:
             logger.error(f"Error fetching chat messages: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -0,0 +1,190 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from src.config.config import CHAT_CONTEXT_CONFIG
+from src.llm import completion_cache, count_tokens, prompt_builder
+from src.prompts.sql_analytics_prompts import get_prompt_template
+from src.utils import logger
+
+# Per-message framing the chat APIs add on top of the content.
+_MESSAGE_OVERHEAD = 4
+_WHITESPACE = re.compile(r"\s+")
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    return count_tokens(message['content']) + _MESSAGE_OVERHEAD
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(' ', text).strip()
+
+def _load_digest(digest: Optional[str]) -> Dict[str, Any]:
+    if not digest:
+        return {'system': [], 'summary': ''}
+    try:
+        state = json.loads(digest)
+        return {'system': list(state.get('system') or []), 'summary': state.get('summary') or ''}
+    except (ValueError, AttributeError):
+        # Not ours to interpret; treat it as a plain summary.
+        return {'system': [], 'summary': digest}
+
+class ContextWindow:
+    """Fits a chat session into a token budget.
+
+    The prompt is the session's distinct system content, a digest summarizing older turns, then the most recent turns
+    verbatim. When the turns outgrow the budget the oldest are folded into the digest until they fill only `compact_to`
+    of it, so the digest is rebuilt every few turns rather than on each one.
+    """
+
+    def __init__(self, token_budget: int = 6000, compact_to: float = 0.5, digest_enabled: bool = True,
+                 digest_max_tokens: int = 600, max_history_messages: int = 400):
+        self.token_budget = token_budget
+        self.compact_to = compact_to
+        self.digest_enabled = digest_enabled
+        self.digest_max_tokens = digest_max_tokens
+        self.max_history_messages = max_history_messages
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._compactions = 0
+        self._digest_failures = 0
+        self._messages_folded = 0
+        self._system_dropped = 0
+        self._prompt_tokens_total = 0
+        self._prompt_tokens_max = 0
+
+    async def build(self, llm_client: Any, project_id: Any, messages: List[Dict[str, Any]],
+                    digest: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[Tuple[Dict[str, Any], str]]]:
+        """Return the prompt for `messages` and, if the digest moved, (first message kept verbatim, new digest).
+
+        The digest covers every message before the one returned; the caller maps it to that message's seq.
+        """
+        state = _load_digest(digest)
+        system = self._distinct_system(state['system'], messages)
+        conversation = [message for message in messages if message['role'] != 'system']
+        system_tokens = sum(count_tokens(content) + _MESSAGE_OVERHEAD for content in system)
+
+        summary = state['summary']
+        tokens = system_tokens + self._summary_tokens(summary) + sum(message_tokens(message) for message in conversation)
+        if tokens <= self.token_budget or len(conversation) <= 1:
+            return self._prompt(system, summary, conversation), None
+
+        # The digest's own allowance is reserved, so the prompt stays under budget once it is rebuilt.
+        window_budget = (self.token_budget - system_tokens - self.digest_max_tokens - _MESSAGE_OVERHEAD) * self.compact_to
+        cut, kept = len(conversation) - 1, message_tokens(conversation[-1])
+        while cut > 0 and kept + message_tokens(conversation[cut - 1]) <= window_budget:
+            cut -= 1
+            kept += message_tokens(conversation[cut])
+        # Start the window on a user turn rather than on a reply whose question went into the digest.
+        while cut < len(conversation) - 1 and conversation[cut]['role'] != 'user':
+            cut += 1
+        older, window = conversation[:cut], conversation[cut:]
+
+        update = None
+        if not self.digest_enabled:
+            summary = ''
+            update = (window[0], json.dumps({'system': system, 'summary': ''}))
+        else:
+            folded = await self._fold(llm_client, project_id, summary, older)
+            if folded is not None:
+                summary = folded
+                update = (window[0], json.dumps({'system': system, 'summary': summary}))
+            # Otherwise the older turns are left out of this prompt only; the next turn tries the digest again.
+
+        with self._lock:
+            self._compactions += 1
+            self._messages_folded += len(older) if update else 0
+        return self._prompt(system, summary, window), update
+
+    def _distinct_system(self, pinned: List[str], messages: List[Dict[str, Any]]) -> List[str]:
+        # Clients tend to resend the same system prompt with every turn; each distinct text is kept once.
+        seen, distinct, dropped = set(), [], 0
+        for content in pinned + [message['content'] for message in messages if message['role'] == 'system']:
+            key = _normalize(content)
+            if not key or key in seen:
+                dropped += 1
+                continue
+            seen.add(key)
+            distinct.append(content)
+        with self._lock:
+            self._system_dropped += dropped
+        return distinct
+
+    def _summary_tokens(self, summary: str) -> int:
+        return count_tokens(summary) + _MESSAGE_OVERHEAD if summary else 0
+
+    def _prompt(self, system: List[str], summary: str, conversation: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        prompt = [{'role': 'system', 'content': content} for content in system]
+        if summary:
+            prompt.append({'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary}"})
+        prompt.extend({'role': message['role'], 'content': message['content']} for message in conversation)
+
+        tokens = sum(message_tokens(message) for message in prompt)
+        with self._lock:
+            self._calls += 1
+            self._prompt_tokens_total += tokens
+            self._prompt_tokens_max = max(self._prompt_tokens_max, tokens)
+        if tokens > self.token_budget:
+            logger.warning(f"Chat prompt has {tokens} tokens after compaction (budget {self.token_budget})")
+        return prompt
+
+    async def _fold(self, llm_client: Any, project_id: Any, summary: str, older: List[Dict[str, Any]]) -> Optional[str]:
+        # A long history arriving at once is folded in budget-sized chunks, so no digest prompt outgrows the budget.
+        chunk, chunk_tokens = [], 0
+        chunk_budget = self.token_budget - self.digest_max_tokens
+        for message in older:
+            line = f"{message['role']}: {message['content'][:prompt_builder.max_string_length]}"
+            line_tokens = count_tokens(line)
+            if chunk and chunk_tokens + line_tokens > chunk_budget:
+                summary = await self._summarize(llm_client, project_id, summary, chunk)
+                if summary is None:
+                    return None
+                chunk, chunk_tokens = [], 0
+            chunk.append(line)
+            chunk_tokens += line_tokens
+        if chunk:
+            summary = await self._summarize(llm_client, project_id, summary, chunk)
+        return summary
+
+    async def _summarize(self, llm_client: Any, project_id: Any, summary: str, lines: List[str]) -> Optional[str]:
+        context = {'summary': summary, 'messages': lines}
+        cache_key = completion_cache.make_key('digest', llm_client.default_model, context)
+        cached = await completion_cache.get_async('digest', cache_key)
+        if cached is not None:
+            return cached
+
+        transcript = '\n'.join(lines)
+        prompt = [
+            {'role': 'system', 'content': get_prompt_template('digest')['system']},
+            {'role': 'user', 'content': f"Current summary:\n{summary or '(none)'}\n\nMessages that followed:\n{transcript}"}
+        ]
+        try:
+            digest = (await llm_client.generate_completion_async(prompt, prompt_type='digest', project_id=project_id) or '').strip()
+        except Exception as e:
+            with self._lock:
+                self._digest_failures += 1
+            logger.warning(f"Could not update the chat digest: {str(e)}")
+            return None
+        if not digest:
+            with self._lock:
+                self._digest_failures += 1
+            return None
+        if count_tokens(digest) > self.digest_max_tokens:
+            digest = digest[:self.digest_max_tokens * 4]
+        completion_cache.put('digest', cache_key, digest)
+        return digest
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'token_budget': self.token_budget,
+                'digest_enabled': self.digest_enabled,
+                'prompts': self._calls,
+                'compactions': self._compactions,
+                'digest_failures': self._digest_failures,
+                'messages_folded': self._messages_folded,
+                'system_messages_dropped': self._system_dropped,
+                'prompt_tokens_avg': round(self._prompt_tokens_total / self._calls, 1) if self._calls else 0.0,
+                'prompt_tokens_max': self._prompt_tokens_max
+            }
+
+context_window = ContextWindow(**CHAT_CONTEXT_CONFIG)
@@ -0,0 +1,497 @@
+import asyncio
+import base64
+from abc import ABC, abstractmethod
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from src.config.config import CHAT_STORE_CONFIG
+from src.db import db
+from src.db.async_connection import AsyncDatabase, async_db
+from src.utils import logger
+from src.utils.exceptions import DatabaseError, ValidationError
+
+def encode_cursor(position: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid page cursor")
+    if not isinstance(position, list) or len(position) != size:
+        raise ValidationError("Invalid page cursor")
+    return position
+
+def _isoformat(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _sqlite_time(value: datetime) -> str:
+    # Fixed width, so text comparison in the index orders the same as time.
+    return value.isoformat(timespec='microseconds')
+
+class _Turn:
+    __slots__ = ('session_id', 'project_id', 'user_id', 'messages', 'timestamp', 'future', 'seqs')
+
+    def __init__(self, session_id: str, project_id: int, user_id: int, messages: List[Dict[str, str]],
+                 timestamp: datetime, future: asyncio.Future):
+        self.session_id = session_id
+        self.project_id = project_id
+        self.user_id = user_id
+        self.messages = messages
+        self.timestamp = timestamp
+        self.future = future
+        self.seqs: List[int] = []
+
+class SessionStore(ABC):
+    """Chat sessions and messages kept outside the process.
+
+    Appends that arrive while a write is in flight are queued and committed together in the next transaction.
+    """
+
+    backend = 'none'
+
+    def __init__(self, batch_size: int = 64, page_size: int = 50, max_page_size: int = 200):
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+        self._pending: List[_Turn] = []
+        self._flushing = False
+        self._drain_tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+        self._appends_total = 0
+        self._batches_total = 0
+        self._messages_total = 0
+        self._errors_total = 0
+        self._write_time_total = 0.0
+        self._write_time_max = 0.0
+
+    @abstractmethod
+    def init_db(self):
+        raise NotImplementedError
+
+    async def append(self, session_id: str, project_id: int, user_id: int, messages: List[Dict[str, str]],
+                     timestamp: Optional[datetime] = None) -> List[int]:
+        """Add messages to a session, creating it if needed; returns their seqs once they are committed."""
+        loop = asyncio.get_running_loop()
+        turn = _Turn(session_id, project_id, user_id, messages, timestamp or datetime.utcnow(), loop.create_future())
+        with self._lock:
+            self._pending.append(turn)
+            start = not self._flushing
+            self._flushing = True
+        if start:
+            # A task of its own, so a client disconnect cannot cancel a batch holding other requests' turns. The loop
+            # keeps only a weak reference to it, so the store holds one until it finishes.
+            task = loop.create_task(self._drain())
+            self._drain_tasks.add(task)
+            task.add_done_callback(self._drain_tasks.discard)
+        return await turn.future
+
+    async def _drain(self):
+        while True:
+            with self._lock:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                if not batch:
+                    self._flushing = False
+                    return
+            error = await self._write(batch)
+            if error is None:
+                continue
+            by_session: Dict[str, List[_Turn]] = {}
+            for turn in batch:
+                by_session.setdefault(turn.session_id, []).append(turn)
+            if len(by_session) == 1:
+                self._fail(batch, error)
+                continue
+            # A bad turn must not fail the other sessions that shared its transaction; retry each on its own.
+            logger.warning(f"Retrying {len(by_session)} chat sessions one at a time after a failed batch")
+            for session_turns in by_session.values():
+                error = await self._write(session_turns)
+                if error is not None:
+                    self._fail(session_turns, error)
+
+    async def _write(self, turns: List[_Turn]) -> Optional[Exception]:
+        started = time.monotonic()
+        try:
+            await self._write_batch(turns)
+        except Exception as e:
+            with self._lock:
+                self._errors_total += 1
+            logger.error(f"Failed to write {len(turns)} chat turn(s): {str(e)}")
+            return e
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._appends_total += len(turns)
+            self._batches_total += 1
+            self._messages_total += sum(len(turn.messages) for turn in turns)
+            self._write_time_total += elapsed
+            self._write_time_max = max(self._write_time_max, elapsed)
+        for turn in turns:
+            if not turn.future.done():
+                turn.future.set_result(turn.seqs)
+        return None
+
+    @staticmethod
+    def _fail(turns: List[_Turn], error: Exception):
+        for turn in turns:
+            if not turn.future.done():
+                turn.future.set_exception(error)
+
+    @abstractmethod
+    async def _write_batch(self, turns: List[_Turn]):
+        """Commit the turns in one transaction, setting each turn's seqs as they are assigned."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def recent_messages(self, session_id: str, from_seq: int, limit: int) -> List[Dict[str, Any]]:
+        """The newest `limit` messages at or after `from_seq`, oldest first, with their seq."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def save_digest(self, session_id: str, digest_seq: int, digest: Optional[str]):
+        """Record a digest of every message before `digest_seq`, unless a later one is already stored."""
+        raise NotImplementedError
+
+    async def list_sessions(self, project_id: int, user_id: int, limit: Optional[int] = None,
+                            cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        limit = self._clamp(limit)
+        after = decode_cursor(cursor, 2) if cursor else None
+        rows = await self._fetch_sessions(project_id, user_id, limit + 1, after)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor([rows[-1]['updated_at'], rows[-1]['id']])
+
+    async def list_messages(self, session_id: str, limit: Optional[int] = None,
+                            cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        limit = self._clamp(limit)
+        after = decode_cursor(cursor, 1)[0] if cursor else -1
+        if not isinstance(after, int):
+            raise ValidationError("Invalid page cursor")
+        rows = await self._fetch_messages(session_id, limit + 1, after)
+        if len(rows) <= limit:
+            return [self._message(row) for row in rows], None
+        rows = rows[:limit]
+        return [self._message(row) for row in rows], encode_cursor([rows[-1]['seq']])
+
+    @abstractmethod
+    async def _fetch_sessions(self, project_id: int, user_id: int, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _fetch_messages(self, session_id: str, limit: int, after_seq: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _message(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {'role': row['role'], 'content': row['content'], 'timestamp': _isoformat(row['created_at'])}
+
+    def _clamp(self, limit: Optional[int]) -> int:
+        if not limit:
+            return self.page_size
+        return max(1, min(int(limit), self.max_page_size))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'pending': len(self._pending),
+                'appends_total': self._appends_total,
+                'batches_total': self._batches_total,
+                'messages_total': self._messages_total,
+                'errors_total': self._errors_total,
+                'avg_batch_size': round(self._appends_total / self._batches_total, 2) if self._batches_total else 0.0,
+                'write_time_avg': round(self._write_time_total / self._batches_total, 6) if self._batches_total else 0.0,
+                'write_time_max': round(self._write_time_max, 6)
+            }
+
+    async def close(self):
+        # Let turns already queued reach the store before the connection goes away.
+        if self._drain_tasks:
+            await asyncio.gather(*self._drain_tasks, return_exceptions=True)
+
+class MySQLSessionStore(SessionStore):
+    backend = 'mysql'
+
+    def __init__(self, database: AsyncDatabase = async_db, **kwargs):
+        super().__init__(**kwargs)
+        self.db = database
+
+    def init_db(self):
+        try:
+            db.execute_write("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    id VARCHAR(36) PRIMARY KEY,
+                    project_id INT NOT NULL,
+                    user_id INT NOT NULL,
+                    message_count INT NOT NULL DEFAULT 0,
+                    digest MEDIUMTEXT NULL,
+                    digest_seq INT NOT NULL DEFAULT 0,
+                    created_at DATETIME(6) NOT NULL,
+                    updated_at DATETIME(6) NOT NULL,
+                    INDEX idx_chat_sessions_owner (project_id, user_id, updated_at, id),
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                )
+            """)
+            db.execute_write("""
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    session_id VARCHAR(36) NOT NULL,
+                    seq INT NOT NULL,
+                    role VARCHAR(32) NOT NULL,
+                    content MEDIUMTEXT NOT NULL,
+                    created_at DATETIME(6) NOT NULL,
+                    PRIMARY KEY (session_id, seq),
+                    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
+                )
+            """)
+            logger.info("Chat session tables initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize chat session tables: {str(e)}")
+            raise
+
+    async def _write_batch(self, turns: List[_Turn]):
+        async with self.db.cursor() as cursor:
+            # Sessions are locked in id order so concurrent batches cannot deadlock on each other.
+            for session_id in sorted({turn.session_id for turn in turns}):
+                session_turns = [turn for turn in turns if turn.session_id == session_id]
+                first = session_turns[0]
+                # Not INSERT IGNORE: that would also turn a foreign key violation into a warning.
+                await cursor.execute(
+                    "INSERT INTO chat_sessions (id, project_id, user_id, message_count, created_at, updated_at) "
+                    "VALUES (%s, %s, %s, 0, %s, %s) ON DUPLICATE KEY UPDATE id = id",
+                    (session_id, first.project_id, first.user_id, first.timestamp, first.timestamp)
+                )
+                await cursor.execute("SELECT message_count FROM chat_sessions WHERE id = %s FOR UPDATE", (session_id,))
+                row = await cursor.fetchone()
+                if row is None:
+                    raise DatabaseError(f"Chat session {session_id} could not be created")
+                seq = row['message_count']
+                rows = []
+                for turn in session_turns:
+                    turn.seqs = list(range(seq, seq + len(turn.messages)))
+                    for message in turn.messages:
+                        rows.append((session_id, seq, message['role'], message['content'], turn.timestamp))
+                        seq += 1
+                if rows:
+                    await cursor.executemany(
+                        "INSERT INTO chat_messages (session_id, seq, role, content, created_at) VALUES (%s, %s, %s, %s, %s)",
+                        rows
+                    )
+                await cursor.execute(
+                    "UPDATE chat_sessions SET message_count = %s, updated_at = %s WHERE id = %s",
+                    (seq, max(turn.timestamp for turn in session_turns), session_id)
+                )
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                "SELECT id, project_id, user_id, message_count, digest, digest_seq, created_at, updated_at FROM chat_sessions WHERE id = %s",
+                (session_id,)
+            )
+            return self._session(await cursor.fetchone())
+
+    async def recent_messages(self, session_id: str, from_seq: int, limit: int) -> List[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                "SELECT seq, role, content FROM chat_messages WHERE session_id = %s AND seq >= %s ORDER BY seq DESC LIMIT %s",
+                (session_id, from_seq, limit)
+            )
+            return list(reversed(await cursor.fetchall()))
+
+    async def save_digest(self, session_id: str, digest_seq: int, digest: Optional[str]):
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                "UPDATE chat_sessions SET digest = %s, digest_seq = %s WHERE id = %s AND digest_seq < %s",
+                (digest, digest_seq, session_id, digest_seq)
+            )
+
+    async def _fetch_sessions(self, project_id: int, user_id: int, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+        query = ("SELECT id, project_id, user_id, message_count, created_at, updated_at FROM chat_sessions "
+                 "WHERE project_id = %s AND user_id = %s")
+        params: List[Any] = [project_id, user_id]
+        if after:
+            query += " AND (updated_at < %s OR (updated_at = %s AND id < %s))"
+            updated_at = datetime.fromisoformat(after[0])
+            params += [updated_at, updated_at, after[1]]
+        query += " ORDER BY updated_at DESC, id DESC LIMIT %s"
+        params.append(limit)
+        async with self.db.cursor() as cursor:
+            await cursor.execute(query, params)
+            return [self._session(row) for row in await cursor.fetchall()]
+
+    async def _fetch_messages(self, session_id: str, limit: int, after_seq: int) -> List[Dict[str, Any]]:
+        async with self.db.cursor() as cursor:
+            await cursor.execute(
+                "SELECT seq, role, content, created_at FROM chat_messages WHERE session_id = %s AND seq > %s ORDER BY seq LIMIT %s",
+                (session_id, after_seq, limit)
+            )
+            return list(await cursor.fetchall())
+
+    @staticmethod
+    def _session(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if row:
+            row['created_at'] = _isoformat(row['created_at'])
+            row['updated_at'] = _isoformat(row['updated_at'])
+        return row
+
+class SQLiteSessionStore(SessionStore):
+    """Embedded store for single-host deployments; worker processes on the host share the file through WAL."""
+
+    backend = 'sqlite'
+
+    def __init__(self, sqlite_path: str = 'data/chat_sessions.sqlite3', **kwargs):
+        super().__init__(**kwargs)
+        self.sqlite_path = sqlite_path
+        self._connection: Optional[sqlite3.Connection] = None
+        # sqlite3 blocks, so every statement runs on this one thread and the connection needs no lock.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-store")
+
+    def init_db(self):
+        self._executor.submit(self._connect).result()
+        logger.info(f"Chat sessions stored at {self.sqlite_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.sqlite_path)), exist_ok=True)
+            connection = sqlite3.connect(self.sqlite_path, isolation_level=None, timeout=30.0)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    id TEXT PRIMARY KEY,
+                    project_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    digest TEXT,
+                    digest_seq INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chat_sessions_owner ON chat_sessions (project_id, user_id, updated_at, id);
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    session_id TEXT NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                ) WITHOUT ROWID;
+            """)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _write_batch(self, turns: List[_Turn]):
+        await self._run(self._write_batch_sync, turns)
+
+    def _write_batch_sync(self, turns: List[_Turn]):
+        connection = self._connect()
+        # IMMEDIATE takes the write lock up front, so other worker processes wait instead of failing mid-transaction.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for session_id in dict.fromkeys(turn.session_id for turn in turns):
+                session_turns = [turn for turn in turns if turn.session_id == session_id]
+                first = session_turns[0]
+                connection.execute(
+                    "INSERT INTO chat_sessions (id, project_id, user_id, message_count, created_at, updated_at) "
+                    "VALUES (?, ?, ?, 0, ?, ?) ON CONFLICT (id) DO NOTHING",
+                    (session_id, first.project_id, first.user_id, _sqlite_time(first.timestamp), _sqlite_time(first.timestamp))
+                )
+                row = connection.execute("SELECT message_count FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+                if row is None:
+                    raise DatabaseError(f"Chat session {session_id} could not be created")
+                seq = row[0]
+                rows = []
+                for turn in session_turns:
+                    turn.seqs = list(range(seq, seq + len(turn.messages)))
+                    for message in turn.messages:
+                        rows.append((session_id, seq, message['role'], message['content'], _sqlite_time(turn.timestamp)))
+                        seq += 1
+                connection.executemany(
+                    "INSERT INTO chat_messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                connection.execute(
+                    "UPDATE chat_sessions SET message_count = ?, updated_at = ? WHERE id = ?",
+                    (seq, _sqlite_time(max(turn.timestamp for turn in session_turns)), session_id)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._query_one,
+                               "SELECT id, project_id, user_id, message_count, digest, digest_seq, created_at, updated_at "
+                               "FROM chat_sessions WHERE id = ?",
+                               (session_id,))
+
+    async def recent_messages(self, session_id: str, from_seq: int, limit: int) -> List[Dict[str, Any]]:
+        rows = await self._run(self._query_all,
+                               "SELECT seq, role, content FROM chat_messages WHERE session_id = ? AND seq >= ? ORDER BY seq DESC LIMIT ?",
+                               (session_id, from_seq, limit))
+        return list(reversed(rows))
+
+    async def save_digest(self, session_id: str, digest_seq: int, digest: Optional[str]):
+        def update():
+            self._connect().execute(
+                "UPDATE chat_sessions SET digest = ?, digest_seq = ? WHERE id = ? AND digest_seq < ?",
+                (digest, digest_seq, session_id, digest_seq)
+            )
+        await self._run(update)
+
+    async def _fetch_sessions(self, project_id: int, user_id: int, limit: int, after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+        query = ("SELECT id, project_id, user_id, message_count, created_at, updated_at FROM chat_sessions "
+                 "WHERE project_id = ? AND user_id = ?")
+        params: List[Any] = [project_id, user_id]
+        if after:
+            query += " AND (updated_at < ? OR (updated_at = ? AND id < ?))"
+            params += [after[0], after[0], after[1]]
+        query += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return await self._run(self._query_all, query, params)
+
+    async def _fetch_messages(self, session_id: str, limit: int, after_seq: int) -> List[Dict[str, Any]]:
+        return await self._run(self._query_all,
+                               "SELECT seq, role, content, created_at FROM chat_messages WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                               (session_id, after_seq, limit))
+
+    def _query_one(self, query: str, params) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(query, params).fetchone()
+        return dict(row) if row else None
+
+    def _query_all(self, query: str, params) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._connect().execute(query, params).fetchall()]
+
+    async def close(self):
+        await super().close()
+
+        def close_connection():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        await self._run(close_connection)
+        self._executor.shutdown(wait=False)
+
+def create_session_store(backend: str = 'mysql', sqlite_path: str = 'data/chat_sessions.sqlite3', **kwargs) -> SessionStore:
+    if backend == 'sqlite':
+        return SQLiteSessionStore(sqlite_path=sqlite_path, **kwargs)
+    if backend != 'mysql':
+        logger.warning(f"Unknown chat store backend '{backend}', using mysql")
+    return MySQLSessionStore(**kwargs)
+
+session_store = create_session_store(**CHAT_STORE_CONFIG)
@@ -2,104 +2,53 @@ from src.db import db
 from src.utils import logger
 from src.utils.exceptions import ValidationError
 from datetime import datetime
+import asyncio
+import functools
 import json
-import pymysql
-from pymysql.cursors import DictCursor
+import mysql.connector
+from contextlib import contextmanager
+from src.db.repositories import ProjectRepository, project_repository
+from src.db.sandbox import SandboxConnectionError
+from src.db.sandbox_pool import sandbox_registry
+from .schema_cache import schema_cache
 import base64
 import binascii
 
 class ProjectService:
-    def __init__(self):
-        self.db = db
-
-    def create_project(self, user_id: int, project_data: dict):
-        with self.db.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO projects (name, description, encrypted_path, user_id, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, NOW(), NOW())
-                """,
-                (project_data['name'], project_data.get('description'), project_data['encrypted_path'], user_id)
-            )
-            project_id = cursor.lastrowid
-
-            cursor.execute(
-                "SELECT id, name, description, encrypted_path, created_at, updated_at FROM projects WHERE id = %s",
-                (project_id,)
-            )
-            project = cursor.fetchone()
-            project['created_at'] = project['created_at'].isoformat()
-            project['updated_at'] = project['updated_at'].isoformat()
-            return project
-
-    def get_user_projects(self, user_id: int):
-        with self.db.cursor() as cursor:
-            cursor.execute(
-                "SELECT id, name, description, encrypted_path, created_at, updated_at FROM projects WHERE user_id = %s",
-                (user_id,)
-            )
-            projects = cursor.fetchall()
-            for project in projects:
-                project['created_at'] = project['created_at'].isoformat()
-                project['updated_at'] = project['updated_at'].isoformat()
-            return projects
-
-    def get_project(self, project_id: int, user_id: int):
-        with self.db.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, name, description, encrypted_path, created_at, updated_at 
-                FROM projects 
-                WHERE id = %s AND user_id = %s
-                """,
-                (project_id, user_id)
-            )
-            project = cursor.fetchone()
-            if project:
-                project['created_at'] = project['created_at'].isoformat()
-                project['updated_at'] = project['updated_at'].isoformat()
-            return project
-
-    def update_project(self, project_id: int, user_id: int, project_data: dict):
+    def __init__(self, projects: ProjectRepository = project_repository):
+        self.projects = projects
+
+    async def create_project(self, user_id: int, project_data: dict):
+        return await self.projects.create(
+            user_id, project_data['name'], project_data.get('description'), project_data['encrypted_path']
+        )
+
+    async def get_user_projects(self, user_id: int):
+        return await self.projects.list_for_user(user_id)
+
+    async def get_project(self, project_id: int, user_id: int):
+        return await self.projects.get(project_id, user_id)
+
+    async def update_project(self, project_id: int, user_id: int, project_data: dict):
         if not project_data:
             raise ValidationError("No update data provided")
 
-        update_fields = []
-        params = []
-        for key, value in project_data.items():
-            if value is not None:
-                update_fields.append(f"{key} = %s")
-                params.append(value)
-
-        if not update_fields:
+        fields = {key: value for key, value in project_data.items() if value is not None}
+        if not fields:
             raise ValidationError("No valid fields to update")
 
-        params.extend([project_id, user_id])
-        update_query = f"""
-            UPDATE projects 
-            SET {', '.join(update_fields)}, updated_at = NOW()
-            WHERE id = %s AND user_id = %s
-            RETURNING id, name, description, encrypted_path, created_at, updated_at
-        """
+        project = await self.projects.update(project_id, user_id, fields)
+        schema_cache.invalidate(project_id)
+        return project
 
-        with self.db.cursor() as cursor:
-            cursor.execute(update_query, params)
-            project = cursor.fetchone()
-            if project:
-                project['created_at'] = project['created_at'].isoformat()
-                project['updated_at'] = project['updated_at'].isoformat()
-            return project
-
-    def delete_project(self, project_id: int, user_id: int):
-        with self.db.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM projects WHERE id = %s AND user_id = %s",
-                (project_id, user_id)
-            )
-            return cursor.rowcount > 0
-
-    def get_database_info(self, project_id: int, user_id: int):
-        project = self.get_project(project_id, user_id)
+    async def delete_project(self, project_id: int, user_id: int):
+        deleted = await self.projects.delete(project_id, user_id)
+        if deleted:
+            schema_cache.invalidate(project_id)
+        return deleted
+
+    async def get_database_info(self, project_id: int, user_id: int):
+        project = await self.get_project(project_id, user_id)
         if not project:
             raise ValidationError("Project not found")
 
@@ -122,57 +71,14 @@ class ProjectService:
                     "database_info": {}
                 }
 
-            logger.debug(f"Attempting database connection for project {project_id}")
-            user_db = pymysql.connect(
-                host=db_config.get('host', 'localhost'),
-                port=int(db_config.get('port', 3306)),
-                user=db_config.get('user'),
-                password=db_config.get('password', ''),
-                database=db_config.get('database'),
-                cursorclass=DictCursor,
-                connect_timeout=5
-            )
-
-            try:
-                with user_db.cursor() as cursor:
-                    cursor.execute("SELECT DATABASE() as db_name")
-                    db_info = cursor.fetchone()
-                    
-                    cursor.execute("""
-                        SELECT 
-                            table_name,
-                            (SELECT COUNT(*) FROM information_schema.columns 
-                             WHERE table_schema = DATABASE() 
-                             AND table_name = t.table_name) as column_count,
-                            COALESCE(table_rows, 0) as row_count
-                        FROM information_schema.tables t
-                        WHERE table_schema = DATABASE()
-                          AND table_type = 'BASE TABLE'
-                    """)
-                    tables = cursor.fetchall()
-
-                    logger.info(f"Successfully connected to database for project {project_id}, found {len(tables)} tables")
-                    return {
-                        "database_name": db_info["db_name"],
-                        "tables": [
-                            {
-                                "name": table["table_name"],
-                                "row_count": int(table["row_count"]),
-                                "column_count": int(table["column_count"])
-                            }
-                            for table in tables
-                        ],
-                        "connection_status": True,
-                        "database_info": {
-                            "host": db_config.get('host', 'localhost'),
-                            "port": int(db_config.get('port', 3306)),
-                            "user": db_config.get('user'),
-                            "password": db_config.get('password', ''),
-                            "database": db_config.get('database')
-                        }
-                    }
-            finally:
-                user_db.close()
+            # The fingerprint check and any introspection talk to the project database synchronously.
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                schema_cache.get,
+                project_id,
+                db_config,
+                loader=lambda: self._introspect_database(project_id, db_config),
+                fingerprint=lambda: self._schema_fingerprint(project_id, db_config)
+            ))
 
         except json.JSONDecodeError as e:
             logger.error(f"Failed to decode JSON from encrypted_path for project {project_id}: {e}")
@@ -180,7 +86,7 @@ class ProjectService:
         except base64.binascii.Error as e:
             logger.error(f"Failed to decode base64 encrypted_path for project {project_id}: {e}")
             raise ValidationError("Invalid project configuration encoding")
-        except pymysql.Error as e:
+        except (mysql.connector.Error, SandboxConnectionError) as e:
             logger.error(f"Database connection error for project {project_id}: {str(e)}")
             return {
                 "database_name": db_config.get('database', '') if 'db_config' in locals() else '',
@@ -198,6 +104,137 @@ class ProjectService:
             logger.error(f"Unexpected error getting database info for project {project_id}: {str(e)}")
             raise ValidationError(f"Failed to get database information: {str(e)}")
 
+    @staticmethod
+    @contextmanager
+    def _user_db(project_id: int, db_config: dict):
+        # Borrow the project's pooled sandbox connection rather than dialling its database for every check.
+        pool, sandbox = sandbox_registry.acquire(project_id, db_config)
+        discard = True
+        try:
+            yield sandbox
+            discard = False
+        finally:
+            sandbox_registry.release(pool, sandbox, discard=discard)
+
+    def _schema_fingerprint(self, project_id: int, db_config: dict) -> str:
+        with self._user_db(project_id, db_config) as user_db:
+            row = user_db.fetch_all("""
+                SELECT 
+                    COUNT(*) AS table_count,
+                    MAX(create_time) AS max_create_time,
+                    MAX(update_time) AS max_update_time
+                FROM information_schema.tables
+                WHERE table_schema = DATABASE()
+            """)[0]
+            return f"{row['table_count']}|{row['max_create_time']}|{row['max_update_time']}"
+
+    def _introspect_database(self, project_id: int, db_config: dict):
+        logger.debug(f"Attempting database connection for project {project_id}")
+        with self._user_db(project_id, db_config) as user_db:
+            db_info = user_db.fetch_all("SELECT DATABASE() as db_name")[0]
+
+            tables = user_db.fetch_all("""
+                SELECT 
+                    t.table_name AS table_name,
+                    COALESCE(t.table_rows, 0) AS row_count
+                FROM information_schema.tables t
+                WHERE t.table_schema = DATABASE()
+                  AND t.table_type = 'BASE TABLE'
+            """)
+
+            table_columns = {}
+            for row in user_db.fetch_all("""
+                SELECT 
+                    table_name AS table_name,
+                    column_name AS column_name,
+                    column_type AS column_type,
+                    is_nullable AS is_nullable
+                FROM information_schema.columns
+                WHERE table_schema = DATABASE()
+                ORDER BY table_name, ordinal_position
+            """):
+                table_columns.setdefault(row["table_name"], []).append({
+                    "name": row["column_name"],
+                    "type": row["column_type"],
+                    "nullable": row["is_nullable"] == "YES"
+                })
+
+            table_foreign_keys = {}
+            for row in user_db.fetch_all("""
+                SELECT 
+                    table_name AS table_name,
+                    column_name AS column_name,
+                    referenced_table_name AS referenced_table,
+                    referenced_column_name AS referenced_column
+                FROM information_schema.key_column_usage
+                WHERE table_schema = DATABASE()
+                  AND referenced_table_name IS NOT NULL
+                ORDER BY table_name, constraint_name, ordinal_position
+            """):
+                table_foreign_keys.setdefault(row["table_name"], []).append({
+                    "column": row["column_name"],
+                    "referenced_table": row["referenced_table"],
+                    "referenced_column": row["referenced_column"]
+                })
+
+            table_keys = self._collect_unique_keys(user_db.fetch_all("""
+                SELECT 
+                    s.table_name AS table_name,
+                    s.index_name AS index_name,
+                    s.column_name AS column_name,
+                    c.is_nullable AS is_nullable
+                FROM information_schema.statistics s
+                JOIN information_schema.columns c
+                  ON c.table_schema = s.table_schema
+                 AND c.table_name = s.table_name
+                 AND c.column_name = s.column_name
+                WHERE s.table_schema = DATABASE()
+                  AND s.non_unique = 0
+                ORDER BY s.table_name, s.index_name, s.seq_in_index
+            """))
+
+            logger.info(f"Successfully connected to database for project {project_id}, found {len(tables)} tables")
+            return {
+                "database_name": db_info["db_name"],
+                "tables": [
+                    {
+                        "name": table["table_name"],
+                        "row_count": int(table["row_count"]),
+                        "column_count": len(table_columns.get(table["table_name"], [])),
+                        "columns": table_columns.get(table["table_name"], []),
+                        "foreign_keys": table_foreign_keys.get(table["table_name"], []),
+                        "primary_key": table_keys.get(table["table_name"], {}).get("PRIMARY", []),
+                        "unique_keys": [
+                            columns for index_name, columns in table_keys.get(table["table_name"], {}).items()
+                            if index_name != "PRIMARY"
+                        ]
+                    }
+                    for table in tables
+                ],
+                "connection_status": True,
+                "database_info": {
+                    "host": db_config.get('host', 'localhost'),
+                    "port": int(db_config.get('port', 3306)),
+                    "user": db_config.get('user'),
+                    "password": db_config.get('password', ''),
+                    "database": db_config.get('database')
+                }
+            }
+
+    @staticmethod
+    def _collect_unique_keys(rows):
+        # Only keys whose columns are all NOT NULL uniquely identify a row, so they are the only ones usable for keyset pagination.
+        keys = {}
+        nullable = set()
+        for row in rows:
+            index = (row["table_name"], row["index_name"])
+            keys.setdefault(row["table_name"], {}).setdefault(row["index_name"], []).append(row["column_name"])
+            if row["is_nullable"] == "YES":
+                nullable.add(index)
+        for table_name, index_name in nullable:
+            keys[table_name].pop(index_name, None)
+        return keys
+
     @staticmethod
     def init_db():
         create_table_query = """
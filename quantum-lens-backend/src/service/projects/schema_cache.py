@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from src.config.config import SCHEMA_CACHE_CONFIG
+from src.db.sandbox_pool import config_fingerprint
+from src.utils import logger
+
+class _SchemaEntry:
+    __slots__ = ('value', 'config_fingerprint', 'schema_fingerprint', 'checked_at')
+
+    def __init__(self, value: Dict[str, Any], config_fingerprint: str, schema_fingerprint: Optional[str]):
+        self.value = value
+        self.config_fingerprint = config_fingerprint
+        self.schema_fingerprint = schema_fingerprint
+        self.checked_at = time.monotonic()
+
+class SchemaCache:
+    def __init__(self, ttl: float = 600.0, refresh_after: float = 60.0, max_entries: int = 256, refresh_workers: int = 2):
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self.max_entries = max_entries
+        self.refresh_workers = refresh_workers
+
+        self._entries: "OrderedDict[str, _SchemaEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-key [lock, holders]; a key's lock is dropped once nobody holds or waits for it.
+        self._load_locks: Dict[str, List[Any]] = {}
+        self._refreshing = set()
+        self._refresher = None
+
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        self._reloads = 0
+        self._background_refreshes = 0
+
+    def get(self, project_id: Any, db_config: Dict[str, Any], loader: Callable[[], Dict[str, Any]],
+            fingerprint: Callable[[], str]) -> Dict[str, Any]:
+        key = str(project_id)
+        config_hash = config_fingerprint(db_config)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.config_fingerprint != config_hash:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = time.monotonic() - entry.checked_at
+                if age < self.ttl:
+                    self._hits += 1
+                    if age >= self.refresh_after:
+                        self._schedule_refresh(key, config_hash, loader, fingerprint)
+                    return entry.value
+            self._misses += 1
+
+        with self._loading(key):
+            # Another caller may have refreshed the entry while we waited for the lock.
+            with self._lock:
+                entry = self._entries.get(key)
+                if (entry is not None and entry.config_fingerprint == config_hash
+                        and time.monotonic() - entry.checked_at < self.ttl):
+                    return entry.value
+            return self._revalidate(key, config_hash, entry, loader, fingerprint)
+
+    def invalidate(self, project_id: Any):
+        with self._lock:
+            self._entries.pop(str(project_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'revalidated': self._revalidated,
+                'reloads': self._reloads,
+                'background_refreshes': self._background_refreshes
+            }
+
+    def _revalidate(self, key: str, config_hash: str, entry: Optional[_SchemaEntry],
+                    loader: Callable[[], Dict[str, Any]], fingerprint: Callable[[], str]) -> Dict[str, Any]:
+        current = fingerprint()
+        if entry is not None and entry.config_fingerprint == config_hash and entry.schema_fingerprint == current:
+            with self._lock:
+                entry.checked_at = time.monotonic()
+                self._revalidated += 1
+            return entry.value
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = _SchemaEntry(value, config_hash, current)
+            self._entries.move_to_end(key)
+            self._reloads += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _schedule_refresh(self, key: str, config_hash: str, loader: Callable[[], Dict[str, Any]], fingerprint: Callable[[], str]):
+        # Called with self._lock held.
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        if self._refresher is None:
+            self._refresher = ThreadPoolExecutor(max_workers=self.refresh_workers, thread_name_prefix="schema-refresh")
+        self._background_refreshes += 1
+        self._refresher.submit(self._refresh, key, config_hash, loader, fingerprint)
+
+    def _refresh(self, key: str, config_hash: str, loader: Callable[[], Dict[str, Any]], fingerprint: Callable[[], str]):
+        try:
+            with self._loading(key):
+                with self._lock:
+                    entry = self._entries.get(key)
+                self._revalidate(key, config_hash, entry, loader, fingerprint)
+        except Exception as e:
+            logger.warning(f"Background schema refresh failed for project {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    @contextmanager
+    def _loading(self, key: str):
+        with self._lock:
+            slot = self._load_locks.get(key)
+            if slot is None:
+                slot = self._load_locks[key] = [threading.Lock(), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._load_locks[key]
+
+schema_cache = SchemaCache(**SCHEMA_CACHE_CONFIG)
@@ -0,0 +1,99 @@
+from typing import List, Optional, Tuple
+
+# Fields of the comprehensive response that are written for the user; everything else (sql_query, reasoning, ...)
+# stays server-side.
+USER_FACING_FIELDS = ('analysis', 'response')
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class AnswerStream:
+    """Picks the user-facing string fields out of a comprehensive JSON completion while it streams.
+
+    feed() takes raw completion tokens and returns (field, text) pieces of decoded text for the top-level fields in
+    `fields` only, so the generated SQL and other internal fields never reach the client.
+    """
+
+    def __init__(self, fields: Tuple[str, ...] = USER_FACING_FIELDS):
+        self.fields = fields
+        self._depth = 0
+        self._in_string = False
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._expect_key = True
+        self._key_chars: List[str] = []
+        self._key: Optional[str] = None
+        self._field: Optional[str] = None
+        self._pieces: List[Tuple[str, str]] = []
+
+    def feed(self, token: str) -> List[Tuple[str, str]]:
+        for char in token:
+            if self._in_string:
+                self._string_char(char)
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_chars = []
+                elif self._depth == 1 and self._key in self.fields:
+                    self._field = self._key
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+            elif self._depth == 1 and char == ':':
+                self._expect_key = False
+            elif self._depth == 1 and char == ',':
+                self._expect_key = True
+        pieces, self._pieces = self._pieces, []
+        return pieces
+
+    def _string_char(self, char: str):
+        if self._escape is not None:
+            self._escape += char
+            if self._escape[0] == 'u':
+                if len(self._escape) < 5:
+                    return
+                self._code_point(int(self._escape[1:], 16) if _is_hex(self._escape[1:]) else 0xFFFD)
+            else:
+                self._emit(_ESCAPES.get(self._escape, self._escape))
+            self._escape = None
+        elif char == '\\':
+            self._escape = ''
+        elif char == '"':
+            self._flush_surrogate()
+            self._in_string = False
+            if self._depth == 1 and self._expect_key:
+                self._key = ''.join(self._key_chars)
+            self._field = None
+        else:
+            self._emit(char)
+
+    def _code_point(self, code: int):
+        if self._high_surrogate is not None and 0xDC00 <= code < 0xE000:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+        elif 0xD800 <= code < 0xDC00:
+            self._flush_surrogate()
+            self._high_surrogate = code
+            return
+        elif 0xD800 <= code < 0xE000:
+            code = 0xFFFD
+        self._emit(chr(code))
+
+    def _flush_surrogate(self):
+        # A high surrogate not followed by its low half cannot be decoded; it stands for one replacement character.
+        if self._high_surrogate is not None:
+            self._high_surrogate = None
+            self._emit('\uFFFD')
+
+    def _emit(self, text: str):
+        self._flush_surrogate()
+        if self._depth == 1 and self._expect_key:
+            self._key_chars.append(text)
+        elif self._field is not None:
+            if self._pieces and self._pieces[-1][0] == self._field:
+                self._pieces[-1] = (self._field, self._pieces[-1][1] + text)
+            else:
+                self._pieces.append((self._field, text))
+
+def _is_hex(text: str) -> bool:
+    return all(char in '0123456789abcdefABCDEF' for char in text)
@@ -0,0 +1,144 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional
+from src.config.config import INTENT_CLASSIFIER_CONFIG
+from src.llm.prompt_builder import column_names
+from src.utils import logger
+
+_RAW_SQL = re.compile(
+    r"^\s*(SELECT\s+.+\bFROM\b|SELECT\s+[\d@(]|SHOW\s+(FULL\s+)?(TABLES|COLUMNS|INDEX|INDEXES|CREATE|DATABASES)\b"
+    r"|(DESCRIBE|DESC)\s+`?\w+`?\s*;?\s*$|EXPLAIN\s+(SELECT|FORMAT)\b|WITH\s+\w+\s+AS\s*\()",
+    re.IGNORECASE | re.DOTALL
+)
+_SCHEMA_QUESTION = re.compile(
+    r"\bwhat\s+(tables|columns|fields)\b|\b(list|show)(\s+me)?(\s+all)?(\s+the)?\s+(tables|columns|fields)\b"
+    r"|\b(table|database|db)\s+(structure|schema)\b|\bschema\b",
+    re.IGNORECASE
+)
+_DATA_QUESTION = re.compile(
+    r"\bhow\s+many\b|\bshow\s+me\b|\blist\b|\bcount\b|\btotal\b|\baverage\b|\bavg\b|\bsum\s+of\b|\btop\s+\d+\b"
+    r"|\b(highest|lowest|most|least|latest|oldest|newest)\b|\bgive\s+me\b|\bfind\b|\bper\b|\bgrouped\s+by\b",
+    re.IGNORECASE
+)
+_GREETING = re.compile(
+    r"^\s*(hi|hello|hey|yo|hiya|greetings|good\s+(morning|afternoon|evening)|thanks|thank\s+you|thx|bye|goodbye|ok|okay|cool)"
+    r"(\s+(there|so\s+much|a\s+lot|again))?\s*[!.?]*\s*$",
+    re.IGNORECASE
+)
+_SMALL_TALK = re.compile(
+    r"\b(weather|joke|news|poem|song|recipe|movie|who\s+are\s+you|your\s+name|how\s+are\s+you|meaning\s+of\s+life)\b",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"[a-z0-9_]+")
+
+_GREETING_RESPONSE = "Hello! I can help you explore your data. Ask me about your tables or the records in them."
+_REDIRECT_RESPONSE = "I help with database questions. Is there anything about your data I can help you with?"
+
+class IntentClassifier:
+    def __init__(self, enabled: bool = True, min_confidence: float = 0.85, vocabulary_cache_size: int = 64):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.vocabulary_cache_size = vocabulary_cache_size
+
+        self._vocabularies: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._local_sql = 0
+        self._local_text = 0
+        self._fallbacks = 0
+
+    def classify(self, message: str, schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return an intent in the INTENT_CHECKER shape, or None when the LLM should decide."""
+        if not self.enabled:
+            return None
+
+        decision = self._decide(message, schema or {})
+        with self._lock:
+            if decision is None:
+                self._fallbacks += 1
+            elif decision['is_sql_query']:
+                self._local_sql += 1
+            else:
+                self._local_text += 1
+
+        if decision is None:
+            logger.info("Intent not decided locally, falling back to the LLM")
+        else:
+            logger.info(f"Intent decided locally: is_sql_query={decision['is_sql_query']} "
+                        f"confidence={decision['confidence']} reason={decision['reasoning']}")
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._local_sql + self._local_text + self._fallbacks
+            return {
+                'enabled': self.enabled,
+                'min_confidence': self.min_confidence,
+                'local_sql': self._local_sql,
+                'local_text': self._local_text,
+                'fallbacks': self._fallbacks,
+                'fallback_rate': round(self._fallbacks / total, 4) if total else 0.0
+            }
+
+    def _decide(self, message: str, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if _GREETING.match(message):
+            return self._decision(False, 0.97, "greeting", _GREETING_RESPONSE)
+        if _RAW_SQL.match(message):
+            return self._decision(True, 0.97, "raw SQL statement")
+        if _SCHEMA_QUESTION.search(message):
+            return self._decision(True, 0.95, "schema question")
+
+        mentions_schema = bool(set(_WORD.findall(message.lower())) & self._vocabulary(schema))
+        asks_for_data = bool(_DATA_QUESTION.search(message))
+
+        if asks_for_data and mentions_schema:
+            return self._decision(True, 0.93, "data question naming a table or column")
+        if _SMALL_TALK.search(message) and not mentions_schema and not asks_for_data:
+            return self._decision(False, 0.9, "small talk", _REDIRECT_RESPONSE)
+
+        # Only one weak signal: below the default threshold, so these go to the LLM unless tuned down.
+        is_sql_query = asks_for_data or mentions_schema
+        return self._decision(is_sql_query, 0.7 if is_sql_query else 0.5, "weak signal")
+
+    def _decision(self, is_sql_query: bool, confidence: float, reasoning: str, response: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if confidence < self.min_confidence:
+            return None
+        decision = {
+            'is_sql_query': is_sql_query,
+            'confidence': confidence,
+            'reasoning': f"local classifier: {reasoning}",
+            'source': 'local'
+        }
+        if response is not None:
+            decision['response'] = response
+        return decision
+
+    def _vocabulary(self, schema: Dict[str, Any]) -> FrozenSet[str]:
+        # Schemas come from the schema cache, so the same dict is seen on every request until it changes.
+        key = id(schema)
+        with self._lock:
+            cached = self._vocabularies.get(key)
+            if cached is not None and cached[0] is schema:
+                self._vocabularies.move_to_end(key)
+                return cached[1]
+
+        words = set()
+        for table in schema.get('tables', []):
+            for name in [table.get('name', '')] + column_names(table):
+                for word in _WORD.findall(str(name).lower()):
+                    if len(word) > 2:
+                        words.add(word)
+                        if word.endswith('s'):
+                            words.add(word[:-1])
+                        else:
+                            words.add(word + 's')
+        vocabulary = frozenset(words)
+
+        with self._lock:
+            self._vocabularies[key] = (schema, vocabulary)
+            while len(self._vocabularies) > self.vocabulary_cache_size:
+                self._vocabularies.popitem(last=False)
+        return vocabulary
+
+intent_classifier = IntentClassifier(**INTENT_CLASSIFIER_CONFIG)
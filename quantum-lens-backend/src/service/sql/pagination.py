@@ -0,0 +1,241 @@
+import base64
+import hashlib
+import hmac
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from src.config.config import JWT_SECRET, PAGINATION_CONFIG
+from src.utils.exceptions import ValidationError
+
+_SIMPLE_SELECT = re.compile(
+    r"^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>`[^`]+`|[\w$]+)"
+    r"(?:\s+(?:AS\s+)?(?P<alias>(?!WHERE\b|ORDER\b)[\w$]+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+_NOT_KEYSET_SAFE = re.compile(
+    r"\b(JOIN|UNION|GROUP\s+BY|HAVING|DISTINCT|LIMIT|OFFSET|INTO|FOR\s+UPDATE|LOCK\s+IN|WINDOW|OVER)\b"
+    r"|\(\s*SELECT\b|\b(COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT)\s*\(",
+    re.IGNORECASE
+)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+\d+(\s*(,|OFFSET)\s*\d+)?\s*$", re.IGNORECASE)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+_MYSQL_ERROR = re.compile(r"^\s*(?P<code>\d+)\b")
+_NEAR = re.compile(r"near '(?P<near>.*)' at line \d+", re.DOTALL)
+_COLUMN = re.compile(r"column '(?P<column>[^']+)'", re.IGNORECASE)
+_NOT_PAGEABLE = re.compile(r"\b(INTO\s+(OUTFILE|DUMPFILE|@)|FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)\b", re.IGNORECASE)
+
+def _top_level(query: str) -> str:
+    # Blank out string literals and parenthesised groups (subqueries, OVER (...)) so only the outer clauses remain.
+    query = re.sub(r"'(?:[^'\\]|\\.|'')*'" r'|"(?:[^"\\]|\\.|"")*"', "''", query)
+    previous = None
+    while previous != query:
+        previous, query = query, re.sub(r"\([^()]*\)", "()", query)
+    return query
+
+def _unquote(identifier: str) -> str:
+    return identifier.strip().strip('`')
+
+def _quote(identifier: str) -> str:
+    return '`' + identifier.replace('`', '``') + '`'
+
+def _sql_literal(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    text = str(value).replace('\\', '\\\\').replace("'", "''")
+    return f"'{text}'"
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+        if '$dec' in value:
+            return Decimal(value['$dec'])
+    return value
+
+class Paginator:
+    def __init__(self, secret: str, page_size: int = 500, max_page_size: int = 5000):
+        self._secret = secret.encode('utf-8')
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def plan(self, query: str, schema: Dict[str, Any], page_size: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        base_query = query.strip().rstrip(';').strip()
+        if not base_query.upper().startswith('SELECT') or _NOT_PAGEABLE.search(base_query):
+            return None
+        if _TRAILING_LIMIT.search(base_query):
+            # The generated query already bounds itself; respect it as written.
+            return None
+
+        plan = {
+            'mode': 'offset',
+            'query': base_query,
+            'page_size': self._clamp(page_size),
+            'offset': 0,
+            'table': None,
+            'key': None,
+            'after': None,
+            'filtered': True
+        }
+
+        match = _SIMPLE_SELECT.match(base_query)
+        if match is None or _NOT_KEYSET_SAFE.search(base_query):
+            return self._offset_plan(plan)
+
+        table = _unquote(match.group('table'))
+        plan['table'] = table
+        plan['filtered'] = bool(match.group('where'))
+        key = self._unique_key(table, schema)
+        if key is None:
+            return self._offset_plan(plan)
+
+        order = match.group('order')
+        qualifier = _quote(match.group('alias')) + '.' if match.group('alias') else ''
+        qualifiers = '|'.join(re.escape(name) for name in (table, match.group('alias')) if name)
+        key_pattern = rf"(`?({qualifiers})`?\.)?`?{re.escape(key)}`?"
+        if not self._selects_column(match.group('columns'), key) or (
+                order and not re.fullmatch(rf"\s*{key_pattern}(\s+ASC)?\s*", order, re.IGNORECASE)):
+            # Break ties on the unique key so OFFSET walks the same order on every page.
+            if order and not re.search(rf"(^|,)\s*{key_pattern}(\s+(ASC|DESC))?\s*(,|$)", order, re.IGNORECASE):
+                plan.update({'query': f"{base_query}, {qualifier}{_quote(key)}", 'key': key})
+            return self._offset_plan(plan)
+
+        plan.update({
+            'mode': 'keyset',
+            'key': key,
+            'key_expr': qualifier + _quote(key),
+            'select': f"SELECT {match.group('columns')} FROM {match.group('table')}"
+                      + (f" AS {match.group('alias')}" if match.group('alias') else ''),
+            'where': match.group('where')
+        })
+        return plan
+
+    def _offset_plan(self, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Without a top-level ORDER BY, MySQL may return rows in a different order per page, so OFFSET would skip
+        # or repeat rows; run such queries unpaged as written.
+        if not _ORDER_BY.search(_top_level(plan['query'])):
+            return None
+        return plan
+
+    def page_sql(self, plan: Dict[str, Any]) -> str:
+        limit = plan['page_size'] + 1
+        if plan['mode'] == 'keyset':
+            conditions = []
+            if plan.get('where'):
+                conditions.append(f"({plan['where']})")
+            if plan.get('after') is not None:
+                conditions.append(f"{plan['key_expr']} > {_sql_literal(_decode_value(plan['after']))}")
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+            return f"{plan['select']}{where} ORDER BY {plan['key_expr']} LIMIT {limit}"
+        return f"{plan['query']} LIMIT {limit} OFFSET {plan['offset']}"
+
+    def rewrite_failed(self, plan: Dict[str, Any], query: str, error: Optional[str]) -> bool:
+        """True when `error` points at SQL the rewrite added rather than at the query as generated."""
+        match = _MYSQL_ERROR.match(error or '')
+        if match is None:
+            return False
+        code = int(match.group('code'))
+        if code == 1064:
+            # A syntax error the original query would also raise is reported near text that both statements share.
+            near = _NEAR.search(error)
+            return near is not None and near.group('near').strip() != '' and near.group('near') not in query
+        if code in (1052, 1054):
+            column = _COLUMN.search(error)
+            return column is not None and plan.get('key') is not None and \
+                _unquote(column.group('column').split('.')[-1]) == plan['key']
+        return False
+
+    def count_sql(self, plan: Dict[str, Any]) -> str:
+        return f"SELECT COUNT(*) AS total FROM ({plan['query']}) AS _count"
+
+    def paginate(self, plan: Dict[str, Any], rows: List[Dict[str, Any]], project_id: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        has_more = len(rows) > plan['page_size']
+        rows = rows[:plan['page_size']]
+        if not has_more or not rows:
+            return rows, None
+
+        # In keyset mode the offset only counts rows already served; it never reaches the SQL.
+        next_plan = dict(plan)
+        next_plan['offset'] = plan['offset'] + len(rows)
+        if plan['mode'] == 'keyset':
+            next_plan['after'] = _encode_value(rows[-1].get(plan['key']))
+        return rows, self.encode_token(next_plan, project_id)
+
+    def estimate_total(self, plan: Dict[str, Any], schema: Dict[str, Any], rows_returned: int, has_more: bool) -> Tuple[int, bool]:
+        if not has_more:
+            return plan['offset'] + rows_returned, True
+        if plan.get('table') and not plan.get('filtered'):
+            for table in schema.get('tables', []):
+                if table.get('name') == plan['table']:
+                    return int(table.get('row_count') or 0), False
+        return plan['offset'] + rows_returned, False
+
+    def encode_token(self, plan: Dict[str, Any], project_id: Any) -> str:
+        payload = json.dumps({'v': 1, 'project_id': str(project_id), 'plan': plan}, separators=(',', ':'), default=str).encode('utf-8')
+        signature = hmac.new(self._secret, payload, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(signature + payload).decode('ascii').rstrip('=')
+
+    def decode_token(self, token: str, project_id: Any) -> Dict[str, Any]:
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            signature, payload = raw[:32], raw[32:]
+        except (ValueError, TypeError):
+            raise ValidationError("Invalid page cursor")
+        expected = hmac.new(self._secret, payload, hashlib.sha256).digest()
+        if not hmac.compare_digest(signature, expected):
+            raise ValidationError("Invalid page cursor")
+        data = json.loads(payload.decode('utf-8'))
+        if data.get('project_id') != str(project_id):
+            raise ValidationError("Page cursor does not belong to this project")
+        return data['plan']
+
+    def _clamp(self, page_size: Optional[int]) -> int:
+        if not page_size:
+            return self.page_size
+        return max(1, min(int(page_size), self.max_page_size))
+
+    def _unique_key(self, table: str, schema: Dict[str, Any]) -> Optional[str]:
+        for info in schema.get('tables', []):
+            if info.get('name') != table:
+                continue
+            primary_key = info.get('primary_key') or []
+            if len(primary_key) == 1:
+                return primary_key[0]
+            for unique_key in info.get('unique_keys') or []:
+                if len(unique_key) == 1:
+                    return unique_key[0]
+        return None
+
+    def _selects_column(self, columns: str, key: str) -> bool:
+        # The key must come back under its own name so the next page can seek past it.
+        for column in columns.split(','):
+            column = column.strip()
+            if column == '*' or column.endswith('.*'):
+                return True
+            if ' ' not in column and _unquote(column.split('.')[-1]) == key:
+                return True
+        return False
+
+paginator = Paginator(JWT_SECRET, **PAGINATION_CONFIG)
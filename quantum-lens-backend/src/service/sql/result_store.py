@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.config.config import RESULT_STORE_CONFIG
+from src.utils import logger
+from src.utils.exceptions import ValidationError
+
+def _render_csv(records: List[Dict[str, Any]], columns: List[Dict[str, Any]]) -> str:
+    if not records:
+        return ''
+    import pandas as pd
+    return pd.DataFrame(records).to_csv(index=False)
+
+def _render_html(records: List[Dict[str, Any]], columns: List[Dict[str, Any]]) -> str:
+    if not records:
+        return '<p>No results found</p>'
+    import pandas as pd
+    return pd.DataFrame(records).to_html(classes='table table-striped', index=False)
+
+def _render_json(records: List[Dict[str, Any]], columns: List[Dict[str, Any]]) -> str:
+    return json.dumps({'columns': columns, 'records': records}, default=str)
+
+RENDERERS: Dict[str, Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], str]] = {
+    'csv': _render_csv,
+    'html': _render_html,
+    'json': _render_json
+}
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'html': 'text/html',
+    'json': 'application/json'
+}
+
+def validate_formats(formats: Optional[List[str]]) -> List[str]:
+    requested = [fmt.lower() for fmt in (formats or [])]
+    unsupported = [fmt for fmt in requested if fmt not in RENDERERS]
+    if unsupported:
+        raise ValidationError(f"Unsupported result format(s): {', '.join(unsupported)}. Supported: {', '.join(RENDERERS)}")
+    return list(dict.fromkeys(requested))
+
+class _StoredResult:
+    __slots__ = ('owner_id', 'records', 'columns', 'created_at', 'rendered')
+
+    def __init__(self, owner_id: Any, records: List[Dict[str, Any]], columns: List[Dict[str, Any]]):
+        self.owner_id = owner_id
+        self.records = records
+        self.columns = columns
+        self.created_at = time.monotonic()
+        self.rendered: Dict[str, str] = {}
+
+class ResultStore:
+    def __init__(self, max_entries: int = 256, max_total_rows: int = 500000, ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.max_total_rows = max_total_rows
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, _StoredResult]" = OrderedDict()
+        self._total_rows = 0
+        self._lock = threading.Lock()
+
+        self._renders_total = 0
+        self._render_hits_total = 0
+        self._evicted_total = 0
+
+    def put(self, owner_id: Any, records: List[Dict[str, Any]], columns: List[Dict[str, Any]]) -> Optional[str]:
+        if len(records) > self.max_total_rows:
+            logger.info(f"Result with {len(records)} rows exceeds the result store budget, not retaining it")
+            return None
+
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[result_id] = _StoredResult(owner_id, records, columns)
+            self._total_rows += len(records)
+            self._evict()
+        return result_id
+
+    def render(self, result_id: str, owner_id: Any, fmt: str) -> Tuple[str, str]:
+        fmt = validate_formats([fmt])[0]
+        with self._lock:
+            entry = self._get(result_id)
+            if entry is None or entry.owner_id != owner_id:
+                raise ValidationError("Result not found or expired")
+            cached = entry.rendered.get(fmt)
+            if cached is not None:
+                self._render_hits_total += 1
+                return cached, MEDIA_TYPES[fmt]
+
+        # Render outside the lock; concurrent renders of the same artifact are harmless and rare.
+        rendered = RENDERERS[fmt](entry.records, entry.columns)
+        with self._lock:
+            entry.rendered[fmt] = rendered
+            self._renders_total += 1
+        return rendered, MEDIA_TYPES[fmt]
+
+    def render_many(self, result_id: str, owner_id: Any, formats: List[str]) -> Dict[str, str]:
+        return {fmt: self.render(result_id, owner_id, fmt)[0] for fmt in formats}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'total_rows': self._total_rows,
+                'max_entries': self.max_entries,
+                'max_total_rows': self.max_total_rows,
+                'renders_total': self._renders_total,
+                'render_hits_total': self._render_hits_total,
+                'evicted_total': self._evicted_total
+            }
+
+    def _get(self, result_id: str) -> Optional[_StoredResult]:
+        entry = self._entries.get(result_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at > self.ttl:
+            self._remove(result_id)
+            return None
+        self._entries.move_to_end(result_id)
+        return entry
+
+    def _remove(self, result_id: str):
+        entry = self._entries.pop(result_id)
+        self._total_rows -= len(entry.records)
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_rows > self.max_total_rows):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evicted_total += 1
+
+result_store = ResultStore(**RESULT_STORE_CONFIG)
@@ -1,105 +1,242 @@
-from typing import Dict, Any, List, Optional
-from ...db.sandbox import MySQLSandbox
+from collections import deque
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from ...config.config import SQL_PIPELINE_CONFIG
+from ...db.executor import sandbox_executor
+from ...db.result_cache import query_result_cache
+from ...db.sandbox_pool import sandbox_registry
+from .answer_stream import AnswerStream
+from .intent_classifier import intent_classifier
+from .pagination import paginator
 from ...llm import OpenRouterClient
 from ...utils import logger
+from ...utils.exceptions import ServiceUnavailableError, ValidationError
+from ...utils.metrics import db_execution_seconds, rows_returned, span
+import asyncio
 import json
+import threading
+import time
+
+PIPELINE_MODES = ('two_call', 'single_call')
+
+class PipelineMetrics:
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._modes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, elapsed: float, llm_calls: int):
+        with self._lock:
+            metrics = self._modes.setdefault(mode, {'requests': 0, 'llm_calls': 0, 'time_total': 0.0, 'latencies': deque(maxlen=self.window)})
+            metrics['requests'] += 1
+            metrics['llm_calls'] += llm_calls
+            metrics['time_total'] += elapsed
+            metrics['latencies'].append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for mode, metrics in self._modes.items():
+                latencies = sorted(metrics['latencies'])
+                result[mode] = {
+                    'requests': metrics['requests'],
+                    'llm_calls': metrics['llm_calls'],
+                    'llm_calls_avg': round(metrics['llm_calls'] / metrics['requests'], 4),
+                    'latency_avg': round(metrics['time_total'] / metrics['requests'], 6),
+                    'latency_p50': round(latencies[len(latencies) // 2], 6),
+                    'latency_p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 6)
+                }
+            return result
+
+pipeline_metrics = PipelineMetrics()
 
 class SQLService:
-    def __init__(self, llm_client: Optional[OpenRouterClient] = None):
+    def __init__(self, llm_client: Optional[OpenRouterClient] = None, pipeline_mode: Optional[str] = None):
         self.llm_client = llm_client or OpenRouterClient.get_instance()
-        self.sandbox_instances = {}
-
-    async def process_message(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.pipeline_mode = pipeline_mode or SQL_PIPELINE_CONFIG['mode']
+        if self.pipeline_mode not in PIPELINE_MODES:
+            raise ValidationError(f"Unknown SQL pipeline mode '{self.pipeline_mode}'. Supported: {', '.join(PIPELINE_MODES)}")
+
+    async def _plan_query(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None, page_size: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        async for _, plan in self._plan_events(message, project_id, schema, context, page_size):
+            pass
+        return plan
+
+    async def _plan_events(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None,
+                           page_size: Optional[int] = None, stream_tokens: bool = False) -> AsyncIterator[Tuple[str, Any]]:
+        # Yields ('token', text) while the comprehensive completion streams, then a final ('plan', (response, response_data)).
+        started = time.perf_counter()
+        llm_calls = 0
+        plan = None
         try:
-            intent_context = {
-                "user_message": message,
-                "request_type": "intent_check"
-            }
-            
-            intent_response = await self.llm_client.generate_sql_completion('intent', intent_context)
-            
-            try:
-                intent_data = json.loads(intent_response)
-            except json.JSONDecodeError:
-                return await self._process_message_legacy(message, project_id, schema, context)
-            
-            if not intent_data.get('is_sql_query', False):
-                return {
-                    "success": True,
-                    "type": "text",
-                    "content": intent_data.get('response', "I help with database questions. Is there anything about your data I can help you with?")
+            with span('intent.local'):
+                intent_data = intent_classifier.classify(message, schema)
+            if intent_data is None and self.pipeline_mode == 'two_call':
+                intent_context = {
+                    "user_message": message,
+                    "request_type": "intent_check"
                 }
-            
-            comprehensive_context = {
-                "user_message": message,
-                "schema": schema,
-                "context": context or {},
-                "request_type": "comprehensive_sql_analysis"
-            }
-            
-            comprehensive_response = await self.llm_client.generate_sql_completion('comprehensive', comprehensive_context)
-            
-            try:
-                response_data = json.loads(comprehensive_response)
-            except json.JSONDecodeError:
-                return await self._process_message_legacy(message, project_id, schema, context)
 
-            generated_query = response_data.get('sql_query', '').strip()
-            if not generated_query:
-                return {
-                    "success": False,
-                    "type": "error",
-                    "content": {"error": "Failed to generate SQL query"}
+                llm_calls += 1
+                with span('intent.llm'):
+                    intent_response = await self.llm_client.generate_sql_completion('intent', intent_context, project_id=project_id)
+
+                try:
+                    intent_data = json.loads(intent_response)
+                except json.JSONDecodeError:
+                    plan = (await self._process_message_legacy(message, project_id, schema, context, page_size), None)
+
+            if plan is None and intent_data is not None and not intent_data.get('is_sql_query', False):
+                plan = (self._text_response(intent_data), None)
+
+            if plan is None:
+                # In single_call mode the comprehensive prompt classifies the message itself.
+                comprehensive_context = {
+                    "user_message": message,
+                    "schema": schema,
+                    "context": context or {},
+                    "request_type": "comprehensive_sql_analysis"
                 }
 
-            if project_id not in self.sandbox_instances:
-                db_config = {
-                    "host": schema.get("database_info", {}).get("host", "localhost"),
-                    "port": schema.get("database_info", {}).get("port", 3306),
-                    "user": schema.get("database_info", {}).get("user"),
-                    "password": schema.get("database_info", {}).get("password", ""),
-                    "database": schema.get("database_name"),
-                }
-                self.sandbox_instances[project_id] = MySQLSandbox(db_config)
-            sandbox = self.sandbox_instances[project_id]
+                llm_calls += 1
+                with span('comprehensive'):
+                    if stream_tokens:
+                        parts = []
+                        tokens = self.llm_client.stream_sql_completion('comprehensive', comprehensive_context, project_id=project_id)
+                        try:
+                            async for token in tokens:
+                                parts.append(token)
+                                yield 'token', token
+                        finally:
+                            await tokens.aclose()
+                        comprehensive_response = ''.join(parts)
+                    else:
+                        comprehensive_response = await self.llm_client.generate_sql_completion('comprehensive', comprehensive_context, project_id=project_id)
+
+                try:
+                    response_data = json.loads(comprehensive_response)
+                except json.JSONDecodeError:
+                    response_data = None
+
+                if response_data is None:
+                    plan = (await self._process_message_legacy(message, project_id, schema, context, page_size), None)
+                elif not response_data.get('is_sql_query', True):
+                    plan = (self._text_response(response_data), None)
+                elif not (response_data.get('sql_query') or '').strip():
+                    plan = ({
+                        "success": False,
+                        "type": "error",
+                        "content": {"error": "Failed to generate SQL query"}
+                    }, None)
+                else:
+                    plan = (None, response_data)
+        finally:
+            pipeline_metrics.record(self.pipeline_mode, time.perf_counter() - started, llm_calls)
+
+        yield 'plan', plan
+
+    def _text_response(self, intent_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "type": "text",
+            "content": intent_data.get('response') or "I help with database questions. Is there anything about your data I can help you with?"
+        }
+
+    async def _error_response(self, project_id: str, query: str, error: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        error_context = {
+            "query": query,
+            "error": error,
+            "schema": schema
+        }
+        with span('error_analysis'):
+            error_analysis = await self.llm_client.generate_sql_completion('error', error_context, project_id=project_id)
+        return {
+            "success": False,
+            "type": "error",
+            "content": {
+                "query": query,
+                "error": error,
+                "analysis": error_analysis
+            }
+        }
+
+    async def _execute_paged(self, project_id: str, db_config: Dict[str, Any], query: str, schema: Dict[str, Any], page_size: Optional[int] = None, plan: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        plan = plan or paginator.plan(query, schema, page_size)
+        if plan is None:
+            return await self._run_sandbox(project_id, db_config, 'execute_query', query), None
+
+        result = await self._run_sandbox(project_id, db_config, 'execute_query', paginator.page_sql(plan))
+        if not result.get("success", False) and plan['offset'] == 0 and paginator.rewrite_failed(plan, query, result.get('error')):
+            # The rewrite is heuristic; if it is what broke, fall back to the query exactly as generated.
+            logger.warning(f"Paged execution failed ({result.get('error')}), retrying unpaged")
+            return await self._run_sandbox(project_id, db_config, 'execute_query', query), None
+        return result, plan
+
+    def _result_payload(self, project_id: str, result: Dict[str, Any], plan: Optional[Dict[str, Any]], schema: Dict[str, Any]) -> Dict[str, Any]:
+        data = result.get("data") or {}
+        payload = {
+            "rows": data.get("records", []),
+            "columns": result.get("column_info", []),
+            "total_rows": data.get("total_rows", 0),
+            "execution_time": result.get("execution_time", 0),
+            "affected_rows": result.get("affected_rows", 0)
+        }
+        rows_returned.observe(len(payload["rows"]))
+        if plan is None:
+            return payload
+
+        rows, next_cursor = paginator.paginate(plan, payload["rows"], project_id)
+        total_rows, exact = paginator.estimate_total(plan, schema, len(rows), next_cursor is not None)
+        payload.update({
+            "rows": rows,
+            "total_rows": total_rows,
+            "total_rows_exact": exact,
+            "page": {
+                "mode": plan['mode'],
+                "page_size": plan['page_size'],
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
+            }
+        })
+        return payload
+
+    async def fetch_page(self, project_id: str, schema: Dict[str, Any], cursor: str) -> Dict[str, Any]:
+        plan = paginator.decode_token(cursor, project_id)
+        result, plan = await self._execute_paged(project_id, self._sandbox_config(schema), plan['query'], schema, plan=plan)
+        if not result.get("success", False):
+            return {"success": False, "type": "error", "content": {"error": result.get("error", "Query execution failed")}}
+        return {"success": True, "type": "sql", "content": {"query": plan['query'], "result": self._result_payload(project_id, result, plan, schema)}}
+
+    async def count_rows(self, project_id: str, schema: Dict[str, Any], cursor: str) -> Dict[str, Any]:
+        plan = paginator.decode_token(cursor, project_id)
+        result = await self._run_sandbox(project_id, self._sandbox_config(schema), 'execute_query', paginator.count_sql(plan))
+        if not result.get("success", False):
+            return {"success": False, "type": "error", "content": {"error": result.get("error", "Count query failed")}}
+        records = (result.get("data") or {}).get("records") or [{}]
+        return {"success": True, "type": "count", "content": {"query": plan['query'], "total_rows": int(records[0].get("total", 0))}}
+
+    async def process_message(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
+        try:
+            response, response_data = await self._plan_query(message, project_id, schema, context, page_size)
+            if response is not None:
+                return response
+
+            generated_query = response_data['sql_query'].strip()
+            db_config = self._sandbox_config(schema)
 
             try:
-                result = sandbox.execute_query(generated_query)
+                result, plan = await self._execute_paged(project_id, db_config, generated_query, schema, page_size)
                 
                 if not result.get("success", False):
                     error_msg = result.get("error", "Query execution failed")
                     logger.error(f"Query execution failed: {error_msg}")
-                    
-                    error_context = {
-                        "query": generated_query,
-                        "error": error_msg,
-                        "schema": schema
-                    }
-                    error_analysis = await self.llm_client.generate_sql_completion('error', error_context)
-                    return {
-                        "success": False,
-                        "type": "error",
-                        "content": {
-                            "query": generated_query,
-                            "error": error_msg,
-                            "analysis": error_analysis
-                        }
-                    }
-                
-                data = result.get("data") or {}
+                    return await self._error_response(project_id, generated_query, error_msg, schema)
                 
                 return {
                     "success": True,
                     "type": "sql",
                     "content": {
                         "query": generated_query,
-                        "result": {
-                            "rows": data.get("records", []),
-                            "columns": result.get("column_info", []),
-                            "total_rows": data.get("total_rows", 0),
-                            "execution_time": result.get("execution_time", 0),
-                            "affected_rows": result.get("affected_rows", 0)
-                        },
+                        "result": self._result_payload(project_id, result, plan, schema),
                         "analysis": response_data.get('analysis', 'Query executed successfully'),
                         "optimization": response_data.get('optimization', 'No optimization suggestions available')
                     }
@@ -107,21 +244,7 @@ class SQLService:
                 
             except Exception as e:
                 # 🔥 Only make additional LLM call for error analysis if needed
-                error_context = {
-                    "query": generated_query,
-                    "error": str(e),
-                    "schema": schema
-                }
-                error_analysis = await self.llm_client.generate_sql_completion('error', error_context)
-                return {
-                    "success": False,
-                    "type": "error",
-                    "content": {
-                        "query": generated_query,
-                        "error": str(e),
-                        "analysis": error_analysis
-                    }
-                }
+                return await self._error_response(project_id, generated_query, str(e), schema)
                 
         except Exception as e:
             logger.error(f"Error processing SQL message: {str(e)}")
@@ -133,10 +256,116 @@ class SQLService:
                 }
             }
 
-    async def _process_message_legacy(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def stream_message(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None, chunk_size: int = 1000, stream_tokens: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        plan_events = self._plan_events(message, project_id, schema, context, stream_tokens=stream_tokens)
+        # The completion is JSON carrying the generated SQL; only its user-facing text is streamed as it arrives.
+        answer = AnswerStream()
+        try:
+            async for kind, value in plan_events:
+                if kind == 'token':
+                    for field, text in answer.feed(value):
+                        yield {"type": "token", "content": {"field": field, "text": text}}
+            response, response_data = value
+        except Exception as e:
+            logger.error(f"Error processing SQL message: {str(e)}")
+            yield {"type": "error", "content": {"error": str(e)}}
+            return
+        finally:
+            await plan_events.aclose()
+
+        if response is not None:
+            yield response
+            return
+
+        generated_query = response_data['sql_query'].strip()
+        db_config = self._sandbox_config(schema)
+
+        try:
+            pool, sandbox = await sandbox_executor.run(project_id, sandbox_registry.acquire, project_id, db_config)
+        except Exception as e:
+            logger.error(f"Failed to acquire sandbox for streaming: {str(e)}")
+            yield {"type": "error", "content": {"query": generated_query, "error": str(e)}}
+            return
+
+        stream = None
+        try:
+            try:
+                with span('sandbox.execute'):
+                    stream = await sandbox_executor.run(project_id, sandbox.open_stream, generated_query, None, chunk_size)
+            except ValueError:
+                # Writes and other statements without a result set are not streamed.
+                with span('sandbox.execute'):
+                    result = await sandbox_executor.run(project_id, self._execute_query, project_id, db_config, sandbox, generated_query)
+                if not result.get("success", False):
+                    yield await self._error_response(project_id, generated_query, result.get("error", "Query execution failed"), schema)
+                    return
+                yield {
+                    "type": "end",
+                    "content": {
+                        "query": generated_query,
+                        "total_rows": 0,
+                        "execution_time": result.get("execution_time", 0),
+                        "affected_rows": result.get("affected_rows", 0),
+                        "analysis": response_data.get('analysis', 'Query executed successfully'),
+                        "optimization": response_data.get('optimization', 'No optimization suggestions available')
+                    }
+                }
+                return
+            except Exception as e:
+                logger.error(f"Query execution failed: {str(e)}")
+                yield await self._error_response(project_id, generated_query, str(e), schema)
+                return
+
+            yield {
+                "type": "meta",
+                "content": {
+                    "query": generated_query,
+                    "columns": stream.column_info
+                }
+            }
+
+            while True:
+                rows = await sandbox_executor.run(project_id, stream.fetch_chunk)
+                if not rows:
+                    break
+                yield {"type": "rows", "content": {"rows": rows}}
+
+            rows_returned.observe(stream.total_rows)
+            yield {
+                "type": "end",
+                "content": {
+                    "query": generated_query,
+                    "total_rows": stream.total_rows,
+                    "execution_time": stream.execution_time,
+                    "affected_rows": 0,
+                    "analysis": response_data.get('analysis', 'Query executed successfully'),
+                    "optimization": response_data.get('optimization', 'No optimization suggestions available')
+                }
+            }
+        except Exception as e:
+            logger.error(f"Error streaming query results: {str(e)}")
+            yield {"type": "error", "content": {"query": generated_query, "error": str(e)}}
+        finally:
+            # Runs on normal completion, errors and client disconnects alike.
+            if stream is not None and not stream.exhausted:
+                # A client that leaves mid-stream can leave a fetch_chunk running in an executor thread on this
+                # connection; the abort queues behind it there instead of racing it from the event loop.
+                try:
+                    await asyncio.shield(sandbox_executor.run(project_id, self._discard_stream, stream, pool, sandbox))
+                except ServiceUnavailableError:
+                    await asyncio.get_running_loop().run_in_executor(None, self._discard_stream, stream, pool, sandbox)
+            else:
+                sandbox_registry.release(pool, sandbox)
+
+    @staticmethod
+    def _discard_stream(stream, pool, sandbox):
+        stream.abort()
+        sandbox_registry.release(pool, sandbox, discard=True)
+
+    async def _process_message_legacy(self, message: str, project_id: str, schema: Dict[str, Any], context: Optional[Dict[str, Any]] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
         try:
             intent_context = {"message": message}
-            intent_check = await self.llm_client.generate_sql_completion('intent', intent_context)
+            intent_check = await self.llm_client.generate_sql_completion('intent', intent_context, project_id=project_id)
 
             if intent_check.strip().upper() != 'YES':
                 return {
@@ -145,16 +374,7 @@ class SQLService:
                     "content": "Non-SQL query detected"
                 }
 
-            if project_id not in self.sandbox_instances:
-                db_config = {
-                    "host": schema.get("database_info", {}).get("host", "localhost"),
-                    "port": schema.get("database_info", {}).get("port", 3306),
-                    "user": schema.get("database_info", {}).get("user"),
-                    "password": schema.get("database_info", {}).get("password", ""),
-                    "database": schema.get("database_name"),
-                }
-                self.sandbox_instances[project_id] = MySQLSandbox(db_config)
-            sandbox = self.sandbox_instances[project_id]
+            db_config = self._sandbox_config(schema)
 
             generator_context = {
                 "schema": schema,
@@ -162,11 +382,11 @@ class SQLService:
                 "context": context or {}
             }
             
-            query_response = await self.llm_client.generate_sql_completion('generator', generator_context)
+            query_response = await self.llm_client.generate_sql_completion('generator', generator_context, project_id=project_id)
             generated_query = query_response.strip()
             
             try:
-                result = sandbox.execute_query(generated_query)
+                result, plan = await self._execute_paged(project_id, db_config, generated_query, schema, page_size)
                 
                 if not result.get("success", False):
                     error_msg = result.get("error", "Query execution failed")
@@ -177,7 +397,7 @@ class SQLService:
                         "error": error_msg,
                         "schema": schema
                     }
-                    error_analysis = await self.llm_client.generate_sql_completion('error', error_context)
+                    error_analysis = await self.llm_client.generate_sql_completion('error', error_context, project_id=project_id)
                     return {
                         "success": False,
                         "type": "error",
@@ -188,14 +408,14 @@ class SQLService:
                         }
                     }
                 
-                data = result.get("data") or {}
+                result_payload = self._result_payload(project_id, result, plan, schema)
                 
                 analysis_context = {
                     "query": generated_query,
                     "results": {
-                        "rows": data.get("records", []),
-                        "columns": result.get("column_info", []),
-                        "total_rows": data.get("total_rows", 0)
+                        "rows": result_payload["rows"],
+                        "columns": result_payload["columns"],
+                        "total_rows": result_payload["total_rows"]
                     },
                     "metrics": {
                         "execution_time": result.get("execution_time", 0),
@@ -203,27 +423,21 @@ class SQLService:
                     }
                 }
                 
-                analysis = await self.llm_client.generate_sql_completion('analyzer', analysis_context)
+                analysis = await self.llm_client.generate_sql_completion('analyzer', analysis_context, project_id=project_id)
                 
                 optimizer_context = {
                     "query": generated_query,
                     "metrics": analysis_context["metrics"],
                     "schema": schema
                 }
-                optimization = await self.llm_client.generate_sql_completion('optimizer', optimizer_context)
+                optimization = await self.llm_client.generate_sql_completion('optimizer', optimizer_context, project_id=project_id)
                 
                 return {
                     "success": True,
                     "type": "sql",
                     "content": {
                         "query": generated_query,
-                        "result": {
-                            "rows": data.get("records", []),
-                            "columns": result.get("column_info", []),
-                            "total_rows": data.get("total_rows", 0),
-                            "execution_time": result.get("execution_time", 0),
-                            "affected_rows": result.get("affected_rows", 0)
-                        },
+                        "result": result_payload,
                         "analysis": analysis,
                         "optimization": optimization
                     }
@@ -235,7 +449,7 @@ class SQLService:
                     "error": str(e),
                     "schema": schema
                 }
-                error_analysis = await self.llm_client.generate_sql_completion('error', error_context)
+                error_analysis = await self.llm_client.generate_sql_completion('error', error_context, project_id=project_id)
                 return {
                     "success": False,
                     "type": "error",
@@ -282,20 +496,38 @@ class SQLService:
             logger.error(f"Error optimizing query: {str(e)}")
             return {"type": "error", "content": str(e)}
 
-    def _get_sandbox(self, project_id: int, db_config: Dict[str, str]) -> MySQLSandbox:
-        if project_id not in self.sandbox_instances:
-            self.sandbox_instances[project_id] = MySQLSandbox(db_config)
-        return self.sandbox_instances[project_id]
+    def _sandbox_config(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "host": schema.get("database_info", {}).get("host", "localhost"),
+            "port": schema.get("database_info", {}).get("port", 3306),
+            "user": schema.get("database_info", {}).get("user"),
+            "password": schema.get("database_info", {}).get("password", ""),
+            "database": schema.get("database_name"),
+        }
+
+    def _call_sandbox(self, project_id: int, db_config: Dict[str, str], operation: str, *args) -> Any:
+        with sandbox_registry.lease(project_id, db_config) as sandbox:
+            if operation == 'execute_query':
+                return self._execute_query(project_id, db_config, sandbox, *args)
+            with db_execution_seconds.time(operation=operation):
+                return getattr(sandbox, operation)(*args)
+
+    def _execute_query(self, project_id: int, db_config: Dict[str, str], sandbox: Any, query: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        def run():
+            with db_execution_seconds.time(operation='execute_query'):
+                return sandbox.execute_query(query, params)
+        return query_result_cache.execute(project_id, db_config, sandbox, query, run)
+
+    async def _run_sandbox(self, project_id: int, db_config: Dict[str, str], operation: str, *args) -> Any:
+        with span('sandbox.execute'):
+            return await sandbox_executor.run(project_id, self._call_sandbox, project_id, db_config, operation, *args)
 
     def _cleanup_sandbox(self, project_id: int):
-        if project_id in self.sandbox_instances:
-            self.sandbox_instances[project_id].close()
-            del self.sandbox_instances[project_id]
+        sandbox_registry.invalidate(project_id)
 
     async def execute_query(self, project_id: int, db_config: Dict[str, str], query: str) -> Dict[str, Any]:
         try:
-            sandbox = self._get_sandbox(project_id, db_config)
-            result = sandbox.execute_query(query)
+            result = await self._run_sandbox(project_id, db_config, 'execute_query', query)
             
             if not result['success']:
                 return result
@@ -311,7 +543,7 @@ class SQLService:
                     }
                 }
 
-                result['llm_analysis'] = await self.llm_client.generate_sql_completion('analyzer', analysis_context)
+                result['llm_analysis'] = await self.llm_client.generate_sql_completion('analyzer', analysis_context, project_id=project_id)
 
             return result
 
@@ -324,8 +556,7 @@ class SQLService:
 
     async def get_query_suggestions(self, project_id: int, db_config: Dict[str, str], user_input: str) -> Dict[str, Any]:
         try:
-            sandbox = self._get_sandbox(project_id, db_config)
-            db_info = sandbox.get_database_info()
+            db_info = await self._run_sandbox(project_id, db_config, 'get_database_info')
 
             if not db_info['success']:
                 return {
@@ -339,14 +570,14 @@ class SQLService:
                     'tables': [
                         {
                             'name': table['name'],
-                            'columns': [col['name'] for col in table['schema']['columns']],
+                            'columns': [col['Field'] for col in table['schema']['columns']],
                             'sample_row_count': table['row_count']
                         } for table in db_info['data']['tables']
                     ]
                 }
             }
 
-            suggestions = await self.llm_client.generate_sql_completion('generator', suggestion_context)
+            suggestions = await self.llm_client.generate_sql_completion('generator', suggestion_context, project_id=project_id)
 
             return {
                 'success': True,
@@ -362,8 +593,7 @@ class SQLService:
 
     async def explain_query(self, project_id: int, db_config: Dict[str, str], query: str) -> Dict[str, Any]:
         try:
-            sandbox = self._get_sandbox(project_id, db_config)
-            explain_result = sandbox.execute_query(f"EXPLAIN FORMAT=JSON {query}")
+            explain_result = await self._run_sandbox(project_id, db_config, 'execute_query', f"EXPLAIN FORMAT=JSON {query}")
 
             if not explain_result['success']:
                 return explain_result
@@ -378,7 +608,7 @@ class SQLService:
                 }
             }
 
-            analysis = await self.llm_client.generate_sql_completion('optimizer', explain_context)
+            analysis = await self.llm_client.generate_sql_completion('optimizer', explain_context, project_id=project_id)
 
             return {
                 'success': True,
@@ -395,8 +625,7 @@ class SQLService:
 
     async def process_natural_language(self, project_id: int, db_config: Dict[str, str], user_message: str) -> Dict[str, Any]:
         try:
-            sandbox = self._get_sandbox(project_id, db_config)
-            db_info = sandbox.get_database_info()
+            db_info = await self._run_sandbox(project_id, db_config, 'get_database_info')
 
             if not db_info['success']:
                 return {
@@ -405,10 +634,15 @@ class SQLService:
                 }
 
             # Check intent
-            intent_context = {"message": user_message}
-            intent_check = await self.llm_client.generate_sql_completion('intent', intent_context)
-
-            if 'NO' in intent_check.upper():
+            local_intent = intent_classifier.classify(user_message, db_info['data'])
+            if local_intent is not None:
+                is_query = local_intent['is_sql_query']
+            else:
+                intent_context = {"message": user_message}
+                intent_check = await self.llm_client.generate_sql_completion('intent', intent_context, project_id=project_id)
+                is_query = 'NO' not in intent_check.upper()
+
+            if not is_query:
                 return {
                     'success': True,
                     'is_query': False,
@@ -421,14 +655,14 @@ class SQLService:
                     'tables': [
                         {
                             'name': table['name'],
-                            'columns': [col['name'] for col in table['schema']['columns']],
+                            'columns': [col['Field'] for col in table['schema']['columns']],
                             'sample_row_count': table['row_count']
                         } for table in db_info['data']['tables']
                     ]
                 }
             }
 
-            generated_query = await self.llm_client.generate_sql_completion('generator', query_context)
+            generated_query = await self.llm_client.generate_sql_completion('generator', query_context, project_id=project_id)
             generated_query = generated_query.strip()
             
             if not generated_query:
@@ -437,7 +671,7 @@ class SQLService:
                     'error': 'Failed to generate SQL query'
                 }
 
-            result = sandbox.execute_query(generated_query)
+            result = await self._run_sandbox(project_id, db_config, 'execute_query', generated_query)
             
             if not result['success']:
                 return {
@@ -458,7 +692,7 @@ class SQLService:
                 }
             }
 
-            analysis = await self.llm_client.generate_sql_completion('analyzer', response_context)
+            analysis = await self.llm_client.generate_sql_completion('analyzer', response_context, project_id=project_id)
 
             return {
                 'success': True,
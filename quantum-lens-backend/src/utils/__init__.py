@@ -1,6 +1,6 @@
 from .logger import get_logger
-from .exceptions import AppException, DatabaseError, AuthenticationError, ValidationError
+from .exceptions import AppException, DatabaseError, AuthenticationError, ValidationError, ServiceUnavailableError
 
 logger = get_logger()
 
-__all__ = ['logger', 'AppException', 'DatabaseError', 'AuthenticationError', 'ValidationError']
\ No newline at end of file
+__all__ = ['logger', 'AppException', 'DatabaseError', 'AuthenticationError', 'ValidationError', 'ServiceUnavailableError']
\ No newline at end of file
@@ -31,4 +31,8 @@ class AuthenticationError(AppException):
 
 class ValidationError(AppException):
     def __init__(self, detail: str):
-        super().__init__(status.HTTP_400_BAD_REQUEST, detail) 
\ No newline at end of file
+        super().__init__(status.HTTP_400_BAD_REQUEST, detail)
+
+class ServiceUnavailableError(AppException):
+    def __init__(self, detail: str):
+        super().__init__(status.HTTP_503_SERVICE_UNAVAILABLE, detail)
@@ -0,0 +1,240 @@
+import contextvars
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from starlette.routing import Match
+from src.config.config import METRICS_CONFIG
+from src.utils import logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Spans of the request currently being served; set by RequestMetricsMiddleware.
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar('metrics_trace', default=None)
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count.
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Prometheus text-format registry; collectors expose numbers other components already keep in stats()."""
+
+    def __init__(self, enabled: bool = True, namespace: str = 'quantum_lens', slow_request_seconds: float = 2.0):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.slow_request_seconds = slow_request_seconds
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], List[Tuple[str, str, str, Dict[str, Any], float]]]):
+        """collector() returns (name, type, help, labels, value) samples, read at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        grouped: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collector in collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, documentation, labels, value in samples:
+                full_name = f"{self.namespace}_{name}"
+                entry = grouped.setdefault(full_name, (kind, documentation, []))
+                entry[2].append(f"{full_name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        for name, (kind, documentation, samples) in grouped.items():
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"] + samples)
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric: _Metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+metrics = MetricsRegistry(**METRICS_CONFIG)
+
+stage_seconds = metrics.histogram('stage_duration_seconds', 'Time spent in each request pipeline stage.', ['stage'])
+http_request_seconds = metrics.histogram('http_request_duration_seconds', 'HTTP request latency.', ['method', 'route', 'status'])
+llm_request_seconds = metrics.histogram('llm_request_duration_seconds', 'Latency of completions returned by the LLM provider.', ['prompt_type', 'model'])
+llm_requests = metrics.counter('llm_requests_total', 'LLM completion requests by outcome.', ['prompt_type', 'model', 'outcome'])
+llm_tokens = metrics.counter('llm_tokens_total', 'Tokens reported by the LLM provider.', ['prompt_type', 'model', 'kind'])
+db_execution_seconds = metrics.histogram('db_execution_duration_seconds', 'Time spent running sandbox database operations.', ['operation'])
+rows_returned = metrics.histogram('query_rows_returned', 'Rows returned per executed query or page.', [], ROW_BUCKETS)
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time one pipeline stage into stage_duration_seconds and the current request's trace."""
+    if not metrics.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+def _route_template(scope) -> str:
+    # Newer Starlette records the matched route in the scope; the pinned 0.14 does not, so match it here.
+    route = scope.get('route')
+    if route is None and scope.get('app') is not None:
+        for candidate in getattr(scope['app'], 'routes', []):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, 'path', None) or 'unmatched'
+
+class RequestMetricsMiddleware:
+    """Times each HTTP request and logs its stage spans as one structured line when it finishes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        trace: List[Tuple[str, float]] = []
+        token = _trace.set(trace)
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            elapsed = time.perf_counter() - started
+            # The matched route template keeps label cardinality bounded; unmatched paths share one label.
+            route = _route_template(scope)
+            http_request_seconds.observe(elapsed, method=scope['method'], route=route, status=status['code'])
+            if trace:
+                summary = {
+                    'method': scope['method'],
+                    'route': route,
+                    'status': status['code'],
+                    'total_ms': round(elapsed * 1000, 2),
+                    'spans': [{'stage': stage, 'ms': round(seconds * 1000, 2)} for stage, seconds in trace]
+                }
+                if elapsed >= metrics.slow_request_seconds:
+                    logger.info(f"Slow request timings: {json.dumps(summary)}")
+                else:
+                    logger.debug(f"Request timings: {json.dumps(summary)}")
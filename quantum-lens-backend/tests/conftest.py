@@ -0,0 +1,14 @@
+import os
+
+# src.config.config refuses to import without these; the unit tests never reach a database or the LLM.
+for name, value in {
+    'DB_HOST': 'localhost',
+    'DB_PORT': '3306',
+    'DB_USER': 'test',
+    'DB_NAME': 'test',
+    'JWT_SECRET': 'test-secret',
+    'OPENROUTER_API_KEY': 'test',
+    'SITE_URL': 'http://localhost',
+    'SITE_NAME': 'test'
+}.items():
+    os.environ.setdefault(name, value)
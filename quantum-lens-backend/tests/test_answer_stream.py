@@ -0,0 +1,45 @@
+import json
+from src.service.sql.answer_stream import AnswerStream
+
+def _collect(tokens, stream=None):
+    stream = stream or AnswerStream()
+    text = {}
+    for token in tokens:
+        for field, piece in stream.feed(token):
+            text[field] = text.get(field, '') + piece
+    return text
+
+def _chars(text):
+    return list(text)
+
+def test_only_user_facing_fields_are_emitted():
+    completion = json.dumps({
+        'sql_query': 'SELECT secret FROM users',
+        'analysis': 'Revenue rose.',
+        'reasoning': {'response': 'nested, not top level'},
+        'response': 'Here you go.'
+    })
+    assert _collect([completion]) == {'analysis': 'Revenue rose.', 'response': 'Here you go.'}
+
+def test_escapes_are_decoded():
+    completion = json.dumps({'response': 'line one\nsaid "hi"\t\\ done/ café'}, ensure_ascii=True)
+    assert _collect([completion]) == {'response': 'line one\nsaid "hi"\t\\ done/ café'}
+
+def test_tokens_split_inside_escapes_and_keys():
+    completion = json.dumps({'sql_query': 'SELECT 1', 'analysis': 'a "quoted"\nword é \U0001F600'}, ensure_ascii=True)
+    # One character per token splits every escape, \u sequence and surrogate pair across feed() calls.
+    assert _collect(_chars(completion)) == {'analysis': 'a "quoted"\nword é \U0001F600'}
+
+def test_pieces_are_returned_as_they_arrive():
+    stream = AnswerStream()
+    assert stream.feed('{"respon') == []
+    assert stream.feed('se": "Hel') == [('response', 'Hel')]
+    assert stream.feed('lo\\') == [('response', 'lo')]
+    assert stream.feed('n"}') == [('response', '\n')]
+
+def test_brackets_and_quotes_inside_strings_do_not_confuse_depth():
+    completion = '{"sql_query": "SELECT \\"}{\\" FROM t", "response": "[ok] {fine}", "analysis": ""}'
+    assert _collect(_chars(completion)) == {'response': '[ok] {fine}'}
+
+def test_lone_surrogate_becomes_replacement_character():
+    assert _collect(['{"response": "x\\ud83dy"}']) == {'response': 'x�y'}
@@ -0,0 +1,118 @@
+import base64
+import pytest
+from src.service.sql.pagination import Paginator
+from src.utils.exceptions import ValidationError
+
+SCHEMA = {
+    'tables': [
+        {'name': 'orders', 'row_count': 5000, 'primary_key': ['id'], 'unique_keys': []},
+        {'name': 'customers', 'row_count': 300, 'primary_key': [], 'unique_keys': [['email']]},
+        {'name': 'events', 'row_count': 100, 'primary_key': [], 'unique_keys': []}
+    ]
+}
+
+@pytest.fixture
+def paginator():
+    return Paginator('test-secret', page_size=2, max_page_size=10)
+
+def test_keyset_plan_for_simple_select_on_unique_key(paginator):
+    plan = paginator.plan("SELECT id, total FROM orders WHERE total > 10;", SCHEMA)
+    assert plan['mode'] == 'keyset'
+    assert plan['key'] == 'id'
+    assert paginator.page_sql(plan) == "SELECT id, total FROM orders WHERE (total > 10) ORDER BY `id` LIMIT 3"
+
+def test_keyset_uses_single_column_unique_key_and_alias(paginator):
+    plan = paginator.plan("SELECT c.email, c.name FROM customers c ORDER BY c.email", SCHEMA)
+    assert plan['mode'] == 'keyset'
+    assert plan['key_expr'] == '`c`.`email`'
+
+def test_keyset_cursor_seeks_past_last_key(paginator):
+    plan = paginator.plan("SELECT * FROM orders", SCHEMA)
+    rows, cursor = paginator.paginate(plan, [{'id': 1}, {'id': 2}, {'id': 3}], project_id=7)
+    assert rows == [{'id': 1}, {'id': 2}]
+    next_plan = paginator.decode_token(cursor, 7)
+    assert next_plan['offset'] == 2
+    assert paginator.page_sql(next_plan) == "SELECT * FROM orders WHERE `id` > 2 ORDER BY `id` LIMIT 3"
+
+def test_last_page_has_no_cursor(paginator):
+    plan = paginator.plan("SELECT * FROM orders", SCHEMA)
+    rows, cursor = paginator.paginate(plan, [{'id': 1}], project_id=7)
+    assert rows == [{'id': 1}] and cursor is None
+    assert paginator.estimate_total(plan, SCHEMA, len(rows), False) == (1, True)
+
+def test_offset_plan_breaks_ties_on_the_unique_key(paginator):
+    plan = paginator.plan("SELECT id, total FROM orders ORDER BY total DESC", SCHEMA)
+    assert plan['mode'] == 'offset'
+    assert paginator.page_sql(plan) == "SELECT id, total FROM orders ORDER BY total DESC, `id` LIMIT 3 OFFSET 0"
+
+def test_offset_plan_keeps_an_order_that_already_ends_on_the_key(paginator):
+    plan = paginator.plan("SELECT o.total FROM orders o ORDER BY o.total, o.id DESC", SCHEMA)
+    assert plan['mode'] == 'offset'
+    assert plan['query'] == "SELECT o.total FROM orders o ORDER BY o.total, o.id DESC"
+
+def test_offset_plan_for_ordered_aggregate(paginator):
+    query = "SELECT customer_id, SUM(total) AS spent FROM orders GROUP BY customer_id ORDER BY spent DESC"
+    plan = paginator.plan(query, SCHEMA)
+    assert plan['mode'] == 'offset'
+    assert paginator.page_sql(plan) == f"{query} LIMIT 3 OFFSET 0"
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM events",
+    "SELECT o.id, c.email FROM orders o JOIN customers c ON c.id = o.customer_id",
+    "SELECT * FROM (SELECT * FROM orders ORDER BY id) AS t",
+    "SELECT name FROM customers WHERE note = 'order by'",
+    "SELECT customer_id, COUNT(*) FROM orders GROUP BY customer_id",
+])
+def test_unordered_queries_are_not_offset_paginated(paginator, query):
+    assert paginator.plan(query, SCHEMA) is None
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM orders LIMIT 10",
+    "SELECT * FROM orders ORDER BY total LIMIT 10, 20",
+    "SELECT * FROM orders FOR UPDATE",
+    "UPDATE orders SET total = 0",
+    "SHOW TABLES",
+])
+def test_unpageable_queries(paginator, query):
+    assert paginator.plan(query, SCHEMA) is None
+
+def test_page_size_is_clamped(paginator):
+    assert paginator.plan("SELECT * FROM orders", SCHEMA, page_size=1000)['page_size'] == 10
+
+def _next_cursor(paginator):
+    plan = paginator.plan("SELECT * FROM orders", SCHEMA)
+    return paginator.paginate(plan, [{'id': 1}, {'id': 2}, {'id': 3}], project_id=7)[1]
+
+def test_tampered_cursor_is_rejected(paginator):
+    cursor = _next_cursor(paginator)
+    raw = bytearray(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    raw[-5] ^= 1
+    tampered = base64.urlsafe_b64encode(bytes(raw)).decode('ascii').rstrip('=')
+    with pytest.raises(ValidationError):
+        paginator.decode_token(tampered, 7)
+
+def test_cursor_signed_with_another_secret_is_rejected(paginator):
+    cursor = _next_cursor(Paginator('other-secret', page_size=2))
+    with pytest.raises(ValidationError):
+        paginator.decode_token(cursor, 7)
+
+def test_cursor_is_bound_to_its_project(paginator):
+    cursor = _next_cursor(paginator)
+    with pytest.raises(ValidationError):
+        paginator.decode_token(cursor, 8)
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'YWJj'])
+def test_malformed_cursor_is_rejected(paginator, cursor):
+    with pytest.raises(ValidationError):
+        paginator.decode_token(cursor, 7)
+
+def test_rewrite_failed_only_blames_added_sql(paginator):
+    query = "SELECT id, total FROM orders ORDER BY total"
+    plan = paginator.plan(query, SCHEMA)
+    syntax = "1064 (42000): You have an error in your SQL syntax; check the manual for the right syntax to use near '{}' at line 1"
+    assert paginator.rewrite_failed(plan, query, syntax.format('LIMIT 3 OFFSET 0'))
+    assert not paginator.rewrite_failed(plan, query, syntax.format('total'))
+    assert paginator.rewrite_failed(plan, query, "1054 (42S22): Unknown column 'id' in 'order clause'")
+    assert not paginator.rewrite_failed(plan, query, "1054 (42S22): Unknown column 'total' in 'field list'")
+    assert not paginator.rewrite_failed(plan, query, "3024 (HY000): Query execution was interrupted, maximum statement execution time exceeded")
+    assert not paginator.rewrite_failed(plan, query, None)
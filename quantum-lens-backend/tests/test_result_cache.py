@@ -0,0 +1,33 @@
+import pytest
+from src.db.result_cache import read_tables, written_tables
+
+@pytest.mark.parametrize('query, tables', [
+    ("SELECT * FROM orders", {'orders'}),
+    ("SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id LEFT JOIN `items` i ON i.order_id = o.id",
+     {'orders', 'customers', 'items'}),
+    ("SELECT * FROM orders, customers WHERE customers.id = orders.customer_id", {'orders', 'customers'}),
+    ("SELECT * FROM orders WHERE customer_id IN (SELECT id FROM customers WHERE vip = 1)", {'orders', 'customers'}),
+    ("SELECT * FROM (SELECT * FROM orders) AS t", {'orders'}),
+    ("WITH recent AS (SELECT * FROM orders WHERE created_at > '2024-01-01') "
+     "SELECT * FROM recent JOIN customers ON customers.id = recent.customer_id", {'orders', 'customers'}),
+    ("SELECT * FROM shop.Orders", {'shop.orders'}),
+    ("SELECT 'from secret' AS label FROM orders -- JOIN hidden", {'orders'}),
+    ("SELECT 1", set()),
+])
+def test_read_tables(query, tables):
+    assert read_tables(query) == frozenset(tables)
+
+def test_read_tables_gives_up_on_index_hints():
+    assert read_tables("SELECT * FROM orders USE INDEX (idx_total) WHERE total > 1") == frozenset()
+
+@pytest.mark.parametrize('query, tables', [
+    ("UPDATE orders SET total = 0 WHERE id = 1", {'orders'}),
+    ("DELETE FROM orders WHERE id = 1", {'orders'}),
+    ("INSERT INTO orders (id) VALUES (1)", {'orders'}),
+    ("REPLACE INTO orders VALUES (1)", {'orders'}),
+    ("INSERT INTO archive SELECT * FROM orders", {'archive', 'orders'}),
+    ("UPDATE orders o JOIN customers c ON c.id = o.customer_id SET o.total = 0", {'orders', 'customers'}),
+    ("SELECT * FROM orders", set()),
+])
+def test_written_tables(query, tables):
+    assert written_tables(query) == frozenset(tables)